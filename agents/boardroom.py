@@ -1,31 +1,275 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Protocol, Tuple, get_args
 
+from schemas.output_schema import Severity
+from tools.profiling import current_tracer
 
-def run(problem: str, constraints: List[str], industry: str) -> Tuple[Dict, Dict]:
-    viewpoints = [
-        f"Market lens: demand signal in {industry} favors focused pilot over full-scale rollout.",
-        "Finance lens: stage-gate investment reduces downside risk while preserving upside.",
-        "Risk lens: compliance and change-management readiness are key gating criteria.",
-        "Ops lens: operationalize with a small cross-functional tiger team.",
-    ]
+LENSES = ("Market", "Finance", "Risk", "Ops")
+STANCES = ("pilot", "scale", "defer")
+LENS_TIMEOUT_S = float(os.environ.get("AGENTOPS_LENS_TIMEOUT", "20"))
+LENS_CONCURRENCY = int(os.environ.get("AGENTOPS_LENS_CONCURRENCY", "4"))
+BASE_CONFIDENCE = 0.74
+ACTION_KEYS = ("action", "owner", "timeframe", "impact")
+RISK_KEYS = ("risk", "severity", "mitigation")
 
-    actions = [
-        {"action": "Launch a 6-week pilot with measurable success gates.", "owner": "Program Sponsor", "timeframe": "Weeks 1-6", "impact": "Validates value before scale."},
-        {"action": "Set weekly boardroom review on KPI, cost, and risk.", "owner": "PMO", "timeframe": "Weeks 1-12", "impact": "Early issue detection."},
-        {"action": "Prepare scale-up package with staffing and budget scenarios.", "owner": "Finance + Ops", "timeframe": "Weeks 7-12", "impact": "Accelerates go/no-go decision."},
-    ]
+CONSENSUS_SUMMARY = {
+    "pilot": "Consensus: run a controlled pilot rather than immediate enterprise rollout.",
+    "scale": "Consensus: proceed to a staged enterprise rollout.",
+    "defer": "Consensus: defer the decision until gating risks are resolved.",
+}
 
-    risks = [
-        {"risk": "Pilot scope creep.", "severity": "med", "mitigation": "Define strict entry/exit criteria."},
-        {"risk": "Insufficient executive sponsorship.", "severity": "high", "mitigation": "Assign accountable executive owner."},
-    ]
+
+@dataclass
+class LensView:
+    lens: str
+    stance: str
+    confidence: float
+    viewpoint: str
+    actions: List[Dict[str, str]] = field(default_factory=list)
+    risks: List[Dict[str, str]] = field(default_factory=list)
+    status: str = "ok"  # "ok" | "timeout" | "error"
+    latency_ms: float = 0.0
+    error: Optional[str] = None
+
+
+class LensBackend(Protocol):
+    name: str
+
+    async def evaluate(self, lens: str, problem: str, constraints: List[str], industry: str, timeout: Optional[float] = None) -> LensView: ...
+
+
+class HeuristicLensBackend:
+    """Deterministic local lenses; also the fallback for lenses that time out or fail.
+
+    ``delays`` (seconds per lens) simulates slow model calls when exercising timeouts.
+    """
+
+    name = "heuristic"
+
+    def __init__(self, delays: Optional[Dict[str, float]] = None) -> None:
+        self.delays = delays or {}
+
+    def view(self, lens: str, problem: str, constraints: List[str], industry: str) -> LensView:
+        compliance = any("compliance" in item.lower() for item in constraints)
+        budget = any("budget" in item.lower() for item in constraints)
+        if lens == "Market":
+            return LensView(
+                lens,
+                "pilot",
+                0.7,
+                f"Market lens: demand signal in {industry} favors focused pilot over full-scale rollout.",
+                actions=[{"action": "Launch a 6-week pilot with measurable success gates.", "owner": "Program Sponsor", "timeframe": "Weeks 1-6", "impact": "Validates value before scale."}],
+                risks=[{"risk": "Pilot scope creep.", "severity": "med", "mitigation": "Define strict entry/exit criteria."}],
+            )
+        if lens == "Finance":
+            return LensView(
+                lens,
+                "pilot",
+                0.8 if budget else 0.7,
+                "Finance lens: stage-gate investment reduces downside risk while preserving upside.",
+                actions=[{"action": "Set weekly boardroom review on KPI, cost, and risk.", "owner": "PMO", "timeframe": "Weeks 1-12", "impact": "Early issue detection."}],
+            )
+        if lens == "Risk":
+            return LensView(
+                lens,
+                "pilot",
+                0.8 if compliance else 0.65,
+                "Risk lens: compliance and change-management readiness are key gating criteria.",
+                risks=[{"risk": "Insufficient executive sponsorship.", "severity": "high", "mitigation": "Assign accountable executive owner."}],
+            )
+        return LensView(
+            lens,
+            "pilot",
+            0.7,
+            "Ops lens: operationalize with a small cross-functional tiger team.",
+            actions=[{"action": "Prepare scale-up package with staffing and budget scenarios.", "owner": "Finance + Ops", "timeframe": "Weeks 7-12", "impact": "Accelerates go/no-go decision."}],
+        )
+
+    async def evaluate(self, lens: str, problem: str, constraints: List[str], industry: str, timeout: Optional[float] = None) -> LensView:
+        if self.delays.get(lens):
+            await asyncio.sleep(self.delays[lens])
+        return self.view(lens, problem, constraints, industry)
+
+
+class GeminiLensBackend:
+    """One Gemini call per lens; the blocking client runs in its own worker thread.
+
+    The thread comes from a per-call executor that is shut down without waiting, so a lens
+    that times out does not hold up the event loop's shutdown. The HTTP call itself is
+    bounded by the lens timeout, so the abandoned thread finishes soon after.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, client: Any = None) -> None:
+        self.api_key = api_key
+        self.client = client
+        self.metrics: List[Dict[str, Any]] = []
+
+    async def evaluate(self, lens: str, problem: str, constraints: List[str], industry: str, timeout: Optional[float] = None) -> LensView:
+        from tools.tools.llm_gemini import generate_lens_view
+
+        call = functools.partial(
+            generate_lens_view,
+            api_key=self.api_key,
+            lens=lens,
+            industry=industry,
+            problem_statement=problem,
+            constraints=constraints,
+            client=self.client,
+            metrics=self.metrics,
+            timeout=timeout,
+        )
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"lens-{lens}")
+        try:
+            raw = await asyncio.get_running_loop().run_in_executor(pool, contextvars.copy_context().run, call)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        stance = str(raw.get("stance", "")).lower()
+        if stance not in STANCES:
+            raise ValueError(f"{lens} lens returned unknown stance {stance!r}")
+        return LensView(
+            lens,
+            stance,
+            min(1.0, max(0.0, float(raw.get("confidence", 0.5)))),
+            f"{lens} lens: {raw.get('viewpoint', '').strip()}",
+            actions=list(raw.get("actions") or []),
+            risks=list(raw.get("risks") or []),
+        )
+
+
+def get_default_backend() -> LensBackend:
+    """``AGENTOPS_BOARDROOM_BACKEND=gemini`` (with ``GEMINI_API_KEY``) selects model-backed lenses."""
+    if os.environ.get("AGENTOPS_BOARDROOM_BACKEND", "heuristic") == "gemini" and os.environ.get("GEMINI_API_KEY"):
+        return GeminiLensBackend(os.environ["GEMINI_API_KEY"])
+    return HeuristicLensBackend()
+
+
+def _check_items(view: LensView) -> None:
+    """Reject model output that ``merge_views`` and ``AgentOutput`` cannot take as-is."""
+    for kind, items, keys in (("action", view.actions, ACTION_KEYS), ("risk", view.risks, RISK_KEYS)):
+        for item in items:
+            if not isinstance(item, dict) or not all(isinstance(item.get(key), str) and item[key].strip() for key in keys):
+                raise ValueError(f"{view.lens} lens returned an incomplete {kind}; each needs {', '.join(keys)}")
+    for risk in view.risks:
+        if risk["severity"] not in get_args(Severity):
+            raise ValueError(f"{view.lens} lens returned unknown severity {risk['severity']!r}")
+
+
+async def _run_lens(
+    backend: LensBackend,
+    fallback: HeuristicLensBackend,
+    slots: asyncio.Semaphore,
+    lens: str,
+    lane: int,
+    args: Tuple[str, List[str], str],
+    timeout: float,
+) -> LensView:
+    async with slots:
+        started = time.perf_counter()
+        try:
+            view = await asyncio.wait_for(backend.evaluate(lens, *args, timeout=timeout), timeout)
+            _check_items(view)
+        except asyncio.TimeoutError:
+            view = fallback.view(lens, *args)
+            view.status, view.error = "timeout", f"no answer within {timeout:g}s"
+        except Exception as exc:  # a failing lens must not sink the other three
+            view = fallback.view(lens, *args)
+            view.status, view.error = "error", f"{type(exc).__name__}: {exc}"
+        view.latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    tracer = current_tracer()
+    if tracer is not None:
+        tracer.record(f"lens:{lens}", "lens", started, view.latency_ms, tid=lane, backend=backend.name, status=view.status)
+    return view
+
+
+async def gather_lenses(
+    problem: str,
+    constraints: List[str],
+    industry: str,
+    backend: Optional[LensBackend] = None,
+    timeout: float = LENS_TIMEOUT_S,
+    max_concurrency: int = LENS_CONCURRENCY,
+) -> List[LensView]:
+    """Evaluate every lens as its own task; late, failing or malformed lenses get the heuristic view."""
+    backend = backend or get_default_backend()
+    fallback = backend if isinstance(backend, HeuristicLensBackend) else HeuristicLensBackend()
+    slots = asyncio.Semaphore(max_concurrency)
+    args = (problem, constraints, industry)
+    return list(await asyncio.gather(*(_run_lens(backend, fallback, slots, lens, lane, args, timeout) for lane, lens in enumerate(LENSES, start=1))))
+
+
+def _run_sync(coro: Any) -> Any:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Called from inside an event loop: run on a fresh loop in a worker thread, keeping the tracer context.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(contextvars.copy_context().run, asyncio.run, coro).result()
+
+
+def merge_views(views: List[LensView]) -> Dict[str, Any]:
+    """Confidence-weighted stance vote; fallback views count at half weight."""
+    weights = dict.fromkeys(STANCES, 0.0)
+    for view in views:
+        weights[view.stance] += view.confidence * (1.0 if view.status == "ok" else 0.5)
+    total = sum(weights.values()) or 1.0
+    stance = max(STANCES, key=lambda item: weights[item])
+    actions: Dict[str, Dict[str, str]] = {}
+    risks: Dict[str, Dict[str, str]] = {}
+    rank = {"high": 0, "med": 1, "low": 2}
+    for view in views:
+        for action in view.actions:
+            actions.setdefault(action["action"].strip().lower(), action)
+        for risk in view.risks:
+            key = risk["risk"].strip().lower()
+            if key not in risks or rank.get(risk["severity"], 1) < rank.get(risks[key]["severity"], 1):
+                risks[key] = risk
+    return {
+        "stance": stance,
+        "agreement": round(weights[stance] / total, 3),
+        "dissent": [view.lens for view in views if view.stance != stance],
+        "degraded": [view.lens for view in views if view.status != "ok"],
+        "actions": list(actions.values()),
+        "risks": list(risks.values()),
+    }
+
+
+def run(
+    problem: str,
+    constraints: List[str],
+    industry: str,
+    backend: Optional[LensBackend] = None,
+    timeout: float = LENS_TIMEOUT_S,
+) -> Tuple[Dict, Dict]:
+    backend = backend or get_default_backend()
+    started = time.perf_counter()
+    views = _run_sync(gather_lenses(problem, constraints, industry, backend, timeout))
+    wall_ms = round((time.perf_counter() - started) * 1000, 2)
+    consensus = merge_views(views)
+    viewpoints = [view.viewpoint + (" (fallback view)" if view.status != "ok" else "") for view in views]
+
+    summary_consensus = CONSENSUS_SUMMARY[consensus["stance"]]
+    if consensus["dissent"]:
+        summary_consensus += f" Dissent from: {', '.join(consensus['dissent'])}."
+    assumptions = ["Current market conditions remain stable over next quarter."]
+    if consensus["degraded"]:
+        assumptions.append(f"{', '.join(consensus['degraded'])} lens(es) did not answer in time; heuristic views were used in their place.")
+    confidence = BASE_CONFIDENCE * (0.8 + 0.2 * consensus["agreement"]) - 0.05 * len(consensus["degraded"])
 
     result = {
         "executive_summary": [
             f"Boardroom simulation completed for {industry} strategy decision.",
-            "Consensus: run a controlled pilot rather than immediate enterprise rollout.",
+            summary_consensus,
             "Financial optionality can be preserved with stage-gated investment.",
             "Risk posture is manageable if compliance checkpoints are hard-coded.",
             "A 90-day plan is ready for stakeholder approval.",
@@ -37,20 +281,34 @@ def run(problem: str, constraints: List[str], industry: str) -> Tuple[Dict, Dict
         },
         "analysis": {"key_findings": viewpoints, "charts": [], "anomalies": []},
         "recommendations": {
-            "actions": actions,
-            "risks": risks,
+            "actions": consensus["actions"],
+            "risks": consensus["risks"],
             "plan_90_days": [
                 "Month 1: scope pilot, define KPIs, align stakeholders.",
                 "Month 2: execute pilot and monitor outcomes weekly.",
                 "Month 3: decide scale, adjust operating model, fund roadmap.",
             ],
         },
-        "assumptions": ["Current market conditions remain stable over next quarter."],
-        "confidence": 0.74,
+        "assumptions": assumptions,
+        "confidence": round(max(0.3, confidence), 3),
     }
 
+    lenses = [{"lens": view.lens, "stance": view.stance, "confidence": view.confidence, "status": view.status, "latency_ms": view.latency_ms, **({"error": view.error} if view.error else {})} for view in views]
+    tool_calls = [
+        {
+            "tool": "multi_agent_boardroom",
+            "input": {"industry": industry, "constraints": constraints, "backend": backend.name, "timeout_s": timeout},
+            "output": {
+                "lenses": lenses,
+                "consensus": {key: consensus[key] for key in ("stance", "agreement", "dissent", "degraded")},
+                "wall_ms": wall_ms,
+                "serial_ms": round(sum(view.latency_ms for view in views), 2),
+            },
+        }
+    ]
+    tool_calls.extend(getattr(backend, "metrics", []))
     trace = {
-        "tool_calls": [{"tool": "multi_agent_boardroom", "input": {"industry": industry, "constraints": constraints}, "output": viewpoints}],
-        "evidence": ["No uploaded data; decision derived from structured expert heuristics."],
+        "tool_calls": tool_calls,
+        "evidence": ["No uploaded data; decision derived from structured expert heuristics." if backend.name == "heuristic" else f"Lens views generated by the {backend.name} backend."],
     }
     return result, trace
@@ -1,18 +1,154 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+import dataclasses
+import os
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
-from tools.data_tools import basic_findings, detect_anomalies, profile_dataset
+from tools.data_tools import basic_findings, detect_anomalies, profile_dataset, score_outliers
+from tools.dedup_tools import near_duplicate_clusters, row_hashes
+from tools.outofcore_tools import SpilledTable, profile_out_of_core, scan_out_of_core
+from tools.stats_tools import FAST_SAMPLE_ROWS, compute_fast_stats, compute_stats, profile_incremental, stats_summary
 from tools.viz_tools import suggest_charts
 
 
-def run(problem: str, constraints: List[str], df: pd.DataFrame) -> Tuple[Dict, Dict]:
-    profile = profile_dataset(df)
-    findings = basic_findings(df)
-    anomalies = detect_anomalies(df)
-    charts = suggest_charts(df)
+def _error_bound_notes(stats) -> List[str]:
+    bounds = stats.error_bounds
+    level = f"{bounds['confidence_level']:.0%}"
+    strata = f", stratified by '{bounds['strata']}'" if bounds["strata"] else ""
+    notes = [f"Fast mode: statistics estimated from a {stats.sample_rows:,}-row sample of {stats.rows:,} rows{strata}."]
+    if bounds["mean_half_width"]:
+        col, width = max(bounds["mean_half_width"].items(), key=lambda item: item[1])
+        notes.append(f"Column means are within ±{width:.4g} ({col}, widest) at {level} confidence.")
+        notes.append("Counts, minimums, maximums and null counts are exact over all rows; duplicates are counted within the sample.")
+    else:
+        notes.append("Counts, means, spreads, minimums, maximums and null counts are exact over all rows.")
+    if bounds["quantile_rank_error"]:
+        notes.append(f"Quartiles for the IQR rule come from the sample with rank error ≤ {max(bounds['quantile_rank_error'].values()):.2%} at {level} confidence.")
+    notes.append(f"Distinct counts come from HyperLogLog with ~{bounds['cardinality_rel_error']:.1%} relative standard error.")
+    return notes
+
+
+def _bounded_confidence(stats, base: float = 0.78) -> float:
+    """Scale the base confidence down by the relative error of the approximate statistics.
+
+    The penalty adds the worst quantile rank error, the widest mean half-width relative to
+    its column's spread and the duplicate estimate's error relative to the row count,
+    capped at one half.
+    """
+    bounds = stats.error_bounds
+    penalty = max(bounds.get("quantile_rank_error", {}).values(), default=0.0)
+    spreads = stats.numeric["std"] if not stats.numeric.empty else pd.Series(dtype="float64")
+    penalty += max(
+        (width / spreads[col] for col, width in bounds.get("mean_half_width", {}).items() if spreads.get(col, 0) > 0),
+        default=0.0,
+    )
+    penalty += bounds.get("duplicate_rows_abs_error", 0) / max(stats.rows, 1)
+    return round(base * (1 - min(penalty, 0.5)), 3)
+
+
+def _out_of_core_notes(stats) -> List[str]:
+    bounds = stats.error_bounds
+    notes = [f"Out-of-core mode: {stats.rows:,} rows were streamed from disk in bounded batches; counts, means and spreads are exact."]
+    if bounds["quantile_rank_error"]:
+        notes.append(f"Quartiles and IQR fences come from KLL sketches with rank error ≤ {max(bounds['quantile_rank_error'].values()):.2%}.")
+    notes.append(f"Distinct counts come from HyperLogLog with ~{bounds['cardinality_rel_error']:.1%} relative standard error.")
+    if "duplicate_rows_abs_error" in bounds:
+        notes.append(f"The duplicate count is a HyperLogLog estimate (±{bounds['duplicate_rows_abs_error']:,} rows); exact duplicate tracking exceeded the memory budget.")
+    notes.append("Key-conflict (near-duplicate) clusters are not computed out of core.")
+    return notes
+
+
+def _chart_payload_summary(spec: Dict, payload: Optional[Dict]) -> Dict:
+    if payload is None:
+        return {"title": spec["title"], "kind": None}
+    return {"title": spec["title"], **{key: value.tolist() if hasattr(value, "tolist") else value for key, value in payload.items()}}
+
+
+def build_profile(df: pd.DataFrame, analysis_mode: str = "Exact") -> Dict:
+    """Profile stage: column statistics (exact or sketched) and the dataset profile.
+
+    Fast mode on frames larger than its sample makes no full pass beyond cheap column
+    reductions: statistics and duplicates come from the sample. Otherwise duplicate
+    counts, null counts and exact moments come from the persistent profile cache, which
+    only processes rows appended since a cached upload, and just the quartiles are
+    computed over the full frame.
+    """
+    if analysis_mode == "Fast" and len(df) > FAST_SAMPLE_ROWS:
+        stats = compute_fast_stats(df, workers=os.cpu_count())
+        return {"stats": stats, "profile": profile_dataset(df, stats), "analysis_mode": analysis_mode, "incremental": None}
+    hashes = row_hashes(df)
+    summary, incremental = profile_incremental(df, hashes=hashes)
+    stats = compute_stats(df, workers=os.cpu_count(), summary=summary)
+    stats.duplicate_rows, stats.row_hashes = summary.duplicates.duplicates, hashes
+    return {"stats": stats, "profile": profile_dataset(df, stats), "analysis_mode": analysis_mode, "incremental": incremental}
+
+
+def slim_profile(profiled: Dict) -> Dict:
+    """The profile stage output without its per-row arrays (the numeric block, row index and
+    row hashes), which can be hundreds of MB; the findings stage rebuilds them on reuse.
+
+    A Fast-mode sample keeps its row index, so outliers are rescored on the same rows.
+    """
+    stats = profiled["stats"]
+    stats = dataclasses.replace(stats, values=None, row_index=stats.row_index if stats.sample_rows else None, row_hashes=None)
+    return {**profiled, "stats": stats}
+
+
+def build_findings(df: pd.DataFrame, profiled: Dict, duplicate_keys: Optional[List[str]] = None) -> Dict:
+    """Findings stage: quality findings, duplicate clusters, outliers, anomalies and charts.
+
+    Key-conflict clusters need a group-by over every row, so they only run for the
+    ``duplicate_keys`` the user named.
+    """
+    stats = profiled["stats"]
+    findings = basic_findings(df, stats)
+    clusters = near_duplicate_clusters(df, duplicate_keys or [], hashes=stats.row_hashes)
+    if clusters["clusters"]:
+        largest = clusters["top"][0]
+        key_text = ", ".join(f"{key}={value}" for key, value in largest["key"].items())
+        findings.append(
+            f"{clusters['clusters']} {'/'.join(map(str, clusters['keys']))} values map to conflicting records "
+            f"(largest: {key_text} with {largest['rows']} rows in {largest['variants']} variants)."
+        )
+    outliers = score_outliers(df, stats, workers=os.cpu_count())
+    anomalies = detect_anomalies(df, stats, outliers)
+    return {"findings": findings, "clusters": clusters, "outliers": outliers, "anomalies": anomalies, "charts": suggest_charts(df, stats)}
+
+
+def build_profile_out_of_core(table: SpilledTable) -> Dict:
+    """Profile stage for tables larger than the memory budget (see :mod:`tools.outofcore_tools`).
+
+    The head rows stand in for the frame: they carry the preview and the spill's ingest report.
+    """
+    stats, head = profile_out_of_core(table)
+    return {"stats": stats, "profile": profile_dataset(head, stats), "analysis_mode": "Out-of-core", "incremental": None, "head": head}
+
+
+def build_findings_out_of_core(table: SpilledTable, profiled: Dict) -> Dict:
+    """Findings stage for out-of-core tables: one more streamed pass for outliers and chart data."""
+    stats, head = profiled["stats"], profiled["head"]
+    findings = basic_findings(head, stats)
+    charts = suggest_charts(head, stats)
+    outliers, chart_data = scan_out_of_core(table, stats, charts)
+    clusters = {"keys": [], "clusters": 0, "rows": 0, "top": []}
+    return {
+        "findings": findings,
+        "clusters": clusters,
+        "outliers": outliers,
+        "anomalies": detect_anomalies(head, stats, outliers),
+        "charts": charts,
+        "chart_data": chart_data,
+    }
+
+
+def build_recommendations(problem: str, constraints: List[str], df: pd.DataFrame, profiled: Dict, found: Dict) -> Tuple[Dict, Dict]:
+    """Recommendations stage; reads the upstream outputs without mutating them."""
+    stats, profile, analysis_mode = profiled["stats"], profiled["profile"], profiled["analysis_mode"]
+    incremental = profiled.get("incremental")
+    findings, clusters, outliers = list(found["findings"]), found["clusters"], found["outliers"]
+    anomalies, charts = list(found["anomalies"]), list(found["charts"])
 
     actions = [
         {
@@ -51,7 +187,7 @@ def run(problem: str, constraints: List[str], df: pd.DataFrame) -> Tuple[Dict, D
         "problem_understanding": {
             "goal": problem,
             "success_metrics": ["Data quality score", "Cycle-time improvement", "Variance reduction"],
-            "constraints": constraints,
+            "constraints": list(constraints),
         },
         "analysis": {
             "key_findings": findings,
@@ -73,16 +209,45 @@ def run(problem: str, constraints: List[str], df: pd.DataFrame) -> Tuple[Dict, D
         ],
         "confidence": 0.78,
     }
+    if stats.sample_rows:
+        result["assumptions"].extend(_error_bound_notes(stats))
+        result["confidence"] = _bounded_confidence(stats)
+    elif analysis_mode == "Out-of-core":
+        result["assumptions"].extend(_out_of_core_notes(stats))
+        result["confidence"] = _bounded_confidence(stats)
 
     trace = {
         "tool_calls": [
-            {"tool": "profile_dataset", "input": {"rows": len(df), "cols": len(df.columns)}, "output": profile},
+            {"tool": "column_stats", "input": {"rows": stats.rows, "numeric_cols": len(stats.numeric_cols), "mode": analysis_mode}, "output": {**stats_summary(stats), "sample_rows": stats.sample_rows, "error_bounds": stats.error_bounds}},
+            {"tool": "profile_dataset", "input": {"rows": stats.rows, "cols": len(stats.columns)}, "output": profile},
             {"tool": "basic_findings", "input": {"problem": problem}, "output": findings},
-            {"tool": "detect_anomalies", "input": {"numeric_cols": profile.get("numeric_cols", [])}, "output": anomalies},
+            {"tool": "near_duplicate_clusters", "input": {"keys": clusters["keys"]}, "output": clusters},
+            {"tool": "detect_anomalies", "input": {"numeric_cols": profile.get("numeric_cols", [])}, "output": {"anomalies": anomalies, "outliers": outliers}},
         ],
         "evidence": [
             f"Used columns: {', '.join(profile['column_names'][:8])}",
             f"Rows analyzed: {profile['rows']}",
         ],
     }
+    if incremental:
+        trace["tool_calls"].insert(1, {"tool": "profile_incremental", "input": {"rows": incremental["rows"]}, "output": incremental})
+        if incremental["rows_skipped"]:
+            trace["evidence"].append(f"Profile cache: {incremental['rows_skipped']} rows skipped, {incremental['rows_processed']} new rows merged")
+    if found.get("chart_data"):
+        payloads = [_chart_payload_summary(spec, payload) for spec, payload in zip(charts, found["chart_data"])]
+        trace["tool_calls"].append({"tool": "aggregate_chart", "input": {"charts": len(charts), "rows": stats.rows}, "output": payloads})
+    ingest = df.attrs.get("ingest_report")
+    if ingest:
+        trace["tool_calls"].insert(0, {"tool": "load_tabular_file", "input": {"bytes": ingest["total_bytes"]}, "output": ingest})
     return result, trace
+
+
+def run(
+    problem: str,
+    constraints: List[str],
+    df: pd.DataFrame,
+    analysis_mode: str = "Exact",
+    duplicate_keys: Optional[List[str]] = None,
+) -> Tuple[Dict, Dict]:
+    profiled = build_profile(df, analysis_mode)
+    return build_recommendations(problem, constraints, df, profiled, build_findings(df, profiled, duplicate_keys))
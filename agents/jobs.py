@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+JOB_WORKERS = int(os.environ.get("AGENTOPS_JOB_WORKERS", "2"))
+JOB_QUEUE = int(os.environ.get("AGENTOPS_JOB_QUEUE", "16"))
+JOBS_PER_SESSION = int(os.environ.get("AGENTOPS_JOBS_PER_SESSION", "1"))
+JOB_KEEP_S = 900.0  # finished jobs wait this long for their session to pick up the result
+ACTIVE = ("queued", "running")
+
+_sequence = itertools.count()
+
+
+class JobRejected(RuntimeError):
+    """The queue is full or the session already has its share of runs in flight."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job at its next progress or stage checkpoint after :meth:`JobManager.cancel`."""
+
+
+def stage_preview(name: str, value: Any) -> Optional[Dict[str, Any]]:
+    """The part of a stage output worth showing before the run finishes."""
+    if name == "recommendations" and isinstance(value, tuple):
+        return {"executive_summary": value[0].get("executive_summary", [])}
+    if not isinstance(value, dict):
+        return None
+    if "profile" in value:
+        return {"profile": {key: item for key, item in value["profile"].items() if key != "column_names"}}
+    if isinstance(value.get("findings"), list):
+        return {"findings": [item for item in value["findings"] if isinstance(item, str)]}
+    if isinstance(value.get("counts"), dict):
+        return {"step_counts": value["counts"]}
+    return None
+
+
+@dataclass
+class Job:
+    """One submitted run. Worker threads write these fields; UI reruns only read them."""
+
+    id: str
+    session_id: str
+    fn: Optional[Callable[["Job"], Any]]
+    label: str = ""
+    state: str = "queued"  # "queued" | "running" | "done" | "failed" | "cancelled"
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    stages: List[Dict[str, Any]] = field(default_factory=list)
+    partials: Dict[str, Any] = field(default_factory=dict)
+    ingest: Optional[Tuple[int, int]] = None
+    result: Any = None
+    error: Optional[str] = None
+    seq: int = field(default_factory=lambda: next(_sequence))
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def _checkpoint(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def progress(self, done: int, total: int) -> None:
+        """Ingest progress callback for :func:`agents.orchestrator.run_agent_cached`."""
+        self.ingest = (done, total)
+        self._checkpoint()
+
+    def stage(self, record: Dict[str, Any], value: Any) -> None:
+        """Stage callback; the finished stage is already cached, so cancelling here loses no work."""
+        self.stages.append(dict(record))
+        preview = stage_preview(record["stage"], value)
+        if preview is not None:
+            self.partials[record["stage"]] = preview
+        self._checkpoint()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job reaches a final state; False on timeout."""
+        return self._done.wait(timeout)
+
+    @property
+    def queued_s(self) -> float:
+        return round((self.started or time.time()) - self.submitted, 3)
+
+    @property
+    def run_s(self) -> Optional[float]:
+        return None if self.started is None else round((self.finished or time.time()) - self.started, 3)
+
+
+class JobManager:
+    """Process-wide run queue shared by every session.
+
+    ``workers`` threads bound how many runs execute at once, and at most ``max_queued``
+    runs wait. A free worker picks the oldest waiting run from the session with the
+    fewest runs executing, breaking ties by which session was served least recently,
+    so one user's queue of heavy uploads cannot hold every slot.
+    Threads (not processes) keep the shared result cache and stage memo in one place;
+    the heavy kernels are pandas/numpy calls that release the GIL.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE,
+        per_session: int = JOBS_PER_SESSION,
+        keep_s: float = JOB_KEEP_S,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.per_session = max(1, per_session)
+        self.keep_s = keep_s
+        self._jobs: Dict[str, Job] = {}
+        self._pending: List[Job] = []
+        self._threads: List[threading.Thread] = []
+        self._served: Dict[str, int] = {}
+        self._cond = threading.Condition()
+
+    def submit(self, session_id: str, fn: Callable[[Job], Any], label: str = "") -> Job:
+        """Queue ``fn(job)``; ``fn`` should pass ``job.progress`` / ``job.stage`` to the run."""
+        with self._cond:
+            self._prune()
+            active = sum(1 for job in self._jobs.values() if job.session_id == session_id and job.state in ACTIVE)
+            if active >= self.per_session:
+                raise JobRejected("A run from this session is already in progress; wait for it or cancel it.")
+            if len(self._pending) >= self.max_queued:
+                raise JobRejected(f"The server is busy ({len(self._pending)} runs queued); try again shortly.")
+            job = Job(uuid.uuid4().hex, session_id, fn, label)
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"agentops-job-{len(self._threads) + 1}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        """1-based place in the queue, 0 once the job has left it."""
+        with self._cond:
+            return self._pending.index(job) + 1 if job in self._pending else 0
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job, or ask a running one to stop at its next checkpoint."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in ACTIVE:
+                return False
+            if job in self._pending:
+                self._pending.remove(job)
+                job.finished, job.fn, job.state = time.time(), None, "cancelled"
+                job._done.set()
+            job._cancel.set()
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            states = Counter(job.state for job in self._jobs.values())
+            return {"workers": self.workers, "running": states["running"], "queued": states["queued"], "max_queued": self.max_queued}
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.keep_s
+        for job_id in [job.id for job in self._jobs.values() if job.finished is not None and job.finished < cutoff]:
+            del self._jobs[job_id]
+        sessions = {job.session_id for job in self._jobs.values()}
+        self._served = {key: value for key, value in self._served.items() if key in sessions}
+
+    def _take(self) -> Job:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            running = Counter(job.session_id for job in self._jobs.values() if job.state == "running")
+            job = min(self._pending, key=lambda item: (running[item.session_id], self._served.get(item.session_id, -1), item.seq))
+            self._pending.remove(job)
+            self._served[job.session_id] = job.seq
+            job.state, job.started = "running", time.time()
+            return job
+
+    def _work(self) -> None:
+        while True:
+            job = self._take()
+            state = "done"
+            try:
+                job.result = job.fn(job)
+            except JobCancelled:
+                state = "cancelled"
+            except Exception as exc:  # reported to the submitting session, never kills the worker
+                job.error = f"{type(exc).__name__}: {exc}"
+                state = "failed"
+            job.finished, job.fn = time.time(), None
+            job.state = state  # last, so readers that see a final state also see the result
+            job._done.set()
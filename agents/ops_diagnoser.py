@@ -1,24 +1,123 @@
 from __future__ import annotations
 
-import json
-from typing import Dict, List, Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 
-def run(problem: str, constraints: List[str], metrics_bytes: bytes | None) -> Tuple[Dict, Dict]:
-    metrics = {}
-    if metrics_bytes:
-        try:
-            metrics = json.loads(metrics_bytes.decode("utf-8"))
-        except json.JSONDecodeError:
-            metrics = {"error": "Invalid JSON payload"}
-
-    findings = [
-        "Operational diagnostics focused on incident frequency, latency, and saturation patterns.",
-        "Likely root causes include threshold misconfiguration and insufficient runbook coverage.",
+from tools.metrics_tools import change_points, default_window, ewma_drift, parse_metrics, rolling_p95
+
+MAX_SERIES = 50
+MIN_POINTS = 20
+
+
+def _when(stamps: Optional[np.ndarray], index: int) -> str:
+    if stamps is None:
+        return f"point {index:,}"
+    return str(stamps[index].astype("datetime64[s]")).replace("T", " ")
+
+
+def _rate(count: float, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds > 0 else 0.0
+
+
+def _detect(series: Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]]) -> Tuple[List[str], List[str], List[Dict]]:
+    findings: List[str] = []
+    anomalies: List[str] = []
+    detectors = {"rolling_p95": rolling_p95, "ewma_drift": ewma_drift, "change_points": change_points}
+    results: Dict[str, Dict[str, Any]] = {name: {} for name in detectors}
+    elapsed = dict.fromkeys(detectors, 0.0)
+    points = 0
+    for name, (values, stamps) in series.items():
+        window = default_window(len(values))
+        points += len(values)
+        for detector, fn in detectors.items():
+            start = time.perf_counter()
+            results[detector][name] = fn(values) if detector == "change_points" else fn(values, window)
+            elapsed[detector] += time.perf_counter() - start
+
+        spikes = results["rolling_p95"][name]
+        if spikes["breaches"]:
+            anomalies.append(
+                f"{name}: {spikes['breaches']:,} spikes above 2x the trailing {spikes['window']}-point p95 "
+                f"(worst {spikes['worst_value']:.4g} at {_when(stamps, spikes['worst_index'])}, {spikes['worst_ratio']}x)."
+            )
+        drift = results["ewma_drift"][name]
+        if drift["first_index"] is not None:
+            findings.append(
+                f"{name}: EWMA drifted {drift['direction']} from baseline {drift['baseline']:.4g} starting {_when(stamps, drift['first_index'])}; "
+                f"latest {drift['ewma_at_end']:.4g}."
+            )
+        for shift in results["change_points"][name]:
+            findings.append(f"{name}: level shift {shift['before']:.4g} -> {shift['after']:.4g} at {_when(stamps, shift['index'])}.")
+
+    tool_calls = [
+        {
+            "tool": detector,
+            "input": {"series": len(series), "points": points},
+            "output": {"per_series": dict(list(results[detector].items())[:20]), "throughput": {"seconds": round(elapsed[detector], 4), "points_per_s": _rate(points, elapsed[detector])}},
+        }
+        for detector in detectors
     ]
-    if metrics:
-        findings.append(f"Parsed metrics keys: {', '.join(list(metrics.keys())[:8])}")
+    return findings, anomalies, tool_calls
+
+
+def ingest_metrics(metrics_bytes: bytes | None) -> Dict[str, Any]:
+    """Ingest stage: stream the upload into per-series columns."""
+    ingested: Dict[str, Any] = {"series": {}, "tool_calls": [], "notes": []}
+    if not metrics_bytes:
+        return ingested
+    series: Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+    start = time.perf_counter()
+    try:
+        store, fmt = parse_metrics(metrics_bytes)
+        series = store.series()
+        parsed: Dict[str, Any] = {"format": fmt, "records": store.records, "skipped": store.skipped, "attributes": store.attributes}
+    except ValueError as exc:
+        parsed = {"error": f"Invalid JSON payload: {exc}"}
+    seconds = time.perf_counter() - start
+    parsed["series"] = {name: len(values) for name, (values, _) in list(series.items())[:MAX_SERIES]}
+    parsed["throughput"] = {"seconds": round(seconds, 4), "mb_per_s": _rate(len(metrics_bytes) / 1e6, seconds), "points_per_s": _rate(sum(len(values) for values, _ in series.values()), seconds)}
+    ingested["series"] = series
+    ingested["tool_calls"].append({"tool": "metrics_stream_parser", "input": {"bytes": len(metrics_bytes)}, "output": parsed})
+    if "error" in parsed:
+        ingested["notes"].append("Metrics upload could not be parsed as JSON or NDJSON; diagnostics fall back to heuristics.")
+    elif not series:
+        ingested["notes"].append(
+            f"Metrics upload parsed ({parsed['records']:,} records) but no numeric series were found; "
+            "expected wide, metric/value or Prometheus-style records. Diagnostics fall back to heuristics."
+        )
+    return ingested
+
+
+def build_findings(ingested: Dict[str, Any]) -> Dict[str, Any]:
+    """Findings stage: run the windowed detectors over the longest series."""
+    series = ingested["series"]
+    findings = ["Operational diagnostics focused on incident frequency, latency, and saturation patterns.", *ingested["notes"]]
+    anomalies: List[str] = []
+    tool_calls: List[Dict] = list(ingested["tool_calls"])
+    analyzable = dict(sorted(((name, item) for name, item in series.items() if len(item[0]) >= MIN_POINTS), key=lambda pair: -len(pair[1][0]))[:MAX_SERIES])
+    if analyzable:
+        findings.append(f"Analyzed {len(analyzable)} metric series ({sum(len(v) for v, _ in analyzable.values()):,} points): {', '.join(list(analyzable)[:8])}.")
+        series_findings, anomalies, detector_calls = _detect(analyzable)
+        findings.extend(series_findings or ["No sustained drift or level shifts detected in the uploaded series."])
+        tool_calls.extend(detector_calls)
+    else:
+        findings.append("Likely root causes include threshold misconfiguration and insufficient runbook coverage.")
+        if series:
+            findings.append(f"Parsed metrics series: {', '.join(list(series)[:8])} (too short for windowed detectors).")
+    if not anomalies:
+        if analyzable:
+            anomalies = ["No spikes detected."]
+        elif series:
+            anomalies = [f"Metric series are shorter than {MIN_POINTS} points; spike detection skipped."]
+        else:
+            anomalies = ["No metric series supplied; spike detection needs a JSON/NDJSON metrics upload."]
+    return {"findings": findings, "anomalies": anomalies, "tool_calls": tool_calls}
 
+
+def build_recommendations(problem: str, constraints: List[str], found: Dict[str, Any]) -> Tuple[Dict, Dict]:
+    findings, anomalies, tool_calls = list(found["findings"]), found["anomalies"], list(found["tool_calls"])
     result = {
         "executive_summary": [
             "Ops diagnostic flow completed using available telemetry context.",
@@ -30,12 +129,12 @@ def run(problem: str, constraints: List[str], metrics_bytes: bytes | None) -> Tu
         "problem_understanding": {
             "goal": problem,
             "success_metrics": ["MTTR", "Error rate", "P95 latency"],
-            "constraints": constraints,
+            "constraints": list(constraints),
         },
         "analysis": {
             "key_findings": findings,
             "charts": [],
-            "anomalies": ["Spike behavior likely correlated with deployment windows."],
+            "anomalies": anomalies[:10],
         },
         "recommendations": {
             "actions": [
@@ -57,7 +156,11 @@ def run(problem: str, constraints: List[str], metrics_bytes: bytes | None) -> Tu
     }
 
     trace = {
-        "tool_calls": [{"tool": "metrics_json_parser", "input": {"bytes": len(metrics_bytes) if metrics_bytes else 0}, "output": metrics}],
+        "tool_calls": tool_calls or [{"tool": "metrics_stream_parser", "input": {"bytes": 0}, "output": {}}],
         "evidence": ["Ops recommendations tied to reliability best-practice heuristics."],
     }
     return result, trace
+
+
+def run(problem: str, constraints: List[str], metrics_bytes: bytes | None) -> Tuple[Dict, Dict]:
+    return build_recommendations(problem, constraints, build_findings(ingest_metrics(metrics_bytes)))
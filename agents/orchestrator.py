@@ -1,14 +1,29 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+import copy
+import json
+import os
+from dataclasses import dataclass, field, fields
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
-import pandas as pd
-
-from agents import boardroom, data_analyst, ops_diagnoser, process_designer
+from agents.stages import Stage, StageRunner
+from memory.result_cache import ResultCache, digest_bytes
 from schemas.output_schema import AgentOutput, TraceBundle
+from tools.profiling import Tracer, current_tracer, span, tracing
 from tools.safety import enforce_constraints, refusal_check
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Specialists (and pandas/numpy behind them) are imported by the route that needs them,
+# so a strategy question or the app's first paint does not pay for the data stack.
+
+_BYTES_FIELDS = ("tabular_bytes", "sop_bytes", "metrics_bytes")
+# Tool-call outputs larger than this (JSON bytes) are summarized in the trace; the full
+# payload stays in the result cache under ``output["ref"]`` (see load_trace_payload).
+TRACE_PAYLOAD_BYTES = int(os.environ.get("AGENTOPS_TRACE_PAYLOAD_KB", "32")) * 1024
+_SUMMARY_ITEMS = 10
+
 
 @dataclass
 class OrchestratorInput:
@@ -21,7 +36,16 @@ class OrchestratorInput:
     confidence_mode: str
     tabular_df: Optional[pd.DataFrame] = None
     sop_bytes: Optional[bytes] = None
+    sop_name: Optional[str] = None
     metrics_bytes: Optional[bytes] = None
+    tabular_bytes: Optional[bytes] = None
+    tabular_name: Optional[str] = None
+    tabular_sheet: Optional[str] = None
+    tabular_path: Optional[str] = None  # server-side file too large to load; analyzed out of core
+    analysis_mode: str = "Exact"
+    duplicate_keys: List[str] = field(default_factory=list)
+    capture_memory: bool = False
+    capture_profile: bool = False
 
 
 def _confidence_by_mode(mode: str, base: float) -> float:
@@ -42,8 +66,280 @@ def _rewrite_for_stakeholder(summary: List[str], stakeholder_mode: str) -> List[
     return [f"{prefix} {item}" for item in summary]
 
 
-def run_agent(payload: OrchestratorInput) -> Tuple[AgentOutput | None, TraceBundle, str | None]:
-    refusal = refusal_check(payload.problem_statement)
+def _frame_digest(df: pd.DataFrame) -> str:
+    import pandas as pd
+
+    hashed = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    schema = json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()])
+    return digest_bytes(schema.encode("utf-8") + hashed.tobytes())
+
+
+def _payload_digests(payload: OrchestratorInput) -> Dict[str, Optional[str]]:
+    return {name: digest_bytes(getattr(payload, name)) if getattr(payload, name) is not None else None for name in _BYTES_FIELDS}
+
+
+def cache_key(payload: OrchestratorInput, digests: Optional[Dict[str, Optional[str]]] = None) -> str:
+    digests = digests or _payload_digests(payload)
+    parts: Dict[str, object] = {}
+    for item in fields(payload):
+        value = getattr(payload, item.name)
+        if item.name in _BYTES_FIELDS:
+            parts[item.name] = digests[item.name]
+        elif item.name == "tabular_path":
+            # Too large to hash; path, size and mtime identify the file.
+            from tools.outofcore_tools import file_fingerprint
+
+            parts[item.name] = file_fingerprint(value) if value is not None else None
+        elif item.name == "tabular_df":
+            # Uploaded bytes already identify the frame; only hash frames passed in directly.
+            parts[item.name] = _frame_digest(value) if value is not None and payload.tabular_bytes is None else None
+        else:
+            parts[item.name] = value
+    return "run:" + digest_bytes(json.dumps(parts, sort_keys=True, default=str).encode("utf-8"))
+
+
+def _frame_key(payload: OrchestratorInput, digest: Optional[str] = None) -> str:
+    name = payload.tabular_name or "upload.csv"
+    sheet = f":{digest_bytes(payload.tabular_sheet.encode('utf-8'))}" if payload.tabular_sheet else ""
+    return f"frame:{name.lower().rsplit('.', 1)[-1]}:{digest or digest_bytes(payload.tabular_bytes)}{sheet}"
+
+
+def _out_of_core(payload: OrchestratorInput) -> bool:
+    return payload.tabular_path is not None and payload.tabular_df is None and payload.tabular_bytes is None
+
+
+def _ensure_tabular(
+    payload: OrchestratorInput,
+    cache: Optional[ResultCache] = None,
+    digest: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> None:
+    if payload.tabular_df is not None or payload.tabular_bytes is None:
+        return
+    from tools.data_tools import load_tabular_file
+
+    name = payload.tabular_name or "upload.csv"
+    load = lambda: load_tabular_file(payload.tabular_bytes, name, progress=progress, sheet=payload.tabular_sheet)
+    payload.tabular_df = load() if cache is None else cache.get_or_compute(_frame_key(payload, digest), load)
+
+
+def _with_spans(trace: TraceBundle, tracer: Tracer) -> TraceBundle:
+    update = {"spans": tracer.summary(), "profile": tracer.profile_text}
+    if tracer.memory_skipped:
+        update["memory"] = [*trace.memory, "Peak memory not captured: another run was tracing memory at the same time."]
+    return trace.model_copy(update=update)
+
+
+StageCallback = Callable[[Dict[str, Any], Any], None]
+
+
+def run_agent_cached(
+    payload: OrchestratorInput,
+    cache: ResultCache,
+    progress: Optional[Callable[[int, int], None]] = None,
+    on_stage: Optional[StageCallback] = None,
+) -> Tuple[AgentOutput | None, TraceBundle, str | None]:
+    """Serve identical requests whole from ``cache``; otherwise reuse whichever stages still match.
+
+    ``on_stage`` receives each stage's record and output as it finishes (see :mod:`agents.jobs`).
+    """
+    digests = _payload_digests(payload)
+    key = cache_key(payload, digests)
+    cached = cache.get(key)
+    if cached is None:
+        with tracing(payload.capture_memory, payload.capture_profile) as tracer:
+            output, trace, refusal = run_agent(payload, cache, progress, digests, on_stage)
+        trace = _with_spans(trace, tracer)
+        cache.put(key, (output, trace, refusal))
+        status = "miss"
+    else:
+        output, trace, refusal = cached
+        if payload.objective_type == "Analyze Data (CSV/Excel)":
+            _ensure_tabular(payload, cache, digests["tabular_bytes"])
+        status = "hit"
+    counters = cache.stats()
+    note = f"Result cache: {status} (hits={counters['hits']}, misses={counters['misses']}, disk_hits={counters['disk_hits']})"
+    update = {"memory": [*trace.memory, note]}
+    if status == "hit":
+        update["stages"] = [{**item, "status": "reused"} for item in trace.stages]
+    return output, trace.model_copy(update=update), refusal
+
+
+def run_agent(
+    payload: OrchestratorInput,
+    cache: Optional[ResultCache] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    digests: Optional[Dict[str, Optional[str]]] = None,
+    on_stage: Optional[StageCallback] = None,
+) -> Tuple[AgentOutput | None, TraceBundle, str | None]:
+    """Run one request; stage and tool spans land in ``trace.spans`` unless a caller is already tracing.
+
+    With a ``cache``, stage outputs are memoized there (see :class:`agents.stages.StageRunner`).
+    """
+    if current_tracer() is not None:
+        return _run_stages(payload, cache, progress, digests, on_stage)
+    with tracing(payload.capture_memory, payload.capture_profile) as tracer:
+        output, trace, refusal = _run_stages(payload, cache, progress, digests, on_stage)
+    return output, _with_spans(trace, tracer), refusal
+
+
+def _plan(
+    payload: OrchestratorInput,
+    cache: Optional[ResultCache],
+    progress: Optional[Callable[[int, int], None]],
+    digests: Dict[str, Optional[str]],
+) -> Tuple[str, List[Stage]]:
+    """Route the request and lay out its stages up to ``recommendations``."""
+    problem, constraints = payload.problem_statement, payload.constraints
+    asks = {"problem_statement": problem, "constraints": constraints}
+    if payload.objective_type == "Analyze Data (CSV/Excel)" and _out_of_core(payload):
+        from agents import data_analyst
+        from tools.outofcore_tools import file_fingerprint, spill_to_parquet
+
+        spill_key = None if cache is None else f"spill:{file_fingerprint(payload.tabular_path)}"
+        return "Data Analyst Agent", [
+            Stage("ingest", lambda _: spill_to_parquet(payload.tabular_path), key=spill_key),
+            Stage("profile", lambda up: data_analyst.build_profile_out_of_core(up["ingest"]), {"analysis_mode": "Out-of-core"}, ("ingest",)),
+            Stage("findings", lambda up: data_analyst.build_findings_out_of_core(up["ingest"], up["profile"]), after=("ingest", "profile")),
+            Stage("recommendations", lambda up: data_analyst.build_recommendations(problem, constraints, up["profile"]["head"], up["profile"], up["findings"]), asks, ("ingest", "profile", "findings")),
+        ]
+    if payload.objective_type == "Analyze Data (CSV/Excel)" and (payload.tabular_df is not None or payload.tabular_bytes is not None):
+        from agents import data_analyst
+
+        if cache is None:
+            ingest_key = None
+        elif payload.tabular_bytes is not None and payload.tabular_df is None:
+            ingest_key = _frame_key(payload, digests["tabular_bytes"])
+        else:
+            ingest_key = f"frame:direct:{_frame_digest(payload.tabular_df)}"
+
+        def ingest(_: Dict) -> pd.DataFrame:
+            _ensure_tabular(payload, progress=progress)
+            return payload.tabular_df
+
+        return "Data Analyst Agent", [
+            Stage("ingest", ingest, key=ingest_key),
+            Stage("profile", lambda up: data_analyst.build_profile(up["ingest"], payload.analysis_mode), {"analysis_mode": payload.analysis_mode}, ("ingest",), slim=data_analyst.slim_profile),
+            Stage("findings", lambda up: data_analyst.build_findings(up["ingest"], up["profile"], payload.duplicate_keys), {"duplicate_keys": payload.duplicate_keys}, ("ingest", "profile")),
+            Stage("recommendations", lambda up: data_analyst.build_recommendations(problem, constraints, up["ingest"], up["profile"], up["findings"]), asks, ("ingest", "profile", "findings")),
+        ]
+    if payload.objective_type == "Decide Strategy (no data needed)":
+        from agents import boardroom
+
+        backend = boardroom.get_default_backend()
+        return "Multi-Agent Boardroom", [
+            Stage("recommendations", lambda _: boardroom.run(problem, constraints, payload.industry, backend), {**asks, "industry": payload.industry, "backend": backend.name}),
+        ]
+    if payload.objective_type == "Design a Process (SOP/workflow)":
+        from agents import process_designer
+
+        return "Process Redesign Agent", [
+            Stage("ingest", lambda _: process_designer.ingest_sop(payload.sop_bytes, payload.sop_name), {"sop": digests["sop_bytes"], "name": payload.sop_name}),
+            Stage("findings", lambda up: process_designer.build_findings(up["ingest"]), after=("ingest",)),
+            Stage("recommendations", lambda up: process_designer.build_recommendations(problem, constraints, up["ingest"], up["findings"]), asks, ("ingest", "findings")),
+        ]
+    from agents import ops_diagnoser
+
+    return "Ops Diagnostic Agent", [
+        Stage("ingest", lambda _: ops_diagnoser.ingest_metrics(payload.metrics_bytes), {"metrics": digests["metrics_bytes"]}),
+        Stage("findings", lambda up: ops_diagnoser.build_findings(up["ingest"]), after=("ingest",)),
+        Stage("recommendations", lambda up: ops_diagnoser.build_recommendations(problem, constraints, up["findings"]), asks, ("findings",)),
+    ]
+
+
+def _summarize(value: Any, depth: int = 0) -> Any:
+    if isinstance(value, dict):
+        if depth >= 3:
+            return f"<{len(value)} keys>"
+        summary = {str(key): _summarize(item, depth + 1) for key, item in list(value.items())[:_SUMMARY_ITEMS]}
+        if len(value) > _SUMMARY_ITEMS:
+            summary["…"] = f"{len(value) - _SUMMARY_ITEMS} more keys"
+        return summary
+    if isinstance(value, (list, tuple)):
+        if depth >= 3:
+            return f"<{len(value)} items>"
+        summary = [_summarize(item, depth + 1) for item in value[:_SUMMARY_ITEMS]]
+        if len(value) > _SUMMARY_ITEMS:
+            summary.append(f"… {len(value) - _SUMMARY_ITEMS} more items")
+        return summary
+    if isinstance(value, str) and len(value) > 200:
+        return value[:200] + "…"
+    return value
+
+
+def _cap_tool_calls(tool_calls: List[dict], cache: Optional[ResultCache]) -> List[dict]:
+    """Replace oversized tool-call outputs (profile previews, parsed metrics) with a summary and a cache ref."""
+    capped = []
+    for call in tool_calls:
+        body = json.dumps(call.get("output"), default=str)
+        if len(body) <= TRACE_PAYLOAD_BYTES:
+            capped.append(call)
+            continue
+        ref = None
+        if cache is not None:
+            ref = "payload:" + digest_bytes(body.encode("utf-8"))
+            cache.put(ref, call["output"])
+        capped.append({**call, "output": {"truncated": True, "bytes": len(body), "ref": ref, "summary": _summarize(call["output"])}})
+    return capped
+
+
+def load_trace_payload(cache: ResultCache, ref: str) -> Any:
+    """Full output of a capped tool call, or None once the cache has evicted it."""
+    return cache.get(ref)
+
+
+def refine_enabled() -> bool:
+    """``AGENTOPS_REFINE_BACKEND=gemini`` (with ``GEMINI_API_KEY``) has Gemini improve each specialist draft."""
+    return os.environ.get("AGENTOPS_REFINE_BACKEND", "none") == "gemini" and bool(os.environ.get("GEMINI_API_KEY"))
+
+
+def _refine(payload: OrchestratorInput, result: Dict) -> Tuple[Dict, List[dict]]:
+    """The specialist draft improved by Gemini, plus the call's trace records.
+
+    A failed or invalid response keeps the draft; constraints are enforced afterwards either way.
+    """
+    from tools.tools.llm_gemini import generate_structured_output
+
+    calls: List[dict] = []
+    try:
+        refined = generate_structured_output(
+            api_key=os.environ["GEMINI_API_KEY"],
+            industry=payload.industry,
+            objective_type=payload.objective_type,
+            problem_statement=payload.problem_statement,
+            constraints=payload.constraints,
+            draft_result=result,
+            metrics=calls,
+        )
+    except Exception as exc:  # the heuristic draft is always a valid answer
+        calls.append({"tool": "gemini_refine", "input": {"objective_type": payload.objective_type}, "output": {"status": "draft kept", "error": f"{type(exc).__name__}: {exc}"}})
+        return result, calls
+    return refined, calls
+
+
+def _enforce(constraints: List[str], result: Dict) -> Dict:
+    recommendations = {**result["recommendations"], "actions": enforce_constraints(constraints, result["recommendations"]["actions"])}
+    return {**result, "recommendations": recommendations}
+
+
+def _rewrite(payload: OrchestratorInput, result: Dict) -> Dict:
+    result = copy.deepcopy(result)
+    result["executive_summary"] = _rewrite_for_stakeholder(result["executive_summary"], payload.stakeholder_mode)
+    result["confidence"] = _confidence_by_mode(payload.confidence_mode, result["confidence"])
+    if payload.explain_mode:
+        result["assumptions"].append("Explain mode enabled: intermediate steps surfaced for transparency.")
+    return result
+
+
+def _run_stages(
+    payload: OrchestratorInput,
+    cache: Optional[ResultCache] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    digests: Optional[Dict[str, Optional[str]]] = None,
+    on_stage: Optional[StageCallback] = None,
+) -> Tuple[AgentOutput | None, TraceBundle, str | None]:
+    with span("refusal_check", "stage"):
+        refusal = refusal_check(payload.problem_statement)
     if refusal:
         trace = TraceBundle(
             inferred_requirements=["Request screened by safety module."],
@@ -58,28 +354,35 @@ def run_agent(payload: OrchestratorInput) -> Tuple[AgentOutput | None, TraceBund
         f"Objective type: {payload.objective_type}",
     ]
 
-    if payload.objective_type == "Analyze Data (CSV/Excel)" and payload.tabular_df is not None:
-        routed = "Data Analyst Agent"
-        result, trace_data = data_analyst.run(payload.problem_statement, payload.constraints, payload.tabular_df)
-    elif payload.objective_type == "Decide Strategy (no data needed)":
-        routed = "Multi-Agent Boardroom"
-        result, trace_data = boardroom.run(payload.problem_statement, payload.constraints, payload.industry)
-    elif payload.objective_type == "Design a Process (SOP/workflow)":
-        routed = "Process Redesign Agent"
-        result, trace_data = process_designer.run(payload.problem_statement, payload.constraints, bool(payload.sop_bytes))
-    else:
-        routed = "Ops Diagnostic Agent"
-        result, trace_data = ops_diagnoser.run(payload.problem_statement, payload.constraints, payload.metrics_bytes)
-
-    result["recommendations"]["actions"] = enforce_constraints(payload.constraints, result["recommendations"]["actions"])
-    result["executive_summary"] = _rewrite_for_stakeholder(result["executive_summary"], payload.stakeholder_mode)
-    result["confidence"] = _confidence_by_mode(payload.confidence_mode, result["confidence"])
+    if digests is None:
+        # Keys only matter when there is a cache to look them up in.
+        digests = _payload_digests(payload) if cache is not None else dict.fromkeys(_BYTES_FIELDS)
+    with span("routing", "stage"):
+        routed, stages = _plan(payload, cache, progress, digests)
 
-    if payload.explain_mode:
-        result["assumptions"].append("Explain mode enabled: intermediate steps surfaced for transparency.")
+    runner = StageRunner(cache, routed, on_stage)
+    runner.run_all(stages)
+    if "ingest" in runner.outputs and routed == "Data Analyst Agent" and not _out_of_core(payload):
+        payload.tabular_df = runner.outputs["ingest"]
+    result, trace_data = runner.outputs["recommendations"]
+    tool_calls = trace_data.get("tool_calls", [])
+    draft = "recommendations"
+    if refine_enabled():
+        asks = {"industry": payload.industry, "objective_type": payload.objective_type, "problem_statement": payload.problem_statement, "constraints": payload.constraints}
+        _, refine_calls = runner.run(Stage("refine", lambda up: _refine(payload, up["recommendations"][0]), {**asks, "backend": "gemini"}, ("recommendations",)))
+        tool_calls, draft = [*tool_calls, *refine_calls], "refine"
+    runner.run(Stage("enforce_constraints", lambda up: _enforce(payload.constraints, up[draft][0]), {"constraints": payload.constraints}, (draft,)))
+    modes = {"stakeholder_mode": payload.stakeholder_mode, "confidence_mode": payload.confidence_mode, "explain_mode": payload.explain_mode}
+    result = runner.run(Stage("stakeholder_rewrite", lambda up: _rewrite(payload, up["enforce_constraints"]), modes, ("enforce_constraints",)))
 
-    output = AgentOutput(**result)
+    with span("validation", "stage"):
+        # pydantic-core validates faster than model_construct can assemble the nested models
+        # in Python, so this stays the single validation point; dumps are cached per instance.
+        output = AgentOutput(**result)
 
+    memory = [f"Stakeholder mode: {payload.stakeholder_mode}", f"Confidence mode: {payload.confidence_mode}"]
+    if runner.reused():
+        memory.append(f"Reused stages: {', '.join(runner.reused())}")
     trace = TraceBundle(
         inferred_requirements=inferred,
         plan=[
@@ -89,10 +392,11 @@ def run_agent(payload: OrchestratorInput) -> Tuple[AgentOutput | None, TraceBund
             "Generate structured recommendations and 90-day plan.",
             "Render stakeholder-ready artifacts.",
         ],
-        tool_calls=trace_data.get("tool_calls", []),
+        tool_calls=_cap_tool_calls(tool_calls, cache),
         evidence=trace_data.get("evidence", []),
         assumptions_and_confidence=[*output.assumptions, f"Confidence: {output.confidence:.2f}"],
-        memory=[f"Stakeholder mode: {payload.stakeholder_mode}", f"Confidence mode: {payload.confidence_mode}"],
+        memory=memory,
         routed_agent=routed,
+        stages=runner.records,
     )
     return output, trace, None
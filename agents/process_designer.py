@@ -1,22 +1,85 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+import time
+from typing import Dict, List, Optional, Tuple
 
+from tools.sop_tools import PROCESS_QUERIES, load_sop_index
 
-def run(problem: str, constraints: List[str], has_doc: bool) -> Tuple[Dict, Dict]:
+STEP_LABELS = {"handoff": "handoff", "approval": "approval", "manual": "manual/re-keying", "wait": "wait/queue"}
+
+
+def _cite(hit: Dict) -> str:
+    snippet = hit["text"] if len(hit["text"]) <= 90 else hit["text"][:87] + "..."
+    return f"{hit['section']} / step {hit['label']} (p.{hit['page']}): \"{snippet}\""
+
+
+def ingest_sop(sop_bytes: Optional[bytes] = None, sop_name: Optional[str] = None) -> Dict:
+    """Ingest stage: parse and index the upload (the index itself is cached by content hash)."""
+    if not sop_bytes:
+        return {"index": None}
+    name = sop_name or "sop.txt"
+    try:
+        index, cache_hit = load_sop_index(sop_bytes, name)
+    except Exception as exc:  # an unreadable upload should degrade to the template, not fail the run
+        return {"index": None, "name": name, "bytes": len(sop_bytes), "error": str(exc)}
+    return {"index": index, "name": name, "bytes": len(sop_bytes), "cache_hit": cache_hit}
+
+
+def build_findings(ingested: Dict) -> Dict:
+    """Findings stage: count and cite the steps behind each process-mining question."""
+    index = ingested["index"]
+    if index is None:
+        return {"counts": {}, "examples": {}}
+    start = time.perf_counter()
+    counts = {category: index.count(query) for category, query in PROCESS_QUERIES.items()}
+    examples = {category: index.search(query, k=3) for category, query in PROCESS_QUERIES.items()}
+    return {"counts": counts, "examples": examples, "query_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def build_recommendations(problem: str, constraints: List[str], ingested: Dict, found: Dict) -> Tuple[Dict, Dict]:
     findings = [
         "Current workflow likely has handoff bottlenecks and unclear ownership boundaries.",
         "SOP modernization should target high-frequency, low-judgment tasks first.",
         "Automation opportunities exist in approvals, notifications, and QA checkpoints.",
     ]
-    if has_doc:
-        findings.append("Uploaded SOP was acknowledged and incorporated as contextual evidence.")
+    evidence = ["Workflow recommendations derived from user objective and constraints."]
+    tool_calls: List[Dict] = []
+    counts, examples = found["counts"], found["examples"]
+    index, name = ingested["index"], ingested.get("name")
+    if "error" in ingested:
+        findings.append(f"Uploaded SOP '{name}' could not be read ({ingested['error']}); recommendations use the generic template.")
+        tool_calls.append({"tool": "sop_index", "input": {"name": name, "bytes": ingested["bytes"]}, "output": {"error": ingested["error"]}})
+    elif index is not None:
+        start = time.perf_counter()
+        relevant = index.search(problem, k=3) if problem.strip() else []
+        query_ms = round(found["query_ms"] + (time.perf_counter() - start) * 1000, 2)
+        summary = index.summary()
+        findings.insert(
+            0,
+            f"SOP '{name}' parsed into {summary['sections']} sections and {summary['chunks']} steps across {summary['pages']} page(s)"
+            f"{' (index reused from cache)' if ingested['cache_hit'] else ''}.",
+        )
+        for category, label in STEP_LABELS.items():
+            if counts[category]:
+                findings.append(f"{counts[category]} {label} steps found; top match: {_cite(examples[category][0])}.")
+        evidence = [f"SOP match for the problem statement: {_cite(hit)}" for hit in relevant] or evidence
+        tool_calls.append(
+            {
+                "tool": "sop_index",
+                "input": {"name": name, "bytes": ingested["bytes"]},
+                "output": {**summary, "cache_hit": ingested["cache_hit"], "query_ms": query_ms, "step_counts": counts, "top_matches": relevant},
+            }
+        )
 
     actions = [
         {"action": "Map as-is process with RACI ownership tags.", "owner": "Process Excellence Lead", "timeframe": "Week 1", "impact": "Visibility into bottlenecks."},
         {"action": "Redesign to-be flow with reduced handoff steps.", "owner": "Ops Architect", "timeframe": "Week 2-4", "impact": "Improved throughput and fewer errors."},
         {"action": "Implement SOP governance cadence and change log.", "owner": "Quality Manager", "timeframe": "Week 4-6", "impact": "Sustained operational discipline."},
     ]
+    if counts.get("approval", 0) > 1:
+        actions.insert(2, {"action": f"Consolidate the {counts['approval']} approval steps into risk-tiered approvals with delegated limits.", "owner": "Process Excellence Lead", "timeframe": "Week 2-4", "impact": "Shorter cycle time on approval-heavy paths."})
+    if counts.get("manual", 0):
+        actions.insert(2, {"action": f"Automate the {counts['manual']} manual/re-keying steps flagged in the SOP.", "owner": "Ops Architect", "timeframe": "Week 3-6", "impact": "Fewer transcription errors and handoff delays."})
 
     result = {
         "executive_summary": [
@@ -29,7 +92,7 @@ def run(problem: str, constraints: List[str], has_doc: bool) -> Tuple[Dict, Dict
         "problem_understanding": {
             "goal": problem,
             "success_metrics": ["Cycle time", "First-pass yield", "SOP adherence"],
-            "constraints": constraints,
+            "constraints": list(constraints),
         },
         "analysis": {"key_findings": findings, "charts": [], "anomalies": []},
         "recommendations": {
@@ -48,7 +111,12 @@ def run(problem: str, constraints: List[str], has_doc: bool) -> Tuple[Dict, Dict
     }
 
     trace = {
-        "tool_calls": [{"tool": "process_mapping_template", "input": {"has_doc": has_doc}, "output": "Generated as-is and to-be blueprint."}],
-        "evidence": ["Workflow recommendations derived from user objective and constraints."],
+        "tool_calls": [*tool_calls, {"tool": "process_mapping_template", "input": {"has_doc": "bytes" in ingested}, "output": "Generated as-is and to-be blueprint."}],
+        "evidence": evidence,
     }
     return result, trace
+
+
+def run(problem: str, constraints: List[str], sop_bytes: Optional[bytes] = None, sop_name: Optional[str] = None) -> Tuple[Dict, Dict]:
+    ingested = ingest_sop(sop_bytes, sop_name)
+    return build_recommendations(problem, constraints, ingested, build_findings(ingested))
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from memory.result_cache import ResultCache, digest_bytes
+from tools.profiling import span
+
+
+@dataclass
+class Stage:
+    """One node of the run graph.
+
+    ``inputs`` are the request values the stage reads directly; ``after`` names the
+    upstream stages whose outputs it consumes. ``compute`` receives those outputs.
+    ``slim`` maps the output to what is worth memoizing, e.g. without per-row arrays that
+    downstream stages can recompute; the current run still sees the full output.
+    """
+
+    name: str
+    compute: Callable[[Dict[str, Any]], Any]
+    inputs: Dict[str, Any] = field(default_factory=dict)
+    after: Sequence[str] = ()
+    key: Optional[str] = None  # explicit cache key, e.g. the content-addressed frame key
+    slim: Optional[Callable[[Any], Any]] = None
+
+
+class StageRunner:
+    """Runs stages in order, memoizing each under a key chained from its upstream keys.
+
+    A stage is reused when its own inputs and every upstream key are unchanged, so a
+    what-if that only edits constraints re-executes just the stages that read them.
+    Cached outputs are shared between runs and must be treated as read-only.
+    ``on_stage(record, output)`` is called after each stage, e.g. to stream progress.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[ResultCache] = None,
+        route: str = "",
+        on_stage: Optional[Callable[[Dict[str, Any], Any], None]] = None,
+    ) -> None:
+        self.cache = cache
+        self.route = route
+        self.on_stage = on_stage
+        self.keys: Dict[str, str] = {}
+        self.outputs: Dict[str, Any] = {}
+        self.records: List[Dict[str, Any]] = []
+
+    def _key(self, stage: Stage) -> str:
+        if stage.key:
+            return stage.key
+        parts = {"route": self.route, "inputs": stage.inputs, "after": [self.keys[name] for name in stage.after]}
+        return f"stage:{stage.name}:" + digest_bytes(json.dumps(parts, sort_keys=True, default=str).encode("utf-8"))
+
+    def run(self, stage: Stage) -> Any:
+        key = self._key(stage)
+        self.keys[stage.name] = key
+        missing = object()
+        start = time.perf_counter()
+        with span(stage.name, "stage") as record:
+            value = self.cache.get(key, missing) if self.cache is not None else missing
+            reused = value is not missing
+            if not reused:
+                value = stage.compute({name: self.outputs[name] for name in stage.after})
+                if self.cache is not None:
+                    self.cache.put(key, stage.slim(value) if stage.slim is not None else value)
+            if record is not None:
+                record["args"]["reused"] = reused
+        self.outputs[stage.name] = value
+        record = {"stage": stage.name, "status": "reused" if reused else "computed", "ms": round((time.perf_counter() - start) * 1000, 3)}
+        self.records.append(record)
+        if self.on_stage is not None:
+            self.on_stage(record, value)
+        return value
+
+    def run_all(self, stages: Sequence[Stage]) -> Any:
+        value = None
+        for stage in stages:
+            value = self.run(stage)
+        return value
+
+    def reused(self) -> List[str]:
+        return [item["stage"] for item in self.records if item["status"] == "reused"]
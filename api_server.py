@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import fields
+from email.message import Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from agents.jobs import JOB_QUEUE, JOB_WORKERS, JobManager, JobRejected
+from agents.orchestrator import OrchestratorInput, run_agent_cached
+from batch_runner import FILE_FIELDS, INPUT_FIELDS, build_input
+from memory.result_cache import ResultCache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+MAX_BODY_BYTES = int(float(os.environ.get("AGENTOPS_API_MAX_BODY_MB", "256")) * 1024 * 1024)
+REQUEST_TIMEOUT_S = float(os.environ.get("AGENTOPS_API_TIMEOUT", "300"))
+# multipart part name -> (bytes field, file name field)
+UPLOAD_PARTS = {"tabular": ("tabular_bytes", "tabular_name"), "sop": ("sop_bytes", "sop_name"), "metrics": ("metrics_bytes", None)}
+_NOT_JSON = {"tabular_df", "tabular_bytes", "sop_bytes", "metrics_bytes"}
+# OrchestratorInput annotation -> (accepted JSON types, element type for lists)
+_JSON_TYPES: Dict[str, Tuple[Tuple[type, ...], Optional[type]]] = {
+    "str": ((str,), None),
+    "Optional[str]": ((str, type(None)), None),
+    "bool": ((bool,), None),
+    "List[str]": ((list,), str),
+}
+_TYPE_NAMES = {str: "a string", bool: "a boolean", type(None): "null"}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Histogram:
+    """Labelled latency histogram rendered in the Prometheus text exposition format."""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[Tuple[Tuple[str, str], ...], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for idx, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["counts"][idx] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = ",".join(f'{name}="{value}"' for name, value in key)
+                sep = "," if labels else ""
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound:g}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series["count"]}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{self.name}_sum{suffix} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{suffix} {series['count']}")
+        return lines
+
+
+def parse_multipart(body: bytes, content_type: str) -> List[Tuple[Message, bytes]]:
+    """Split a multipart/form-data body into (headers, data) parts without copying it through the email parser."""
+    header = Message()
+    header["content-type"] = content_type
+    boundary = header.get_param("boundary")
+    if not boundary:
+        raise ApiError(400, "multipart body without a boundary")
+    parts: List[Tuple[Message, bytes]] = []
+    for chunk in body.split(b"--" + str(boundary).encode("latin-1"))[1:]:
+        if chunk.startswith(b"--"):
+            break
+        head, sep, data = chunk.lstrip(b"\r\n").partition(b"\r\n\r\n")
+        if not sep:
+            raise ApiError(400, "malformed multipart part")
+        headers = Message()
+        for line in head.decode("latin-1").split("\r\n"):
+            name, _, value = line.partition(":")
+            headers[name.strip()] = value.strip()
+        parts.append((headers, data[:-2] if data.endswith(b"\r\n") else data))
+    return parts
+
+
+def check_types(record: Dict[str, Any]) -> None:
+    """Reject values whose JSON type does not match the ``OrchestratorInput`` field (400, not a 500 later)."""
+    expected = {item.name: _JSON_TYPES.get(str(item.type)) for item in fields(OrchestratorInput)}
+    expected.update(dict.fromkeys(FILE_FIELDS, _JSON_TYPES["Optional[str]"]))
+    for key, value in record.items():
+        spec = expected.get(key)
+        if spec is None:
+            continue
+        types, element = spec
+        wrong_type = not isinstance(value, types) or (bool not in types and isinstance(value, bool))
+        if element is not None and (wrong_type or not all(isinstance(item, element) for item in value)):
+            raise ApiError(400, f"{key} must be a list of strings")
+        if wrong_type:
+            raise ApiError(400, f"{key} must be {' or '.join(_TYPE_NAMES[item] for item in types)}, got {type(value).__name__}")
+
+
+class AgentApi:
+    """Request handling shared by every connection: admission, execution and metrics.
+
+    Runs go through a :class:`agents.jobs.JobManager`, so at most ``workers`` execute and
+    at most ``max_queued`` wait; anything beyond that is answered with 429 right away.
+    Server-side file references (``tabular_path`` etc.) are resolved under ``file_root``
+    and are refused when no root is configured.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE,
+        per_client: Optional[int] = None,
+        file_root: Optional[Path] = None,
+        cache: Optional[ResultCache] = None,
+        timeout: float = REQUEST_TIMEOUT_S,
+    ) -> None:
+        self.jobs = JobManager(workers=workers, max_queued=max_queued, per_session=per_client or workers + max_queued)
+        self.cache = cache or ResultCache(max_entries=int(os.environ.get("AGENTOPS_CACHE_ENTRIES", "64")), disk_dir=os.environ.get("AGENTOPS_CACHE_DIR"))
+        self.file_root = file_root.resolve() if file_root else None
+        self.timeout = timeout
+        self.latency = Histogram("agentops_request_seconds", "End-to-end /v1/run latency by routed agent and status code.")
+        self.queue_wait = Histogram("agentops_queue_wait_seconds", "Time runs spent queued before a worker picked them up.")
+        self.run_time = Histogram("agentops_run_seconds", "Time runs spent executing on a worker.")
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def build_payload(self, content_type: str, body: bytes) -> OrchestratorInput:
+        uploads: Dict[str, Tuple[bytes, Optional[str]]] = {}
+        if content_type.startswith("multipart/form-data"):
+            record: Dict[str, Any] = {}
+            for headers, data in parse_multipart(body, content_type):
+                name = headers.get_param("name", header="content-disposition")
+                if name == "request":
+                    record = self._json(data)
+                elif name in UPLOAD_PARTS:
+                    uploads[name] = (data, headers.get_filename())
+                else:
+                    raise ApiError(400, f"unknown multipart part {name!r}; expected 'request' or one of {sorted(UPLOAD_PARTS)}")
+        elif content_type.startswith("application/json") or not content_type:
+            record = self._json(body)
+        else:
+            raise ApiError(415, "send application/json or multipart/form-data")
+        if not isinstance(record, dict):
+            raise ApiError(400, "request must be a JSON object")
+        bad = sorted(_NOT_JSON & record.keys())
+        if bad:
+            raise ApiError(400, f"{', '.join(bad)} cannot be sent as JSON; upload files as multipart parts or pass *_path references")
+        check_types(record)
+        refs = [key for key in FILE_FIELDS if record.get(key)]
+        if refs and self.file_root is None:
+            raise ApiError(400, "server-side file references are disabled; start the server with --file-root")
+        for key in refs:
+            path = (self.file_root / str(record[key])).resolve()
+            if not path.is_relative_to(self.file_root):
+                raise ApiError(400, f"{key} must stay inside the server's file root")
+            if not path.is_file():
+                raise ApiError(404, f"{key} {record[key]!r} not found")
+        try:
+            payload = build_input({key: value for key, value in record.items() if key in INPUT_FIELDS or key in FILE_FIELDS}, self.file_root or Path("."))
+        except TypeError as exc:
+            raise ApiError(400, str(exc)) from exc
+        for part, (data, filename) in uploads.items():
+            bytes_field, name_field = UPLOAD_PARTS[part]
+            setattr(payload, bytes_field, data)
+            if name_field and filename:
+                setattr(payload, name_field, filename)
+        if payload.tabular_bytes is not None and not payload.tabular_name:
+            payload.tabular_name = "upload.csv"
+        return payload
+
+    @staticmethod
+    def _json(data: bytes) -> Any:
+        try:
+            return json.loads(data or b"{}")
+        except ValueError as exc:
+            raise ApiError(400, f"invalid JSON: {exc}") from exc
+
+    def run(self, client: str, content_type: str, body: bytes, include_trace: bool = True) -> Dict[str, Any]:
+        payload = self.build_payload(content_type, body)
+        try:
+            job = self.jobs.submit(client, lambda job: run_agent_cached(payload, self.cache, progress=job.progress, on_stage=job.stage), payload.objective_type)
+        except JobRejected as exc:
+            with self._lock:
+                self.rejected += 1
+            raise ApiError(429, str(exc), {"Retry-After": "1"}) from exc
+        if not job.wait(self.timeout):
+            self.jobs.cancel(job.id)
+            raise ApiError(504, f"run did not finish within {self.timeout:g}s and was cancelled")
+        if job.started is not None:
+            self.queue_wait.observe(job.queued_s)
+            self.run_time.observe(job.run_s or 0.0)
+        if job.state != "done":
+            raise ApiError(500, job.error or f"run {job.state}")
+        output, trace, refusal = job.result
+        return {
+            "id": job.id,
+            "ok": True,
+            "routed_agent": trace.routed_agent,
+            "queue_ms": round(job.queued_s * 1000, 2),
+            "run_ms": round((job.run_s or 0.0) * 1000, 2),
+            "refusal": refusal,
+            "output": output.dumped() if output else None,
+            "trace": trace.dumped() if include_trace else None,
+        }
+
+    def metrics_text(self) -> str:
+        counts = self.jobs.stats()
+        lines = [*self.latency.render(), *self.queue_wait.render(), *self.run_time.render()]
+        lines += [
+            "# HELP agentops_requests_rejected_total Runs refused with 429 because the queue was full.",
+            "# TYPE agentops_requests_rejected_total counter",
+            f"agentops_requests_rejected_total {self.rejected}",
+        ]
+        for name in ("running", "queued", "workers", "max_queued"):
+            lines += [f"# TYPE agentops_jobs_{name} gauge", f"agentops_jobs_{name} {counts[name]}"]
+        return "\n".join(lines) + "\n"
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """``POST /v1/run``, ``GET /metrics`` (Prometheus text) and ``GET /healthz``."""
+
+    server_version = "AgentOpsAPI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def api(self) -> AgentApi:
+        return self.server.api  # type: ignore[attr-defined]
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json", headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(data, default=str).encode("utf-8"), headers=headers)
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == "/metrics":
+            self._send(200, self.api.metrics_text().encode("utf-8"), "text/plain; version=0.0.4")
+        elif path == "/healthz":
+            self._send_json(200, {"ok": True, **self.api.jobs.stats()})
+        else:
+            self._send_json(404, {"ok": False, "error": f"no route {path}"})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/v1/run":
+            self.close_connection = True
+            self._send_json(404, {"ok": False, "error": f"no route {url.path}"})
+            return
+        start = time.perf_counter()
+        route = "-"
+        try:
+            length = self.headers.get("Content-Length")
+            if length is None:
+                raise ApiError(411, "Content-Length is required")
+            if not re.fullmatch(r"[0-9]+", length.strip()):
+                self.close_connection = True  # the body's extent is unknown
+                raise ApiError(400, f"Content-Length must be a non-negative integer, got {length!r}")
+            if int(length) > MAX_BODY_BYTES:
+                self.close_connection = True  # the unread body would corrupt the next request
+                raise ApiError(413, f"body exceeds {MAX_BODY_BYTES // (1024 * 1024)} MB")
+            body = self.rfile.read(int(length))
+            include_trace = parse_qs(url.query).get("trace", ["1"])[0] not in ("0", "false")
+            result = self.api.run(self.headers.get("X-Client-Id") or self.client_address[0], self.headers.get("Content-Type", ""), body, include_trace)
+            route, status = result["routed_agent"], 200
+            self._send_json(200, result)
+        except ApiError as exc:
+            status = exc.status
+            self._send_json(status, {"ok": False, "error": str(exc)}, exc.headers)
+        except Exception as exc:  # keep serving; the client gets the error text
+            status = 500
+            self._send_json(500, {"ok": False, "error": f"{type(exc).__name__}: {exc}"})
+        self.api.latency.observe(time.perf_counter() - start, route=route, status=str(status))
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+
+def make_server(host: str, port: int, api: AgentApi, verbose: bool = False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.api = api  # type: ignore[attr-defined]
+    server.verbose = verbose  # type: ignore[attr-defined]
+    return server
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve run_agent over HTTP with a bounded worker pool.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="runs executing at once")
+    parser.add_argument("--queue", type=int, default=JOB_QUEUE, help="runs allowed to wait; more get 429")
+    parser.add_argument("--per-client", type=int, default=None, help="runs one client (X-Client-Id or IP) may have in flight")
+    parser.add_argument("--file-root", type=Path, default=os.environ.get("AGENTOPS_API_FILE_ROOT"), help="directory for tabular_path/sop_path/metrics_path references")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_S, help="seconds before a run is cancelled with 504")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    api = AgentApi(args.workers, args.queue, args.per_client, args.file_root, timeout=args.timeout)
+    server = make_server(args.host, args.port, api, args.verbose)
+    print(f"AgentOps API on http://{args.host}:{server.server_address[1]} ({args.workers} workers, queue {args.queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,125 @@
 from __future__ import annotations
 
+import dataclasses
+import importlib
 import json
+import os
+import threading
+import uuid
+import zipfile
 from typing import List
 
 import streamlit as st
 
-from agents.orchestrator import OrchestratorInput, run_agent
+from agents.jobs import Job, JobManager, JobRejected
+from agents.orchestrator import OrchestratorInput, load_trace_payload, run_agent_cached
+from memory.result_cache import ResultCache
 from memory.store import load_memory, update_memory
-from tools.data_tools import load_tabular_file
-from tools.doc_tools import actions_to_csv, build_cfo_memo, build_ops_action_plan
-from tools.viz_tools import render_chart
+from tools.doc_tools import Deliverables
+from tools.profiling import chrome_trace
+
+# pandas/numpy/plotly load on the code paths that use them (see benchmarks/import_budget.py),
+# so the sidebar renders before the data stack is imported.
 
 st.set_page_config(page_title="AgentOps Studio", layout="wide")
 
 st.title("🤖 AgentOps Studio")
 st.caption("Pick an industry → describe the problem → upload data (optional) → the agent plans, executes, and delivers stakeholder-ready outcomes.")
 
-memory = load_memory()
+STAKEHOLDER_MODES = ["CFO", "Plant Manager", "CISO", "Product Head"]
+
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+memory = load_memory(session_id)
+
+
+@st.cache_resource
+def warm_data_stack() -> threading.Thread:
+    """Import the data-analysis stack in the background once the first page is on screen."""
+    thread = threading.Thread(target=importlib.import_module, args=("agents.data_analyst",), daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    return ResultCache(max_entries=int(os.environ.get("AGENTOPS_CACHE_ENTRIES", "64")), disk_dir=os.environ.get("AGENTOPS_CACHE_DIR"))
+
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """One run queue for every session on this server (``AGENTOPS_JOB_WORKERS`` / ``AGENTOPS_JOB_QUEUE``)."""
+    return JobManager()
+
+
+def submit_run(payload: OrchestratorInput, problem_statement: str, label: str) -> bool:
+    """Queue a run in the background; :func:`show_job` streams its progress and collects the result."""
+    cache = get_result_cache()
+    try:
+        job = get_job_manager().submit(session_id, lambda job: run_agent_cached(payload, cache, progress=job.progress, on_stage=job.stage), label)
+    except JobRejected as exc:
+        st.warning(str(exc))
+        return False
+    st.session_state["job"] = {"id": job.id, "payload": payload, "problem_statement": problem_statement}
+    return True
+
+
+def _show_partials(job: Job) -> None:
+    for stage, preview in list(job.partials.items()):
+        if "profile" in preview:
+            profile = preview["profile"]
+            st.caption(f"Profile: {profile['rows']:,} rows × {profile['cols']} columns")
+            st.dataframe(profile["preview"], width='stretch')
+        elif "findings" in preview:
+            for item in preview["findings"]:
+                st.markdown(f"- {item}")
+        elif "executive_summary" in preview:
+            for item in preview["executive_summary"]:
+                st.markdown(f"- {item}")
+        else:
+            st.json({stage: preview}, expanded=False)
+
+
+@st.fragment(run_every=0.5)
+def show_job(manager: JobManager) -> None:
+    """Poll the session's background run; on completion store it as ``last_run`` and rerun the page."""
+    pending = st.session_state.get("job")
+    job = manager.get(pending["id"]) if pending else None
+    if job is not None and job.state in ("queued", "running"):
+        with st.container(border=True):
+            if job.state == "queued":
+                counts = manager.stats()
+                st.info(f"Queued at position {manager.position(job)}; {counts['running']} of {counts['workers']} run slots busy ({job.queued_s:.0f}s waiting).")
+            else:
+                st.markdown(f"**Running: {job.label}** ({job.run_s:.1f}s)")
+                if job.ingest:
+                    done, total = job.ingest
+                    st.progress(min(done / max(total, 1), 1.0), text=f"Reading upload… {done / 1e6:.0f} / {total / 1e6:.0f} MB")
+                if job.stages:
+                    st.caption(" → ".join(f"{item['stage']} ({item['status']}, {item['ms']:.0f} ms)" for item in list(job.stages)))
+                _show_partials(job)
+            st.button("Cancel run", on_click=manager.cancel, args=(job.id,))
+        return
+
+    st.session_state.pop("job", None)
+    if job is not None and job.state == "done":
+        output, trace, refusal = job.result
+        payload = pending["payload"]
+        note = f"Job: queued {job.queued_s:.1f}s, ran {job.run_s:.1f}s"
+        # Keep the last result across widget reruns so the tabs, downloads and raw JSON toggle
+        # do not throw it away; deliverables are built lazily, once per result.
+        st.session_state["last_run"] = {
+            "payload": payload,
+            "problem_statement": pending["problem_statement"],
+            "output": output,
+            "trace": trace.model_copy(update={"memory": [*trace.memory, note]}),
+            "refusal": refusal,
+            "df": payload.tabular_df,
+            "deliverables": Deliverables(output) if output else None,
+        }
+    elif job is not None and job.state == "failed":
+        st.session_state["job_error"] = f"Run failed: {job.error}"
+    st.rerun()
+
 
 with st.sidebar:
     st.header("Inputs")
@@ -41,27 +144,41 @@ with st.sidebar:
 
     st.subheader("Innovative Controls")
     explain_mode = st.toggle("Explain Like I'm New", value=True)
-    stakeholder_mode = st.selectbox("Stakeholder Mode", ["CFO", "Plant Manager", "CISO", "Product Head"], index=0)
+    stakeholder_mode = st.selectbox("Stakeholder Mode", STAKEHOLDER_MODES, index=0)
     confidence_mode = st.select_slider("Confidence Slider", options=["Conservative", "Balanced", "Aggressive"], value="Balanced")
+    analysis_mode = st.radio("Analysis Mode", ["Exact", "Fast"], horizontal=True, help="Fast samples very large uploads and reports error bounds.")
+    with st.expander("Profiling", expanded=False):
+        capture_memory = st.toggle("Track peak memory (tracemalloc)", value=False)
+        capture_profile = st.toggle("Capture cProfile", value=False)
 
     st.subheader("Attachments")
     tabular_file = st.file_uploader("Upload CSV/Excel", type=["csv", "xlsx", "xls"])
+    tabular_sheet = None
+    if tabular_file is not None and tabular_file.name.lower().endswith((".xlsx", ".xls")):
+        from tools.excel_tools import list_sheets
+
+        try:
+            sheets = list_sheets(tabular_file.getvalue(), tabular_file.name)
+        except (ImportError, KeyError, zipfile.BadZipFile) as exc:
+            st.warning(f"Could not list workbook sheets: {exc}")
+        else:
+            tabular_sheet = st.selectbox("Sheet", sheets, help="Each sheet is cached as Parquet after its first load.")
+    duplicate_keys = st.text_input("Duplicate key columns (optional)", placeholder="e.g. customer_id")
     sop_file = st.file_uploader("Upload PDF/SOP (optional)", type=["pdf", "txt", "docx"])
-    metrics_file = st.file_uploader("Upload metrics JSON (optional)", type=["json"])
+    metrics_file = st.file_uploader("Upload metrics JSON/NDJSON (optional)", type=["json", "ndjson", "jsonl"])
 
     col_a, col_b = st.columns(2)
-    run_clicked = col_a.button("Run Agent", type="primary")
-    explain_clicked = col_b.button("Run with Explain Mode")
+    busy = "job" in st.session_state
+    run_clicked = col_a.button("Run Agent", type="primary", disabled=busy)
+    explain_clicked = col_b.button("Run with Explain Mode", disabled=busy)
+
+warm_data_stack()
 
 constraints: List[str] = quick_constraints + ([extra_constraints] if extra_constraints else [])
 if explain_clicked:
     explain_mode = True
 
 if run_clicked or explain_clicked:
-    df = None
-    if tabular_file is not None:
-        df = load_tabular_file(tabular_file.getvalue(), tabular_file.name)
-
     payload = OrchestratorInput(
         industry=industry,
         objective_type=objective_type,
@@ -70,13 +187,18 @@ if run_clicked or explain_clicked:
         explain_mode=explain_mode,
         stakeholder_mode=stakeholder_mode,
         confidence_mode=confidence_mode,
-        tabular_df=df,
         sop_bytes=sop_file.getvalue() if sop_file else None,
+        sop_name=sop_file.name if sop_file else None,
         metrics_bytes=metrics_file.getvalue() if metrics_file else None,
+        tabular_bytes=tabular_file.getvalue() if tabular_file else None,
+        tabular_name=tabular_file.name if tabular_file else None,
+        tabular_sheet=tabular_sheet,
+        analysis_mode=analysis_mode,
+        duplicate_keys=[key.strip() for key in duplicate_keys.split(",") if key.strip()],
+        capture_memory=capture_memory,
+        capture_profile=capture_profile,
     )
 
-    output, trace, refusal = run_agent(payload)
-
     update_memory(
         {
             "industry": industry,
@@ -84,14 +206,26 @@ if run_clicked or explain_clicked:
             "stakeholder_mode": stakeholder_mode,
             "confidence_mode": confidence_mode,
             "constraints": constraints,
-        }
+        },
+        session_id,
     )
+    submit_run(payload, problem_statement, objective_type)
+
+if "job" in st.session_state:
+    show_job(get_job_manager())
+if "job_error" in st.session_state:
+    st.error(st.session_state.pop("job_error"))
+
+last_run = st.session_state.get("last_run")
+if last_run:
+    output, trace, refusal, df = last_run["output"], last_run["trace"], last_run["refusal"], last_run["df"]
+    deliverables = last_run["deliverables"]
 
     left, center, right = st.columns([1, 2, 1])
 
     with left:
         st.markdown("### User Ask")
-        st.write(problem_statement or "(No problem entered)")
+        st.write(last_run["problem_statement"] or "(No problem entered)")
         st.markdown("### Agent Inference")
         for item in trace.inferred_requirements:
             st.markdown(f"- {item}")
@@ -107,38 +241,50 @@ if run_clicked or explain_clicked:
                 for bullet in output.executive_summary:
                     st.markdown(f"- {bullet}")
                 st.subheader("Top Risks")
-                st.table([r.model_dump() for r in output.recommendations.risks])
+                st.table(deliverables.risks)
                 st.subheader("Recommended Actions")
-                st.dataframe([a.model_dump() for a in output.recommendations.actions], width='stretch')
+                st.dataframe(deliverables.actions, width='stretch')
                 st.subheader("90-Day Plan")
                 for line in output.recommendations.plan_90_days:
                     st.markdown(f"- {line}")
                 st.metric("Confidence", f"{output.confidence:.0%}")
 
                 if df is not None and output.analysis.charts:
+                    from tools.viz_tools import render_chart
+
                     st.subheader("Charts")
-                    for spec in output.analysis.charts:
-                        fig = render_chart(df, spec.model_dump())
+                    for spec in output.dumped()["analysis"]["charts"]:
+                        fig = render_chart(df, spec)
                         if fig:
                             st.plotly_chart(fig, width='stretch')
 
             with tabs[1]:
-                memo = build_cfo_memo(output.executive_summary, [r.model_dump() for r in output.recommendations.risks], [a.model_dump() for a in output.recommendations.actions])
-                action_plan = build_ops_action_plan([a.model_dump() for a in output.recommendations.actions], output.recommendations.plan_90_days)
-                jira_csv = actions_to_csv([a.model_dump() for a in output.recommendations.actions])
-
-                st.download_button("Download CFO Memo (.md)", memo, file_name="cfo_memo.md")
-                st.download_button("Download Ops Action Plan (.md)", action_plan, file_name="ops_action_plan.md")
-                st.download_button("Download JIRA Tasks (.csv)", jira_csv, file_name="jira_tasks.csv")
-                st.json(output.model_dump())
+                # Callables defer rendering until the button is clicked.
+                st.download_button("Download all (.zip)", lambda: deliverables.bundle, file_name="agentops_deliverables.zip", mime="application/zip", type="primary", on_click="ignore")
+                st.download_button("Download CFO Memo (.md)", lambda: deliverables.cfo_memo, file_name="cfo_memo.md", on_click="ignore")
+                st.download_button("Download Ops Action Plan (.md)", lambda: deliverables.ops_action_plan, file_name="ops_action_plan.md", on_click="ignore")
+                st.download_button("Download JIRA Tasks (.csv)", lambda: deliverables.jira_csv, file_name="jira_tasks.csv", on_click="ignore")
+                if st.toggle("Show raw JSON", value=False):
+                    st.code(deliverables.output_json, language="json")
 
             with tabs[2]:
                 st.info("Ask follow-up questions in your workshop and rerun with changed assumptions (e.g., budget cut by 40%).")
-                follow_up = st.text_input("Ask a what-if question")
-                if follow_up:
-                    st.write("Suggested response strategy:")
-                    st.markdown(f"- Re-plan against: **{follow_up}**")
-                    st.markdown("- Reuse existing evidence and update assumptions/confidence.")
+                base = last_run["payload"]
+                follow_up = st.text_input("Ask a what-if question", placeholder="e.g. budget cut by 40%")
+                what_if_mode = st.selectbox("Re-plan for stakeholder", STAKEHOLDER_MODES, index=STAKEHOLDER_MODES.index(base.stakeholder_mode))
+                if st.button("Re-plan", disabled="job" in st.session_state or (not follow_up and what_if_mode == base.stakeholder_mode)):
+                    # Only constraints / stakeholder mode change, so ingest, profile and findings are reused.
+                    constraints = [item for item in base.constraints if not item.startswith("What-if: ")]
+                    what_if = dataclasses.replace(
+                        base,
+                        constraints=[*constraints, f"What-if: {follow_up}"] if follow_up else constraints,
+                        stakeholder_mode=what_if_mode,
+                    )
+                    if submit_run(what_if, last_run["problem_statement"], f"Re-plan for {what_if_mode}"):
+                        st.rerun()
+                if base.constraints and base.constraints[-1].startswith("What-if: "):
+                    reused = [item["stage"] for item in trace.stages if item["status"] == "reused"]
+                    st.caption(f"Re-planned against **{base.constraints[-1][9:]}**; reused stages: {', '.join(reused) or 'none'}.")
 
     with right:
         st.markdown("### Agent Trace")
@@ -147,13 +293,41 @@ if run_clicked or explain_clicked:
         with st.expander("Plan", expanded=True):
             st.write(trace.plan)
         with st.expander("Tool Calls", expanded=False):
-            st.json(trace.tool_calls)
+            st.json(trace.tool_calls, expanded=1)
+            for idx, call in enumerate(trace.tool_calls):
+                capped = call.get("output") if isinstance(call.get("output"), dict) else {}
+                if capped.get("truncated") and capped.get("ref") and st.toggle(f"Full {call['tool']} output ({capped['bytes'] / 1024:.0f} KB)", key=f"payload-{idx}"):
+                    full = load_trace_payload(get_result_cache(), capped["ref"])
+                    if full is None:
+                        st.caption("No longer cached; rerun to regenerate it.")
+                    else:
+                        st.json(full, expanded=False)
         with st.expander("Evidence", expanded=False):
             st.write(trace.evidence)
         with st.expander("Assumptions & Confidence", expanded=True):
             st.write(trace.assumptions_and_confidence)
         with st.expander("Memory", expanded=False):
             st.write({**memory, "session": trace.memory})
+        with st.expander("Stages", expanded=False):
+            if trace.stages:
+                st.dataframe(trace.stages, width='stretch')
+        with st.expander("Timing", expanded=False):
+            if trace.spans:
+                st.dataframe(
+                    [
+                        {
+                            "span": "· " * item["depth"] + item["name"],
+                            "wall_ms": item["wall_ms"],
+                            "cpu_ms": item["cpu_ms"],
+                            "peak_kb": item.get("peak_kb"),
+                        }
+                        for item in trace.spans
+                    ],
+                    width='stretch',
+                )
+                st.download_button("Download Chrome trace (.json)", json.dumps(chrome_trace(trace.spans)), file_name="agentops_trace.json")
+            if trace.profile:
+                st.code(trace.profile, language="text")
 
 else:
     st.info("Configure inputs in the left sidebar and click **Run Agent**.")
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+from agents.orchestrator import OrchestratorInput, run_agent
+
+DEFAULTS: Dict[str, Any] = {
+    "industry": "Other",
+    "constraints": [],
+    "explain_mode": False,
+    "stakeholder_mode": "CFO",
+    "confidence_mode": "Balanced",
+}
+FILE_FIELDS = {"tabular_path": "tabular_bytes", "sop_path": "sop_bytes", "metrics_path": "metrics_bytes"}
+INPUT_FIELDS = {item.name for item in fields(OrchestratorInput)}
+
+
+def _too_large(path: Path) -> bool:
+    from tools.outofcore_tools import needs_out_of_core
+
+    return needs_out_of_core(path)
+
+
+def build_input(record: Dict[str, Any], base_dir: Path) -> OrchestratorInput:
+    """Map one JSONL record onto OrchestratorInput.
+
+    Records may carry any OrchestratorInput field by name, plus ``tabular_path``,
+    ``sop_path`` and ``metrics_path`` resolved against the input file's directory. A
+    ``tabular_path`` larger than the memory budget is passed by path and analyzed out of core.
+    Backlog-style records with only ``title``/``body`` become strategy questions.
+    """
+    values = {**DEFAULTS, **{key: value for key, value in record.items() if key in INPUT_FIELDS}}
+    values.pop("tabular_path", None)
+    for path_field, bytes_field in FILE_FIELDS.items():
+        if not record.get(path_field):
+            continue
+        path = base_dir / record[path_field]
+        if path_field == "tabular_path" and _too_large(path):
+            values["tabular_path"] = str(path.resolve())
+        else:
+            values[bytes_field] = path.read_bytes()
+    if record.get("tabular_path"):
+        values.setdefault("tabular_name", Path(record["tabular_path"]).name)
+    if record.get("sop_path"):
+        values.setdefault("sop_name", Path(record["sop_path"]).name)
+    if not values.get("problem_statement"):
+        values["problem_statement"] = "\n\n".join(str(record[key]) for key in ("title", "body") if record.get(key))
+    if not values.get("objective_type"):
+        values["objective_type"] = "Analyze Data (CSV/Excel)" if values.get("tabular_bytes") or values.get("tabular_path") else "Decide Strategy (no data needed)"
+    return OrchestratorInput(**values)
+
+
+def _failed(record_id: str, exc: Exception, start: float) -> Dict[str, Any]:
+    return {"id": record_id, "ok": False, "error": f"{type(exc).__name__}: {exc}", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def run_record(record_id: str, record: Dict[str, Any], base_dir: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        output, trace, refusal = run_agent(build_input(record, Path(base_dir)))
+    except Exception as exc:  # one bad record must not stop the batch
+        return _failed(record_id, exc, start)
+    return {
+        "id": record_id,
+        "ok": True,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+        "routed_agent": trace.routed_agent,
+        "refusal": refusal,
+        "output": output.dumped() if output else None,
+        "trace": trace.dumped(),
+    }
+
+
+def read_records(path: Path) -> Iterator[Tuple[str, Union[Dict[str, Any], ValueError]]]:
+    """Yield ``(id, record)`` per non-blank line; a line that is not a JSON object yields its error instead."""
+    with path.open(encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield f"line {line_no}", exc
+                continue
+            if not isinstance(record, dict):
+                yield f"line {line_no}", ValueError(f"expected a JSON object, got {type(record).__name__}")
+                continue
+            yield str(record.get("request_id") or record.get("id") or line_no), record
+
+
+def _resolved(result: Dict[str, Any]) -> Future:
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def run_batch(input_path: Path, output_path: Path, workers: int = 4, max_in_flight: int | None = None) -> Dict[str, Any]:
+    start = time.perf_counter()
+    latencies: List[float] = []
+    failures: List[str] = []
+    refusals = 0
+    max_in_flight = max_in_flight or workers * 4
+    records = read_records(input_path)
+    with ProcessPoolExecutor(max_workers=workers) as pool, output_path.open("w", encoding="utf-8") as out:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                item = next(records, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if isinstance(item[1], ValueError):
+                    pending.add(_resolved(_failed(item[0], item[1], time.perf_counter())))
+                else:
+                    pending.add(pool.submit(run_record, item[0], item[1], str(input_path.parent)))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                latencies.append(result["latency_ms"])
+                if not result["ok"]:
+                    failures.append(result["id"])
+                elif result["refusal"]:
+                    refusals += 1
+                out.write(json.dumps(result, default=str) + "\n")
+                out.flush()
+    elapsed = time.perf_counter() - start
+    return {
+        "records": len(latencies),
+        "failures": len(failures),
+        "failed_ids": failures,
+        "refusals": refusals,
+        "wall_seconds": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay OrchestratorInput records from JSONL through run_agent.")
+    parser.add_argument("input", type=Path, help="JSONL file, one request per line")
+    parser.add_argument("--out", type=Path, default=Path("batch_results.jsonl"), help="JSONL file for AgentOutput/TraceBundle results")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="records queued at once (default: 4x workers)")
+    args = parser.parse_args(argv)
+    summary = run_batch(args.input, args.out, args.workers, args.max_in_flight)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "samples"
+GENERATION_CHUNK_ROWS = 1_000_000
+
+
+@dataclass
+class ColumnModel:
+    """Distribution fitted to one sample column."""
+
+    name: str
+    kind: str  # "id" | "flag" | "int" | "float" | "category"
+    mean: float = 0.0
+    std: float = 0.0
+    low: float = 0.0
+    decimals: int = 0
+    start: int = 0
+    categories: tuple = ()
+    weights: tuple = ()
+
+
+def _decimals(series: pd.Series) -> int:
+    return max((len(value.split(".")[1]) for value in series.dropna().astype(str) if "." in value), default=0)
+
+
+def fit_schema(sample: pd.DataFrame) -> List[ColumnModel]:
+    models = []
+    for col in sample.columns:
+        series = sample[col]
+        name = str(col).lower()
+        if not pd.api.types.is_numeric_dtype(series):
+            freq = series.value_counts(normalize=True)
+            models.append(ColumnModel(col, "category", categories=tuple(freq.index), weights=tuple(freq.to_numpy())))
+        elif name == "id" or name.endswith("_id"):
+            models.append(ColumnModel(col, "id", start=int(series.min())))
+        elif set(series.dropna().unique()) <= {0, 1}:
+            models.append(ColumnModel(col, "flag", mean=float(series.mean())))
+        else:
+            std = float(series.std(ddof=1)) if len(series) > 1 else 0.0
+            models.append(
+                ColumnModel(
+                    col,
+                    "int" if pd.api.types.is_integer_dtype(series) else "float",
+                    mean=float(series.mean()),
+                    std=std or abs(float(series.mean())) * 0.1,
+                    low=0.0 if series.min() >= 0 else -np.inf,
+                    decimals=_decimals(series),
+                )
+            )
+    return models
+
+
+def _widen(models: List[ColumnModel], cols: int) -> List[ColumnModel]:
+    """Pad to ``cols`` columns by cycling the sample's measure columns with fresh names."""
+    if cols <= len(models):
+        return models[:cols]
+    measures = [model for model in models if model.kind in ("int", "float")] or models
+    widened = list(models)
+    idx = 0
+    while len(widened) < cols:
+        base = measures[idx % len(measures)]
+        widened.append(ColumnModel(**{**base.__dict__, "name": f"{base.name}_{idx // len(measures) + 2}"}))
+        idx += 1
+    return widened
+
+
+def _column(model: ColumnModel, rows: int, offset: int, rng: np.random.Generator) -> np.ndarray:
+    if model.kind == "id":
+        return np.arange(model.start + offset, model.start + offset + rows, dtype="int64")
+    if model.kind == "flag":
+        return (rng.random(rows) < model.mean).astype("int8")
+    if model.kind == "category":
+        return rng.choice(np.asarray(model.categories, dtype=object), size=rows, p=np.asarray(model.weights))
+    values = np.maximum(rng.normal(model.mean, model.std, rows), model.low)
+    if model.kind == "int":
+        return np.rint(values).astype("int64")
+    return np.round(values, model.decimals)
+
+
+def _with_noise(model: ColumnModel, values: np.ndarray, rng: np.random.Generator, null_rate: float, outlier_rate: float) -> np.ndarray:
+    if model.kind not in ("int", "float"):
+        return values
+    spikes = rng.random(len(values)) < outlier_rate
+    values[spikes] += np.asarray(model.std * 8, dtype=values.dtype)
+    holes = rng.random(len(values)) < null_rate
+    if holes.any():
+        # As in a CSV with blanks, an integer column with nulls loads as float.
+        values = values.astype("float64")
+        values[holes] = np.nan
+    return values
+
+
+def generate(
+    sample: str,
+    rows: int,
+    cols: int | None = None,
+    seed: int = 0,
+    null_rate: float = 0.01,
+    outlier_rate: float = 0.005,
+    duplicate_rate: float = 0.01,
+) -> pd.DataFrame:
+    """Synthetic frame shaped like ``samples/<sample>.csv`` at ``rows`` x ``cols``.
+
+    Measure columns are drawn from normals fitted to the sample, categories from the
+    sample frequencies, and ``*_id`` columns stay sequential. A small share of nulls,
+    outliers and duplicate rows is injected so findings and anomaly paths do real work.
+    Rows are produced in chunks to bound peak memory on the 10M+ presets.
+    """
+    models = fit_schema(pd.read_csv(SAMPLES_DIR / f"{sample}.csv"))
+    if cols:
+        models = _widen(models, cols)
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for offset in range(0, rows, GENERATION_CHUNK_ROWS):
+        size = min(GENERATION_CHUNK_ROWS, rows - offset)
+        # Duplicates overwrite random rows with copies of other rows from the same chunk.
+        order = np.arange(size)
+        copies = int(size * duplicate_rate)
+        order[rng.integers(0, size, copies)] = rng.integers(0, size, copies)
+        chunks.append(pd.DataFrame({model.name: _with_noise(model, _column(model, size, offset, rng), rng, null_rate, outlier_rate)[order] for model in models}))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def metrics_payload(points: int, seed: int = 0) -> bytes:
+    """Metrics JSON for the ops route: latency/error/throughput series with a few spikes."""
+    rng = np.random.default_rng(seed)
+    latency = rng.gamma(4.0, 30.0, points)
+    latency[rng.random(points) < 0.01] *= 6
+    payload: Dict[str, object] = {
+        "service": "checkout-api",
+        "window": "1m",
+        "p95_latency_ms": np.round(latency, 1).tolist(),
+        "error_rate": np.round(rng.beta(1, 200, points), 5).tolist(),
+        "requests_per_min": rng.poisson(1_200, points).tolist(),
+    }
+    return json.dumps(payload).encode("utf-8")
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APP = REPO_ROOT / "app.py"
+FRAMEWORK = ("streamlit",)
+# Heavy or optional packages that must not load before the first page renders.
+DEFERRED = ("pandas", "numpy", "plotly", "pyarrow", "openpyxl", "python_calamine", "pypdf", "requests")
+DEFAULT_BUDGET_MS = 250.0
+_MARK = "@@import-budget "
+
+
+def startup_imports(path: Path = APP) -> List[str]:
+    """Module-level imports of ``path``: what runs before the first widget is drawn."""
+    modules: List[str] = []
+    for node in ast.parse(path.read_text(encoding="utf-8")).body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0 and node.module != "__future__":
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def _script(modules: Sequence[str]) -> str:
+    lines = ["import sys, json", "before = set(sys.modules)"]
+    for module in modules:
+        lines.append(f"sys.stderr.write({_MARK + module!r} + '\\n'); import {module}")
+    lines.append(f"print(json.dumps(sorted(set(sys.modules) - before)))")
+    return "\n".join(lines)
+
+
+def _parse(stderr: str) -> Dict[str, List[Tuple[str, int, int, int]]]:
+    """Group ``-X importtime`` rows (name, depth, self_us, cumulative_us) by the statement that triggered them."""
+    segments: Dict[str, List[Tuple[str, int, int, int]]] = defaultdict(list)
+    current = None
+    for line in stderr.splitlines():
+        if line.startswith(_MARK):
+            current = line[len(_MARK) :].strip()
+            continue
+        if current is None or not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|", 2)
+        # Nested imports are indented two spaces per level after the single separator space.
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        segments[current].append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return segments
+
+
+def measure_once(modules: Sequence[str]) -> Tuple[Dict[str, Any], List[str]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _script(modules)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    report: Dict[str, Any] = {}
+    for module, rows in _parse(proc.stderr).items():
+        packages: Dict[str, int] = defaultdict(int)
+        for name, _, self_us, _ in rows:
+            packages[name.split(".")[0]] += self_us
+        report[module] = {
+            "ms": round(sum(cumulative for _, depth, _, cumulative in rows if depth == 0) / 1000, 2),
+            "packages": {name: round(us / 1000, 2) for name, us in sorted(packages.items(), key=lambda item: -item[1])[:5]},
+        }
+    return report, loaded
+
+
+def measure(modules: Sequence[str], repeats: int = 3) -> Tuple[Dict[str, Any], List[str]]:
+    """Median per-module import time over fresh interpreters (one discarded warm-up for .pyc writes)."""
+    measure_once(modules)
+    runs = [measure_once(modules) for _ in range(repeats)]
+    merged: Dict[str, Any] = {}
+    for module in modules:
+        samples = [report.get(module, {"ms": 0.0, "packages": {}}) for report, _ in runs]
+        merged[module] = {"ms": round(statistics.median(item["ms"] for item in samples), 2), "packages": samples[-1]["packages"]}
+    return merged, runs[-1][1]
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Report each startup module's import cost and enforce a budget.")
+    parser.add_argument("--module", action="append", default=[], help="module to measure instead of app.py's imports (repeatable)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="allowed import time for first-party and third-party modules, excluding the framework")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    modules = args.module or startup_imports()
+    # Import the framework first so the app's own modules are charged only for what they add.
+    ordered = [module for module in modules if module.split(".")[0] in FRAMEWORK] + [module for module in modules if module.split(".")[0] not in FRAMEWORK]
+    report, loaded = measure(ordered, args.repeats)
+    own_ms = round(sum(item["ms"] for module, item in report.items() if module.split(".")[0] not in FRAMEWORK), 2)
+    framework_ms = round(sum(item["ms"] for module, item in report.items() if module.split(".")[0] in FRAMEWORK), 2)
+    framework_loaded = set()
+    if any(module.split(".")[0] in FRAMEWORK for module in ordered):
+        _, framework_loaded = measure_once([module for module in ordered if module.split(".")[0] in FRAMEWORK])
+        framework_loaded = set(framework_loaded)
+    eager = sorted({name.split(".")[0] for name in loaded if name.split(".")[0] in DEFERRED and name not in framework_loaded})
+    summary = {"modules": report, "framework_ms": framework_ms, "startup_ms": own_ms, "budget_ms": args.budget_ms, "eager_deferred": eager}
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for module, item in report.items():
+            heaviest = ", ".join(f"{name} {ms:.1f}" for name, ms in item["packages"].items())
+            tag = " (framework)" if module.split(".")[0] in FRAMEWORK else ""
+            print(f"  {module + tag:<36} {item['ms']:>9.1f} ms   {heaviest}")
+        print(f"startup imports: {own_ms:.1f} ms (budget {args.budget_ms:.0f} ms), framework: {framework_ms:.1f} ms")
+        if eager:
+            print(f"DEFERRED MODULES IMPORTED AT STARTUP: {', '.join(eager)}")
+    return 1 if own_ms > args.budget_ms or eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROUTES = {
+    "strategy": "Decide Strategy (no data needed)",
+    "data": "Analyze Data (CSV/Excel)",
+    "ops": "Monitor & Diagnose (metrics/logs)",
+}
+
+
+def encode_multipart(record: Dict[str, Any], files: Dict[str, Tuple[str, bytes]]) -> Tuple[bytes, str]:
+    """``request`` JSON part plus one part per upload, as the API server expects."""
+    boundary = uuid.uuid4().hex
+    chunks = [f'--{boundary}\r\nContent-Disposition: form-data; name="request"\r\nContent-Type: application/json\r\n\r\n'.encode(), json.dumps(record).encode(), b"\r\n"]
+    for part, (filename, data) in files.items():
+        chunks += [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{part}"; filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode(),
+            data,
+            b"\r\n",
+        ]
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return b"".join(chunks), f"multipart/form-data; boundary={boundary}"
+
+
+def request_factory(route: str, rows: int, points: int, reuse_data: bool = False) -> Callable[[int], Tuple[bytes, str]]:
+    """Build request ``i``.
+
+    Problem statements differ per request so the result cache cannot answer them whole.
+    Uploads differ too (one seed per request) unless ``reuse_data``, which measures the
+    warm path where ingest, profile and findings come from the stage cache.
+    """
+
+    def upload(i: int) -> Dict[str, Tuple[str, bytes]]:
+        seed = 0 if reuse_data else i
+        if route == "data":
+            from benchmarks.generators import generate
+
+            return {"tabular": ("load.csv", generate("credit_risk", rows, seed=seed).to_csv(index=False).encode("utf-8"))}
+        if route == "ops":
+            from benchmarks.generators import metrics_payload
+
+            return {"metrics": ("metrics.json", metrics_payload(points, seed=seed))}
+        return {}
+
+    def make(i: int) -> Tuple[bytes, str]:
+        files = upload(i)
+        record = {
+            "industry": "Manufacturing",
+            "objective_type": ROUTES[route],
+            "problem_statement": f"Load test request {i}: where should we act first?",
+            "constraints": ["Budget limit"],
+        }
+        if files:
+            return encode_multipart(record, files)
+        return json.dumps(record).encode("utf-8"), "application/json"
+
+    return make
+
+
+def _post(url: str, body: bytes, content_type: str, client_id: str, timeout: float) -> Tuple[int, float]:
+    request = urllib.request.Request(f"{url}/v1/run?trace=0", data=body, method="POST", headers={"Content-Type": content_type, "X-Client-Id": client_id})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        exc.read()
+        status = exc.code
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def run_level(
+    url: str,
+    concurrency: int,
+    requests: int,
+    make: Callable[[int], Tuple[bytes, str]],
+    first: int = 0,
+    timeout: float = 300.0,
+) -> Dict[str, Any]:
+    """Send requests ``first`` .. ``first + requests - 1`` from ``concurrency`` closed-loop clients."""
+    bodies = [make(first + i) for i in range(requests)]
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    results: List[Tuple[int, float]] = []
+
+    def client(idx: int) -> None:
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            outcome = _post(url, *bodies[i], f"load-{idx}", timeout)
+            with lock:
+                results.append(outcome)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ok = [latency * 1000 for status, latency in results if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected_429": sum(1 for status, _ in results if status == 429),
+        "errors": sum(1 for status, _ in results if status not in (200, 429)),
+        "wall_seconds": round(elapsed, 3),
+        "throughput_per_s": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(ok, 50), 2),
+        "p95_ms": round(_percentile(ok, 95), 2),
+        "p99_ms": round(_percentile(ok, 99), 2),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure API throughput and latency against client concurrency.")
+    parser.add_argument("--url", default=None, help="running API server (default: start one in-process on a free port)")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=40, help="requests per concurrency level")
+    parser.add_argument("--route", choices=sorted(ROUTES), default="strategy")
+    parser.add_argument("--rows", type=int, default=20_000, help="CSV rows for --route data")
+    parser.add_argument("--points", type=int, default=5_000, help="metric points for --route ops")
+    parser.add_argument("--reuse-data", action="store_true", help="send the same upload every time (warm stage cache)")
+    parser.add_argument("--workers", type=int, default=2, help="worker pool size of the in-process server")
+    parser.add_argument("--queue", type=int, default=16, help="queue limit of the in-process server")
+    parser.add_argument("--json", action="store_true", help="print the levels as JSON")
+    args = parser.parse_args(argv)
+
+    server: Optional[Any] = None
+    url = args.url
+    if url is None:
+        from api_server import AgentApi, make_server
+
+        server = make_server("127.0.0.1", 0, AgentApi(args.workers, args.queue))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+    make = request_factory(args.route, args.rows, args.points, args.reuse_data)
+    levels = []
+    try:
+        for idx, concurrency in enumerate(int(item) for item in args.concurrency.split(",") if item.strip()):
+            level = run_level(url.rstrip("/"), concurrency, args.requests, make, first=idx * args.requests)
+            levels.append(level)
+            if not args.json:
+                print(
+                    f"  c={level['concurrency']:<4} {level['throughput_per_s']:>8.2f} req/s  p50 {level['p50_ms']:>9.1f} ms  "
+                    f"p95 {level['p95_ms']:>9.1f} ms  p99 {level['p99_ms']:>9.1f} ms  429s {level['rejected_429']:>4}  errors {level['errors']}"
+                )
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    if args.json:
+        print(json.dumps({"url": url, "route": args.route, "levels": levels}, indent=2))
+    return 1 if any(level["errors"] for level in levels) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
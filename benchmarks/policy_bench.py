@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import string
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from tools.safety import BANNED_TERMS, PolicyMatcher, enforce_constraints
+
+LOG_TOKENS = ["error", "timeout", "svc=orders", "GET", "/api/v1/orders", "200", "503", "latency=35ms", "retrying", "SLA", "upstream", "reset"]
+
+
+def synthetic_terms(count: int, seed: int = 0) -> List[str]:
+    """``count`` policy terms: mostly single words, some phrases, prefix and substring terms."""
+    rng = random.Random(seed)
+    word = lambda: "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+    terms = list(BANNED_TERMS)
+    while len(terms) < count:
+        roll = rng.random()
+        terms.append(f"{word()} {word()}" if roll < 0.2 else f"{word()}*" if roll < 0.3 else f"*{word()}*" if roll < 0.32 else word())
+    return terms
+
+
+def synthetic_log(kb: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts: List[str] = []
+    size = 0
+    while size < kb * 1024:
+        token = rng.choice(LOG_TOKENS)
+        parts.append(token)
+        size += len(token) + 1
+    return "Why did checkout latency spike? Pasted log:\n" + " ".join(parts)
+
+
+def naive_first(terms: List[str], text: str) -> bool:
+    """The previous implementation: lowercase copy plus one substring scan per term."""
+    lower = text.lower()
+    return any(term.strip("*") in lower for term in terms)
+
+
+def naive_enforce(constraints: List[str], actions: List[dict]) -> List[dict]:
+    tuned = []
+    for rec in actions:
+        normalized = " ".join(constraints).lower()  # rebuilt per action, as before
+        action = rec.copy()
+        if "budget" in normalized:
+            action["impact"] = f"Cost-aware: {action['impact']}"
+        if "hipaa" in normalized or "gdpr" in normalized or "pci" in normalized:
+            action["action"] = f"[Compliance Review Required] {action['action']}"
+        tuned.append(action)
+    return tuned
+
+
+def timed(fn: Callable[[], Any], repeats: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Throughput of the compiled safety policy against per-term substring scans.")
+    parser.add_argument("--terms", type=int, default=5000)
+    parser.add_argument("--text-kb", type=int, default=500, help="size of the pasted-log problem statement")
+    parser.add_argument("--actions", type=int, default=10_000, help="actions per enforce_constraints batch")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    terms = synthetic_terms(args.terms)
+    text = synthetic_log(args.text_kb)
+    mb = len(text.encode("utf-8")) / 1e6
+    start = time.perf_counter()
+    policy = PolicyMatcher(terms)
+    build_s = time.perf_counter() - start
+    scan_s = timed(lambda: policy.first(text), args.repeats)
+    naive_s = timed(lambda: naive_first(terms, text), max(1, args.repeats // 5))
+    constraints = ["Budget limit", "Compliance: HIPAA", "Latency <200ms", "What-if: budget cut by 40%"]
+    actions = [{"action": f"Action {idx}", "owner": "Ops", "timeframe": "Q1", "impact": "Lower cost"} for idx in range(args.actions)]
+    enforce_s = timed(lambda: enforce_constraints(constraints, actions), args.repeats)
+    naive_enforce_s = timed(lambda: naive_enforce(constraints, actions), args.repeats)
+
+    report: Dict[str, Any] = {
+        "terms": policy.terms,
+        "text_mb": round(mb, 3),
+        "build_ms": round(build_s * 1000, 2),
+        "scan_ms": round(scan_s * 1000, 2),
+        "scan_mb_per_s": round(mb / scan_s, 2),
+        "naive_scan_ms": round(naive_s * 1000, 2),
+        "naive_mb_per_s": round(mb / naive_s, 2),
+        "enforce_ms": round(enforce_s * 1000, 2),
+        "naive_enforce_ms": round(naive_enforce_s * 1000, 2),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"policy: {report['terms']} terms compiled in {report['build_ms']:.1f} ms")
+        print(f"refusal scan of {report['text_mb']:.2f} MB: {report['scan_ms']:.1f} ms ({report['scan_mb_per_s']:.1f} MB/s); per-term substring scan {report['naive_scan_ms']:.1f} ms ({report['naive_mb_per_s']:.2f} MB/s)")
+        print(f"enforce_constraints on {args.actions} actions: {report['enforce_ms']:.1f} ms; per-action re-join {report['naive_enforce_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agents.orchestrator import OrchestratorInput, run_agent
+from benchmarks.generators import generate, metrics_payload
+from tools import data_tools, stats_tools, viz_tools
+from tools.profiling import span, tracing
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "latest.json"
+
+# (sample, rows, cols); cols=None keeps the sample's own columns.
+PRESETS: Dict[str, List[Tuple[str, int, Optional[int]]]] = {
+    "smoke": [("credit_risk", 10_000, None), ("manufacturing_defects", 10_000, None), ("credit_risk", 500_000, 10)],
+    "standard": [
+        ("credit_risk", 100_000, 10),
+        ("manufacturing_defects", 100_000, 10),
+        ("credit_risk", 1_000_000, 50),
+        ("manufacturing_defects", 100_000, 200),
+    ],
+    "large": [
+        ("credit_risk", 10_000_000, 10),
+        ("manufacturing_defects", 1_000_000, 200),
+        ("credit_risk", 100_000, 1_000),
+    ],
+    "xl": [("credit_risk", 50_000_000, 10), ("manufacturing_defects", 1_000_000, 1_000)],
+}
+
+SOP_TEXT = b"1. Receive order\n2. Validate credit\n3. Pick and pack\n4. Ship\n5. Invoice\n" * 200
+
+
+def measure(fn: Callable[[], Any], repeats: int, track_memory: bool = True) -> Dict[str, Any]:
+    """Median/min wall time over ``repeats`` runs, plus peak traced memory from one extra run.
+
+    The memory run goes first and doubles as warm-up, so timed runs exclude import and
+    first-call costs and are not slowed by tracemalloc.
+    """
+    peak_mb = None
+    if track_memory:
+        with tracing(capture_memory=True) as tracer:
+            with span("benchmark"):
+                fn()
+        root = next(item for item in tracer.spans if item["name"] == "benchmark" and item["depth"] == 0)
+        peak_mb = round(root["peak_kb"] / 1024, 2)
+    else:
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "seconds_median": round(statistics.median(times), 6),
+        "seconds_min": round(min(times), 6),
+        "repeats": repeats,
+        "peak_mb": peak_mb,
+    }
+
+
+def dataset_cases(df: pd.DataFrame, csv_bytes: bytes) -> List[Tuple[str, Callable[[], Any]]]:
+    cases: List[Tuple[str, Callable[[], Any]]] = [
+        ("data_tools.load_tabular_file", lambda: data_tools.load_tabular_file(csv_bytes, "bench.csv")),
+        ("data_tools.optimize_dtypes", lambda: data_tools.optimize_dtypes(df.copy())),
+        ("stats_tools.compute_stats", lambda: stats_tools.compute_stats(df)),
+        ("stats_tools.compute_stats[sharded]", lambda: stats_tools.compute_stats(df, workers=os.cpu_count())),
+        ("stats_tools.compute_fast_stats", lambda: stats_tools.compute_fast_stats(df)),
+        ("data_tools.profile_dataset", lambda: data_tools.profile_dataset(df)),
+        ("data_tools.basic_findings", lambda: data_tools.basic_findings(df)),
+        ("data_tools.score_outliers", lambda: data_tools.score_outliers(df, workers=os.cpu_count())),
+        ("data_tools.detect_anomalies", lambda: data_tools.detect_anomalies(df)),
+        ("viz_tools.suggest_charts", lambda: viz_tools.suggest_charts(df)),
+    ]
+    for spec in viz_tools.suggest_charts(df):
+        cases.append((f"viz_tools.aggregate_chart[{spec['type']}]", lambda spec=spec: viz_tools.aggregate_chart(df, spec)))
+        cases.append((f"viz_tools.render_chart[{spec['type']}]", lambda spec=spec: viz_tools.render_chart(df, spec)))
+    payload = dict(
+        industry="Other",
+        objective_type="Analyze Data (CSV/Excel)",
+        problem_statement="Benchmark: where are the data quality and variance issues?",
+        constraints=["Budget limit"],
+        explain_mode=False,
+        stakeholder_mode="CFO",
+        confidence_mode="Balanced",
+    )
+    cases.append(("run_agent[analyze]", lambda: run_agent(OrchestratorInput(**payload, tabular_df=df))))
+    cases.append(("run_agent[analyze-fast]", lambda: run_agent(OrchestratorInput(**payload, tabular_df=df, analysis_mode="Fast"))))
+    return cases
+
+
+def route_cases(metrics_points: int) -> List[Tuple[str, Callable[[], Any]]]:
+    base = dict(
+        industry="Manufacturing",
+        problem_statement="Benchmark: reduce downtime without adding headcount.",
+        constraints=["Budget limit", "Compliance: GDPR"],
+        explain_mode=True,
+        stakeholder_mode="Plant Manager",
+        confidence_mode="Balanced",
+    )
+    metrics = metrics_payload(metrics_points)
+    return [
+        ("run_agent[strategy]", lambda: run_agent(OrchestratorInput(**base, objective_type="Decide Strategy (no data needed)"))),
+        ("run_agent[process]", lambda: run_agent(OrchestratorInput(**base, objective_type="Design a Process (SOP/workflow)", sop_bytes=SOP_TEXT))),
+        ("run_agent[ops]", lambda: run_agent(OrchestratorInput(**base, objective_type="Monitor & Diagnose (metrics/logs)", metrics_bytes=metrics))),
+    ]
+
+
+def _selected(name: str, patterns: List[str]) -> bool:
+    return not patterns or any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def _format(result: Dict[str, Any]) -> str:
+    peak = "-" if result["peak_mb"] is None else f"{result['peak_mb']:.1f}"
+    return f"  {result['name']:<44} {result['seconds_median'] * 1000:>10.1f} ms  {peak:>8} MB"
+
+
+def run_suite(
+    datasets: List[Tuple[str, int, Optional[int]]],
+    repeats: int = 3,
+    track_memory: bool = True,
+    only: Optional[List[str]] = None,
+    metrics_points: int = 10_000,
+    log: Callable[[str], None] = print,
+) -> List[Dict[str, Any]]:
+    only = only or []
+    results: List[Dict[str, Any]] = []
+    for sample, rows, cols in datasets:
+        start = time.perf_counter()
+        df = generate(sample, rows, cols)
+        csv_bytes = df.to_csv(index=False).encode("utf-8") if _selected("data_tools.load_tabular_file", only) else b""
+        label = f"{sample}:{rows}x{df.shape[1]}"
+        log(f"[{label}] generated in {time.perf_counter() - start:.1f}s ({len(csv_bytes) / 1e6:.1f} MB CSV)")
+        for name, fn in dataset_cases(df, csv_bytes):
+            if _selected(name, only):
+                result = {"name": name, "dataset": label, "rows": rows, "cols": int(df.shape[1]), **measure(fn, repeats, track_memory)}
+                log(_format(result))
+                results.append(result)
+        del df, csv_bytes
+    for name, fn in route_cases(metrics_points):
+        if _selected(name, only):
+            result = {"name": name, "dataset": "-", "rows": 0, "cols": 0, **measure(fn, repeats, track_memory)}
+            log(_format(result))
+            results.append(result)
+    return results
+
+
+def fast_mode_checks(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Datasets large enough to be sampled where Fast stats were not faster than Exact."""
+    timings = {(item["name"], item["dataset"]): item for item in results}
+    failures = []
+    for item in results:
+        exact = timings.get(("stats_tools.compute_stats", item["dataset"]))
+        if item["name"] != "stats_tools.compute_fast_stats" or item["rows"] <= stats_tools.FAST_SAMPLE_ROWS or exact is None:
+            continue
+        if item["seconds_median"] >= exact["seconds_median"]:
+            failures.append({"name": item["name"], "dataset": item["dataset"], "metric": "fast_vs_exact", "baseline": exact["seconds_median"], "current": item["seconds_median"], "ratio": round(item["seconds_median"] / max(exact["seconds_median"], 1e-9), 2)})
+    return failures
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    time_tolerance: float = 0.25,
+    memory_tolerance: float = 0.25,
+    min_seconds: float = 0.005,
+) -> List[Dict[str, Any]]:
+    """Cases slower (or hungrier) than baseline by more than the tolerance.
+
+    Timings under ``min_seconds`` in both runs are treated as noise and never flagged.
+    """
+    previous = {(item["name"], item["dataset"]): item for item in baseline}
+    regressions = []
+    for item in results:
+        old = previous.get((item["name"], item["dataset"]))
+        if old is None:
+            continue
+        if max(item["seconds_median"], old["seconds_median"]) >= min_seconds and item["seconds_median"] > old["seconds_median"] * (1 + time_tolerance):
+            regressions.append({"name": item["name"], "dataset": item["dataset"], "metric": "seconds_median", "baseline": old["seconds_median"], "current": item["seconds_median"], "ratio": round(item["seconds_median"] / max(old["seconds_median"], 1e-9), 2)})
+        if item.get("peak_mb") and old.get("peak_mb") and item["peak_mb"] > old["peak_mb"] * (1 + memory_tolerance) and item["peak_mb"] - old["peak_mb"] > 1:
+            regressions.append({"name": item["name"], "dataset": item["dataset"], "metric": "peak_mb", "baseline": old["peak_mb"], "current": item["peak_mb"], "ratio": round(item["peak_mb"] / old["peak_mb"], 2)})
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Time and memory benchmarks for data/viz tools and run_agent routes.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="smoke")
+    parser.add_argument("--dataset", action="append", default=[], metavar="SAMPLE:ROWSxCOLS", help="extra dataset, e.g. credit_risk:2000000x40 (repeatable)")
+    parser.add_argument("--only", action="append", default=[], metavar="GLOB", help="run only matching cases, e.g. 'viz_tools.*' (repeatable)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory run")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/memory growth before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    datasets = list(PRESETS[args.preset])
+    for spec in args.dataset:
+        sample, shape = spec.split(":")
+        rows, _, cols = shape.partition("x")
+        datasets.append((sample, int(rows), int(cols) if cols else None))
+
+    results = run_suite(datasets, args.repeats, not args.no_memory, args.only)
+    report: Dict[str, Any] = {"preset": args.preset, "environment": environment(), "results": results}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+        report["baseline"] = {"path": str(args.baseline), "environment": baseline.get("environment")}
+        report["regressions"] = compare(results, baseline.get("results", []), args.tolerance, args.tolerance)
+    report["regressions"] = report.get("regressions", []) + fast_mode_checks(results)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline written to {args.baseline}")
+    regressions = report.get("regressions", [])
+    for item in regressions:
+        print(f"REGRESSION {item['name']} [{item['dataset']}] {item['metric']}: {item['baseline']} -> {item['current']} ({item['ratio']}x)")
+    print(f"{len(results)} cases, {len(regressions)} regressions; results in {args.out}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
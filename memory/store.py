@@ -1,25 +1,87 @@
 from __future__ import annotations
 
 import json
+import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 
 MEMORY_FILE = Path("memory/session_memory.json")
+MEMORY_DB = Path("memory/session_memory.db")
+GLOBAL_SESSION = "global"
 
+_local = threading.local()
 
-def load_memory() -> Dict[str, Any]:
-    if not MEMORY_FILE.exists():
-        return {}
+
+def _migrate_legacy(conn: sqlite3.Connection) -> None:
+    if not MEMORY_FILE.exists() or conn.execute("SELECT 1 FROM memory LIMIT 1").fetchone():
+        return
     try:
-        return json.loads(MEMORY_FILE.read_text())
+        legacy = json.loads(MEMORY_FILE.read_text())
     except json.JSONDecodeError:
-        return {}
+        return
+    if isinstance(legacy, dict):
+        _upsert(conn, GLOBAL_SESSION, legacy)
+
+
+def _connect() -> sqlite3.Connection:
+    """One connection per thread and database path; WAL lets readers run alongside a writer."""
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None) or {}
+    _local.connections = connections
+    key = str(MEMORY_DB.resolve())
+    conn = connections.get(key)
+    if conn is None:
+        MEMORY_DB.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(MEMORY_DB, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            "session_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (session_id, key))"
+        )
+        conn.commit()
+        _migrate_legacy(conn)
+        connections[key] = conn
+    return conn
+
+
+def _read_cache() -> Dict[Tuple[str, str], Tuple[int, Dict[str, Any]]]:
+    cache = getattr(_local, "cache", None)
+    if cache is None:
+        cache = _local.cache = {}
+    return cache
+
+
+def _upsert(conn: sqlite3.Connection, session_id: str, patch: Dict[str, Any]) -> None:
+    now = time.time()
+    with conn:
+        conn.executemany(
+            "INSERT INTO memory (session_id, key, value, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(session_id, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            [(session_id, key, json.dumps(value), now) for key, value in patch.items()],
+        )
+
+
+def load_memory(session_id: str = GLOBAL_SESSION) -> Dict[str, Any]:
+    conn = _connect()
+    # data_version moves whenever another connection commits, so a cached read stays valid
+    # until someone else writes; this connection's own writes invalidate explicitly.
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    cache_key = (str(MEMORY_DB.resolve()), session_id)
+    cached = _read_cache().get(cache_key)
+    if cached and cached[0] == version:
+        return dict(cached[1])
+    rows = conn.execute("SELECT key, value FROM memory WHERE session_id = ?", (session_id,)).fetchall()
+    mem = {key: json.loads(value) for key, value in rows}
+    _read_cache()[cache_key] = (version, mem)
+    return dict(mem)
 
 
-def update_memory(patch: Dict[str, Any]) -> Dict[str, Any]:
-    mem = load_memory()
-    mem.update(patch)
-    MEMORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    MEMORY_FILE.write_text(json.dumps(mem, indent=2))
-    return mem
+def update_memory(patch: Dict[str, Any], session_id: str = GLOBAL_SESSION) -> Dict[str, Any]:
+    conn = _connect()
+    _upsert(conn, session_id, patch)
+    _read_cache().pop((str(MEMORY_DB.resolve()), session_id), None)
+    return load_memory(session_id)
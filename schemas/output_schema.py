@@ -1,51 +1,76 @@
 from __future__ import annotations
 
-from typing import List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 
 Severity = Literal["high", "med", "low"]
 
 
-class ChartSpec(BaseModel):
+class _Schema(BaseModel):
+    # Build validators on first use rather than at import; they are then cached on the
+    # class for the life of the process (Streamlit reruns reuse the imported module).
+    model_config = ConfigDict(defer_build=True)
+
+    _dump: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+
+    def dumped(self) -> Dict[str, Any]:
+        """``model_dump()`` computed once per instance; treat the result as read-only."""
+        if self._dump is None:
+            self._dump = self.model_dump()
+        return self._dump
+
+    def model_copy(self, *, update: Optional[Dict[str, Any]] = None, deep: bool = False):
+        copied = super().model_copy(update=update, deep=deep)
+        copied._dump = None  # the copy may differ; never inherit a stale dump
+        return copied
+
+    def __eq__(self, other: object) -> bool:
+        # Field values only, so whether dumped() has run does not affect equality.
+        if not isinstance(other, BaseModel):
+            return NotImplemented
+        return type(self) is type(other) and self.__dict__ == other.__dict__
+
+
+class ChartSpec(_Schema):
     title: str
     type: str
     cols: List[str] = Field(default_factory=list)
 
 
-class ActionItem(BaseModel):
+class ActionItem(_Schema):
     action: str
     owner: str
     timeframe: str
     impact: str
 
 
-class RiskItem(BaseModel):
+class RiskItem(_Schema):
     risk: str
     severity: Severity
     mitigation: str
 
 
-class ProblemUnderstanding(BaseModel):
+class ProblemUnderstanding(_Schema):
     goal: str
     success_metrics: List[str] = Field(default_factory=list)
     constraints: List[str] = Field(default_factory=list)
 
 
-class AnalysisSection(BaseModel):
+class AnalysisSection(_Schema):
     key_findings: List[str] = Field(default_factory=list)
     charts: List[ChartSpec] = Field(default_factory=list)
     anomalies: List[str] = Field(default_factory=list)
 
 
-class RecommendationSection(BaseModel):
+class RecommendationSection(_Schema):
     actions: List[ActionItem] = Field(default_factory=list)
     risks: List[RiskItem] = Field(default_factory=list)
     plan_90_days: List[str] = Field(default_factory=list)
 
 
-class AgentOutput(BaseModel):
+class AgentOutput(_Schema):
     executive_summary: List[str] = Field(default_factory=list)
     problem_understanding: ProblemUnderstanding
     analysis: AnalysisSection
@@ -54,7 +79,7 @@ class AgentOutput(BaseModel):
     confidence: float = Field(ge=0.0, le=1.0)
 
 
-class TraceBundle(BaseModel):
+class TraceBundle(_Schema):
     inferred_requirements: List[str] = Field(default_factory=list)
     plan: List[str] = Field(default_factory=list)
     tool_calls: List[dict] = Field(default_factory=list)
@@ -62,3 +87,6 @@ class TraceBundle(BaseModel):
     assumptions_and_confidence: List[str] = Field(default_factory=list)
     memory: List[str] = Field(default_factory=list)
     routed_agent: Optional[str] = None
+    stages: List[dict] = Field(default_factory=list)
+    spans: List[dict] = Field(default_factory=list)
+    profile: Optional[str] = None
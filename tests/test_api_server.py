@@ -0,0 +1,93 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from api_server import AgentApi, make_server
+
+STRATEGY = {"objective_type": "Decide Strategy (no data needed)", "problem_statement": "Should we open a second warehouse?"}
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(api: AgentApi):
+        server = make_server("127.0.0.1", 0, api)
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+        return server.server_address[1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _post(port: int, body: bytes, length: str = None, content_type: str = "application/json"):
+    """Raw request, so malformed headers reach the server unchanged; returns (status, JSON body)."""
+    head = f"POST /v1/run HTTP/1.1\r\nHost: test\r\nContent-Type: {content_type}\r\nConnection: close\r\n"
+    head += f"Content-Length: {len(body) if length is None else length}\r\n\r\n"
+    with socket.create_connection(("127.0.0.1", port), timeout=30) as conn:
+        conn.sendall(head.encode("latin-1") + body)
+        raw = b""
+        while chunk := conn.recv(65536):
+            raw += chunk
+    status_line, _, rest = raw.partition(b"\r\n")
+    return int(status_line.split()[1]), json.loads(rest.partition(b"\r\n\r\n")[2] or b"{}")
+
+
+def test_valid_run(serve):
+    status, body = _post(serve(AgentApi(workers=1)), json.dumps(STRATEGY).encode())
+    assert status == 200 and body["ok"] and body["routed_agent"] == "Multi-Agent Boardroom"
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        {**STRATEGY, "constraints": "budget"},
+        {**STRATEGY, "constraints": ["ok", 3]},
+        {**STRATEGY, "explain_mode": "yes"},
+        {**STRATEGY, "problem_statement": 5},
+        {**STRATEGY, "tabular_bytes": "abc"},
+        ["not", "an", "object"],
+    ],
+)
+def test_bad_fields_are_400(serve, record):
+    status, body = _post(serve(AgentApi(workers=1)), json.dumps(record).encode())
+    assert status == 400 and not body["ok"]
+
+
+def test_invalid_json_is_400(serve):
+    assert _post(serve(AgentApi(workers=1)), b"{not json")[0] == 400
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1.5", "²", "³"])
+def test_bad_content_length_is_400(serve, length):
+    assert _post(serve(AgentApi(workers=1)), b"{}", length=length)[0] == 400
+
+
+def test_unsupported_content_type_is_415(serve):
+    assert _post(serve(AgentApi(workers=1)), b"x", content_type="text/plain")[0] == 415
+
+
+def test_full_queue_is_429(serve):
+    api = AgentApi(workers=1, max_queued=0)
+    status, body = _post(serve(api), json.dumps(STRATEGY).encode())
+    assert status == 429 and api.rejected == 1
+
+
+def test_timeout_cancels_the_running_job_at_the_next_stage(serve, monkeypatch):
+    from agents import boardroom
+
+    # The boardroom's own delay hook keeps the run busy past the API timeout.
+    monkeypatch.setattr(boardroom, "get_default_backend", lambda: boardroom.HeuristicLensBackend({"Market": 0.5}))
+    api = AgentApi(workers=1, timeout=0.2)
+    status, _ = _post(serve(api), json.dumps(STRATEGY).encode())
+    assert status == 504
+    (job,) = api.jobs._jobs.values()
+    assert job.started is not None
+    assert job.wait(10) and job.state == "cancelled"
+    assert api.jobs.stats()["running"] == 0
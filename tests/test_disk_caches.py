@@ -0,0 +1,73 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from memory.result_cache import prune_directory, touch
+
+
+def _file(path, size, age):
+    path.write_bytes(b"x" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_prune_directory_removes_least_recently_used_first(tmp_path):
+    old = _file(tmp_path / "old.parquet", 100, 30)
+    mid = _file(tmp_path / "mid.parquet", 100, 20)
+    new = _file(tmp_path / "new.parquet", 100, 10)
+    other = _file(tmp_path / "notes.txt", 1000, 40)
+    touch(old)
+    assert prune_directory(tmp_path, "*.parquet", 200) == 100
+    assert not mid.exists() and old.exists() and new.exists() and other.exists()
+
+
+def test_prune_directory_never_removes_keep(tmp_path):
+    big = _file(tmp_path / "big.parquet", 500, 0)
+    _file(tmp_path / "small.parquet", 10, 10)
+    prune_directory(tmp_path, "*.parquet", 100, keep=big)
+    assert [path.name for path in tmp_path.iterdir()] == ["big.parquet"]
+
+
+def test_spills_are_evicted_past_the_cap(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    from tools.outofcore_tools import spill_to_parquet
+
+    cache = tmp_path / "spill"
+    tables = []
+    for idx in range(3):
+        source = tmp_path / f"export_{idx}.csv"
+        pd.DataFrame({"a": range(idx, idx + 5000), "b": [f"v{idx}"] * 5000}).to_csv(source, index=False)
+        tables.append(source)
+    first = spill_to_parquet(tables[0], cache_dir=cache)
+    size = os.path.getsize(first.path)
+    monkeypatch.setenv("AGENTOPS_SPILL_MAX_MB", str(2.5 * size / (1024 * 1024)))
+    spill_to_parquet(tables[1], cache_dir=cache)
+    time.sleep(0.01)
+    spill_to_parquet(tables[0], cache_dir=cache)  # reuse marks it recent
+    time.sleep(0.01)
+    third = spill_to_parquet(tables[2], cache_dir=cache)
+    kept = sorted(path.name for path in cache.glob("*.parquet"))
+    assert len(kept) == 2 and os.path.basename(first.path) in kept and os.path.basename(third.path) in kept
+
+
+def test_excel_cache_is_opt_in_and_capped(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    from tools import excel_tools
+
+    monkeypatch.delenv("AGENTOPS_EXCEL_CACHE_DIR", raising=False)
+    assert excel_tools.excel_cache_dir() is None
+    monkeypatch.setenv("AGENTOPS_EXCEL_CACHE_DIR", str(tmp_path))
+    assert excel_tools.excel_cache_dir() == tmp_path
+
+    frame = pd.DataFrame({"a": range(5000), "b": ["x"] * 5000})
+    first = excel_tools._cache_path(tmp_path, "book1", "Sheet1")
+    excel_tools._write_cached(first, frame)
+    monkeypatch.setenv("AGENTOPS_EXCEL_CACHE_MAX_MB", str(1.5 * first.stat().st_size / (1024 * 1024)))
+    time.sleep(0.01)
+    second = excel_tools._cache_path(tmp_path, "book2", "Sheet1")
+    excel_tools._write_cached(second, frame)
+    assert second.exists() and not first.exists()
+    assert excel_tools._read_cached(second).equals(frame)
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from agents.jobs import JobManager, JobRejected
+
+
+def _gate():
+    """A job body that holds its worker until the returned event is set."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def body(job):
+        started.set()
+        assert release.wait(10)
+        job.stage({"stage": "held", "status": "computed", "ms": 0.0}, None)
+        return "held"
+
+    return body, started, release
+
+
+def test_results_and_failures_are_reported_and_the_worker_survives():
+    jobs = JobManager(workers=1, max_queued=4, per_session=4)
+    bad = jobs.submit("s", lambda job: 1 / 0)
+    good = jobs.submit("s", lambda job: "ok")
+    assert bad.wait(10) and good.wait(10)
+    assert bad.state == "failed" and "ZeroDivisionError" in bad.error
+    assert good.state == "done" and good.result == "ok"
+
+
+def test_admission_limits():
+    jobs = JobManager(workers=1, max_queued=1, per_session=1)
+    body, started, release = _gate()
+    jobs.submit("a", body)
+    assert started.wait(10)
+    with pytest.raises(JobRejected, match="session"):
+        jobs.submit("a", lambda job: None)
+    jobs.submit("b", lambda job: None)
+    with pytest.raises(JobRejected, match="busy"):
+        jobs.submit("c", lambda job: None)
+    release.set()
+
+
+def test_cancel_queued_and_running_jobs():
+    jobs = JobManager(workers=1, max_queued=4, per_session=4)
+    body, started, release = _gate()
+    running = jobs.submit("a", body)
+    assert started.wait(10)
+    queued = jobs.submit("a", lambda job: pytest.fail("a cancelled job ran"))
+    assert jobs.cancel(queued.id) and queued.state == "cancelled" and jobs.position(queued) == 0
+    assert jobs.cancel(running.id)
+    release.set()
+    assert running.wait(10) and running.state == "cancelled" and running.result is None
+    assert [item["stage"] for item in running.stages] == ["held"]
+    assert not jobs.cancel(running.id)
+
+
+def test_least_recently_served_session_goes_first():
+    jobs = JobManager(workers=1, max_queued=8, per_session=8)
+    order = []
+    body, started, release = _gate()
+    first = jobs.submit("heavy", body)
+    assert started.wait(10)
+    queued = [jobs.submit(session, lambda job, name=name: order.append(name)) for session, name in (("heavy", "heavy-2"), ("heavy", "heavy-3"), ("light", "light-1"))]
+    assert [jobs.position(job) for job in queued] == [1, 2, 3]
+    release.set()
+    for job in [first, *queued]:
+        assert job.wait(10)
+    assert order == ["light-1", "heavy-2", "heavy-3"]
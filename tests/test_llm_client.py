@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from memory.result_cache import ResultCache
+from tools.tools.llm_client import LLMClient, LLMRequestError
+
+REPLY = {"candidates": [], "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 3}}
+
+
+class StubServer:
+    """Local stand-in for the model endpoint; each POST pops the next scripted reply."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                stub.calls += 1
+                status, body, delay = stub.script.pop(0) if stub.script else (200, REPLY, 0)
+                time.sleep(delay)
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:  # the client gave up on a slow reply
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/generate"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(*script):
+        server = StubServer(script)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def _client(url, **kwargs):
+    return LLMClient(url, backoff_base=0.01, backoff_cap=0.05, **kwargs)
+
+
+def test_retries_429_and_5xx_then_succeeds(stub):
+    server = stub((429, {"error": "busy"}, 0), (503, {"error": "down"}, 0), (200, REPLY, 0))
+    data, record = _client(server.url).post_json({"q": 1})
+    assert data == REPLY and server.calls == 3
+    assert record["attempts"] == 3 and record["status"] == 200 and record["prompt_tokens"] == 12
+
+
+def test_gives_up_after_max_retries(stub):
+    server = stub(*[(500, {"error": "boom"}, 0)] * 5)
+    with pytest.raises(requests.HTTPError):
+        _client(server.url, max_retries=2).post_json({"q": 1})
+    assert server.calls == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    server = stub((400, {"error": "bad"}, 0))
+    with pytest.raises(requests.HTTPError):
+        _client(server.url).post_json({"q": 1})
+    assert server.calls == 1
+
+
+def test_cache_hit_skips_the_network(stub):
+    server = stub((200, REPLY, 0))
+    client = _client(server.url, cache=ResultCache(max_entries=8))
+    client.post_json({"q": 1})
+    data, record = client.post_json({"q": 1})
+    assert data == REPLY and server.calls == 1
+    assert record["cache"] == "hit" and record["attempts"] == 0
+    assert [item["cache"] for item in client.metrics] == ["miss", "hit"]
+
+
+def test_call_timeout_bounds_slow_replies(stub):
+    server = stub(*[(200, REPLY, 1.0)] * 5)
+    start = time.perf_counter()
+    with pytest.raises(LLMRequestError):
+        _client(server.url).post_json({"q": 1}, timeout=0.3)
+    assert time.perf_counter() - start < 0.9
+
+
+def test_non_json_reply_is_an_llm_error(stub):
+    server = stub((200, b"<html>oops</html>", 0))
+    client = _client(server.url, cache=ResultCache(max_entries=8))
+    with pytest.raises(LLMRequestError, match="not JSON"):
+        client.post_json({"q": 1})
+    assert client.cache.stats()["entries"] == 0
+
+
+def test_refine_stage_traces_token_counts(stub, monkeypatch):
+    from agents.orchestrator import OrchestratorInput, run_agent
+    from tools.tools import llm_gemini
+
+    def payload():
+        return OrchestratorInput(
+            industry="Retail",
+            objective_type="Decide Strategy (no data needed)",
+            problem_statement="Should we open a second warehouse?",
+            constraints=[],
+            explain_mode=False,
+            stakeholder_mode="General",
+            confidence_mode="Balanced",
+        )
+
+    draft, _, _ = run_agent(payload())
+    refined = {**draft.dumped(), "executive_summary": ["Refined summary"] * 5}
+    reply = {"candidates": [{"content": {"parts": [{"text": json.dumps(refined)}]}}], "usageMetadata": {"promptTokenCount": 321, "candidatesTokenCount": 54}}
+    server = stub((200, reply, 0))
+    monkeypatch.setenv("AGENTOPS_GEMINI_URL", server.url)
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setenv("AGENTOPS_REFINE_BACKEND", "gemini")
+    llm_gemini.get_default_client.cache_clear()
+    try:
+        output, trace, _ = run_agent(payload())
+    finally:
+        llm_gemini.get_default_client.cache_clear()
+    assert output.executive_summary[0].endswith("Refined summary")
+    (call,) = [item for item in trace.tool_calls if item["tool"] == "gemini_generate"]
+    assert call["output"]["prompt_tokens"] == 321 and call["output"]["prompt"]["prompt_tokens_est"] > 0
+    assert "refine" in [item["stage"] for item in trace.stages]
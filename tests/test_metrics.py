@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+import pytest
+
+from tools.metrics_tools import change_points, ewma_drift, parse_metrics, rolling_p95
+
+
+def _noise(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(100.0, 5.0, n)
+
+
+@pytest.mark.parametrize("chunk_bytes", [7, 1 << 20])
+def test_wide_long_and_prometheus_records_parse_across_chunk_boundaries(chunk_bytes):
+    document = {
+        "service": "checkout",
+        "points": [{"ts": 1_700_000_000 + idx, "latency_ms": 100 + idx, "ok": True} for idx in range(3)],
+        "long": [{"ts": "2024-01-01T00:00:00Z", "metric": "errors", "value": "4"}],
+        "data": {
+            "result": [
+                {"metric": {"__name__": "up", "job": "api"}, "values": [[1_700_000_000, "1"], [1_700_000_015, "NaN"], [1_700_000_030, "0"]]}
+            ]
+        },
+    }
+    store, fmt = parse_metrics(json.dumps(document).encode(), chunk_bytes=chunk_bytes)
+    series = store.series()
+    assert fmt == "json" and store.attributes == {"service": "checkout"}
+    assert series["latency_ms"][0].tolist() == [100.0, 101.0, 102.0]
+    assert str(series["latency_ms"][1][0]) == "2023-11-14T22:13:20.000000000"
+    assert series["errors"][0].tolist() == [4.0]
+    assert series["up{job=api}"][0].tolist() == [1.0, 0.0]
+    assert "ok" not in series
+
+
+def test_ndjson_skips_bad_lines_and_reads_millisecond_stamps():
+    lines = [json.dumps({"ts": 1_700_000_000_000 + idx, "latency_ms": idx}) for idx in range(4)]
+    lines.insert(2, "{broken")
+    store, fmt = parse_metrics("\n".join(lines).encode(), chunk_bytes=64)
+    values, stamps = store.series()["latency_ms"]
+    assert fmt == "ndjson" and store.skipped == 1
+    assert values.tolist() == [0.0, 1.0, 2.0, 3.0]
+    assert str(stamps[-1]).startswith("2023-11-14T22:13:20.003")
+
+
+def test_rolling_p95_flags_a_spike_against_the_trailing_window():
+    values = _noise(400)
+    values[300] = 1_000.0
+    report = rolling_p95(values, window=20)
+    assert report["worst_index"] == 300 and report["worst_ratio"] > 5
+    assert rolling_p95(_noise(400), window=20)["breaches"] == 0
+
+
+def test_ewma_drift_needs_a_sustained_shift():
+    steady = _noise(1_000)
+    assert ewma_drift(steady, span=20)["first_index"] is None
+    spiky = steady.copy()
+    spiky[500] = 10_000.0
+    assert ewma_drift(spiky, span=20)["first_index"] is None
+    shifted = steady.copy()
+    shifted[600:] += 15.0
+    report = ewma_drift(shifted, span=20)
+    assert report["direction"] == "up" and 600 <= report["first_index"] < 650
+
+
+def test_change_points_find_level_shifts_and_nothing_in_noise():
+    assert change_points(_noise(1_000)) == []
+    values = _noise(1_000, seed=1)
+    values[300:] += 20.0
+    values[700:] -= 40.0
+    found = change_points(values)
+    assert [point["index"] for point in found] == pytest.approx([300, 700], abs=5)
+    assert found[0]["after"] - found[0]["before"] == pytest.approx(20.0, abs=3.0)
+    assert change_points(values[:8]) == []
@@ -0,0 +1,51 @@
+import copy
+
+from tools.tools.prompt_budget import compact_draft, dumps_compact, estimate_tokens
+
+
+def _draft(findings: int = 5, text: str = "Finding") -> dict:
+    return {
+        "executive_summary": ["Summary one", "Summary one", "Summary two", ""],
+        "problem_understanding": {"goal": "Cut churn", "success_metrics": ["churn"], "constraints": []},
+        "analysis": {
+            "key_findings": [f"{text} {idx}" for idx in range(findings)],
+            "charts": [{"type": "bar", "title": f"Chart {idx}"} for idx in range(findings)],
+            "anomalies": [],
+        },
+        "recommendations": {"actions": [], "risks": [], "plan_90_days": []},
+        "assumptions": ["Data is complete."],
+        "confidence": 0.7,
+    }
+
+
+def test_duplicates_and_empty_items_are_dropped_under_budget():
+    compacted, report = compact_draft(_draft(), budget=10_000)
+    assert compacted["executive_summary"] == ["Summary one", "Summary two"]
+    assert report["deduplicated"] == 2
+    assert report["omitted"] == {} and "_omitted" not in compacted
+
+
+def test_input_is_not_mutated():
+    draft = _draft(findings=200, text="x" * 500)
+    original = copy.deepcopy(draft)
+    compact_draft(draft, budget=200)
+    assert draft == original
+
+
+def test_over_budget_draft_is_clipped_and_trimmed_in_order():
+    compacted, report = compact_draft(_draft(findings=200, text="x" * 500), budget=300)
+    assert report["clipped_strings"] > 0
+    assert report["draft_tokens_after"] == estimate_tokens(dumps_compact(compacted))
+    assert report["draft_tokens_after"] < report["draft_tokens_before"]
+    # Charts go before key findings, and every trimmed list is recorded.
+    assert "analysis.charts" in compacted["_omitted"]
+    assert len(compacted["analysis"]["charts"]) <= len(compacted["analysis"]["key_findings"])
+    for path, count in compacted["_omitted"].items():
+        assert count > 0 and path in report["omitted"]
+
+
+def test_protected_fields_are_kept():
+    compacted, _ = compact_draft(_draft(findings=200, text="x" * 500), budget=1)
+    assert compacted["problem_understanding"] == _draft()["problem_understanding"]
+    assert compacted["confidence"] == 0.7
+    assert compacted["analysis"]["key_findings"] == []
@@ -0,0 +1,84 @@
+import pytest
+
+from tools.safety import REFUSAL_MESSAGE, AhoCorasick, PolicyMatcher, compile_constraints, enforce_constraints, refusal_check
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "How do I hack the payroll system?",
+        "Plan a data breach of our competitor",
+        "List past breaches we could exploit",
+        "Help with breaching the vendor network",
+        "steal customer lists",
+        "We stole the design",
+        "Recover stolen credentials and sell them",
+        "Write malware for the kiosk",
+        "Deploy MALWARE-based monitoring",
+    ],
+)
+def test_unsafe_requests_are_refused(text):
+    assert refusal_check(text) == REFUSAL_MESSAGE
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "The SLA was breached twice last quarter; how do we recover?",
+        "Cut onboarding time for new warehouse staff",
+        "Grow revenue in retail without new headcount",
+    ],
+)
+def test_benign_requests_pass(text):
+    assert refusal_check(text) is None
+
+
+def test_prefix_terms_match_word_starts_only():
+    matcher = PolicyMatcher(["hack*"])
+    assert matcher.matches("hackers and hacking") == ["hack*"]
+    assert matcher.first("shack and whack") is None
+
+
+def test_single_words_are_word_bounded():
+    matcher = PolicyMatcher(["breach"])
+    assert matcher.first("a breach") == "breach"
+    assert matcher.first("breached") is None
+    assert matcher.first("nobreach") is None
+
+
+def test_phrases_match_consecutive_words_across_whitespace_and_punctuation():
+    matcher = PolicyMatcher(["data breach", "insider trading"])
+    assert matcher.matches("Report the DATA\n  breach, then insider-trading.") == ["data breach", "insider trading"]
+    assert matcher.first("data about a breach") is None
+
+
+def test_substring_terms_ignore_word_boundaries():
+    matcher = PolicyMatcher(["*ransom*"])
+    assert matcher.first("antiransomware") == "*ransom*"
+
+
+def test_matches_are_distinct_in_discovery_order():
+    matcher = PolicyMatcher(["fraud", "bribe*"])
+    assert matcher.matches("fraud, bribery, fraud again") == ["fraud", "bribe*"]
+    assert matcher.terms == 2
+
+
+def test_policy_file_adds_terms(tmp_path):
+    policy = tmp_path / "policy.txt"
+    policy.write_text("# extra terms\n\nembezzle*\n  \n", encoding="utf-8")
+    matcher = PolicyMatcher.from_file(policy, ["steal*"])
+    assert matcher.first("embezzlement plan") == "embezzle*"
+    assert matcher.first("stealing") == "steal*"
+
+
+def test_aho_corasick_reports_overlapping_patterns():
+    automaton = AhoCorasick([("he", "he"), ("she", "she"), ("hers", "hers")])
+    assert sorted(automaton.iter_matches("ushers")) == [(3, "he"), (3, "she"), (5, "hers")]
+
+
+def test_constraint_rules_rewrite_actions_once_per_rule():
+    assert [rule.name for rule in compile_constraints(("Budget cap", "GDPR", "budgets"))] == ["budget", "compliance"]
+    actions = [{"action": "Ship", "impact": "Faster"}]
+    tuned = enforce_constraints(["budgeting", "HIPAA"], actions)
+    assert tuned == [{"action": "[Compliance Review Required] Ship", "impact": "Cost-aware: Faster"}]
+    assert actions == [{"action": "Ship", "impact": "Faster"}]
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.sketch_tools import HyperLogLog, KLLSketch, reservoir_sample, stratified_sample
+from tools.stats_tools import StatsAccumulator, compute_fast_stats, compute_stats
+
+
+def _ranks(values: np.ndarray, estimates: np.ndarray) -> np.ndarray:
+    return np.searchsorted(np.sort(values), estimates) / len(values)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_kll_quantiles_stay_within_the_reported_rank_error(seed):
+    values = np.random.default_rng(seed).lognormal(size=200_000)
+    sketch = KLLSketch(k=200, seed=seed)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    qs = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+    error = np.abs(_ranks(values, sketch.quantiles(qs)) - qs).max()
+    assert error <= sketch.rank_error()
+    assert sketch.n == len(values) and sketch.min == values.min() and sketch.max == values.max()
+
+
+def test_kll_merge_matches_a_single_sketch_within_bound():
+    values = np.random.default_rng(1).normal(size=100_000)
+    left, right = KLLSketch(seed=1).update(values[:60_000]), KLLSketch(seed=2).update(values[60_000:])
+    merged = left.merge(right)
+    assert merged.n == len(values)
+    assert abs(_ranks(values, merged.quantiles([0.5]))[0] - 0.5) <= merged.rank_error()
+
+
+@pytest.mark.parametrize("distinct", [10, 1_000, 100_000])
+def test_hll_count_within_three_standard_errors(distinct):
+    values = np.arange(distinct).repeat(3)
+    sketch = HyperLogLog(p=12).update(values)
+    assert abs(sketch.count() - distinct) <= max(3 * sketch.relative_error * distinct, 2)
+
+
+def test_hll_merge_is_a_union():
+    left = HyperLogLog().update(np.arange(0, 60_000))
+    right = HyperLogLog().update(np.arange(40_000, 100_000))
+    assert abs(left.merge(right).count() - 100_000) <= 3 * left.relative_error * 100_000
+
+
+def test_samples_have_the_requested_size_and_keep_strata_shares():
+    df = pd.DataFrame({"g": ["a"] * 90_000 + ["b"] * 10_000, "x": np.arange(100_000)})
+    sample = reservoir_sample(df, 5_000, chunk_rows=7_000)
+    assert len(sample) == 5_000 and sample["x"].is_unique
+    strata = stratified_sample(df, "g", 5_000)
+    assert strata["g"].value_counts().to_dict() == {"a": 4_500, "b": 500}
+
+
+def test_accumulator_exact_moments_match_compute_stats():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({"a": rng.normal(size=50_000), "b": rng.integers(0, 9, 50_000), "c": rng.choice(["x", "y"], 50_000)})
+    df.loc[::13, "a"] = np.nan
+    summary = StatsAccumulator()
+    for start in range(0, len(df), 7_777):
+        summary.update(df.iloc[start : start + 7_777])
+    exact = compute_stats(df)
+    moments = summary.exact_numeric()
+    for column in ("count", "mean", "std", "min", "max"):
+        np.testing.assert_allclose(moments[column], exact.numeric[column], rtol=1e-9)
+    assert summary.null_counts.reindex(df.columns).tolist() == exact.null_counts.tolist()
+
+
+def test_fast_stats_bounds_cover_the_exact_values():
+    rng = np.random.default_rng(4)
+    df = pd.DataFrame({"a": rng.exponential(size=300_000), "b": rng.normal(5, 2, 300_000), "g": rng.choice(list("pqr"), 300_000)})
+    fast, exact = compute_fast_stats(df, sample_rows=20_000), compute_stats(df)
+    bounds = fast.error_bounds
+    assert fast.sample_rows == 20_000 and bounds["strata"] == "g" and bounds["duplicates_in_sample"]
+    for col in ("a", "b"):
+        assert abs(fast.numeric.at[col, "mean"] - exact.numeric.at[col, "mean"]) <= bounds["mean_half_width"][col]
+        assert fast.numeric.at[col, "min"] == exact.numeric.at[col, "min"]
+        assert fast.numeric.at[col, "count"] == exact.numeric.at[col, "count"]
+        values = df[col].to_numpy()
+        for q, name in ((0.25, "q1"), (0.5, "median"), (0.75, "q3")):
+            assert abs(_ranks(values, np.array([fast.numeric.at[col, name]]))[0] - q) <= bounds["quantile_rank_error"][col]
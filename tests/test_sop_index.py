@@ -0,0 +1,79 @@
+import io
+import zipfile
+
+from memory.result_cache import ResultCache
+from tools.sop_tools import BM25Index, SopChunk, chunk_blocks, iter_sop_blocks, load_sop_index, tokenize
+
+SOP = b"""PURCHASE ORDERS
+
+1. The requester enters the order manually into the spreadsheet.
+2. The manager approves the order and forwards it to finance.
+3. Finance waits for the signed invoice.
+
+3.2 Approval Workflow
+
+Orders above the limit need approval from the director. Approvals are recorded by email.
+\fPage two keeps the same section.
+"""
+
+
+def _docx(paragraphs):
+    body = "".join(
+        f'<w:p><w:pPr><w:pStyle w:val="{style}"/></w:pPr><w:r><w:t>{text}</w:t></w:r></w:p>' for style, text in paragraphs
+    )
+    xml = f'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>{body}</w:body></w:document>'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", xml)
+    return buffer.getvalue()
+
+
+def test_tokenize_drops_stopwords_and_shares_stems():
+    assert tokenize("The manager approves; approved by the manager")[:2] == ["manager", "approv"]
+    assert tokenize("approves") == tokenize("approved")
+    assert tokenize("the and of") == []
+
+
+def test_txt_chunks_follow_headings_steps_and_pages():
+    chunks = list(chunk_blocks(iter_sop_blocks(SOP, "orders.txt")))
+    assert [(chunk.section, chunk.label) for chunk in chunks[:3]] == [("PURCHASE ORDERS", "1"), ("PURCHASE ORDERS", "2"), ("PURCHASE ORDERS", "3")]
+    assert {chunk.section for chunk in chunks[3:]} == {"3.2 Approval Workflow"}
+    assert chunks[-1].page == 2
+
+
+def test_docx_headings_become_sections():
+    data = _docx([("Heading1", "Intake"), ("Normal", "Clerk scans the paper form."), ("ListParagraph", "Supervisor signs off.")])
+    chunks = list(chunk_blocks(iter_sop_blocks(data, "intake.docx")))
+    assert [(chunk.section, chunk.text) for chunk in chunks] == [("Intake", "Clerk scans the paper form."), ("Intake", "Supervisor signs off.")]
+
+
+def test_long_blocks_are_split_with_suffixed_labels():
+    text = b"1. " + b" ".join(b"word%d" % idx for idx in range(250))
+    chunks = list(chunk_blocks(iter_sop_blocks(text, "long.txt"), max_words=100))
+    assert [chunk.label for chunk in chunks] == ["1.1", "1.2", "1.3"]
+    assert sum(len(chunk.text.split()) for chunk in chunks) == 251
+
+
+def test_bm25_ranks_by_term_rarity_and_ignores_unknown_terms():
+    index = BM25Index.build(
+        [
+            SopChunk("A", "1", "invoice invoice approval", 1),
+            SopChunk("A", "2", "approval of the order", 1),
+            SopChunk("A", "3", "shipping label printed", 1),
+        ]
+    )
+    hits = index.search("invoice approval")
+    assert [hit["label"] for hit in hits] == ["1", "2"]
+    assert hits[0]["score"] > hits[1]["score"] > 0
+    assert index.count("approval") == 2 and index.count("unrelated") == 0
+    assert index.search("unrelated") == []
+    assert BM25Index.build([]).search("anything") == []
+
+
+def test_index_is_cached_by_content():
+    cache = ResultCache(max_entries=4)
+    index, hit = load_sop_index(SOP, "orders.txt", cache=cache)
+    again, hit_again = load_sop_index(SOP, "orders.txt", cache=cache)
+    assert not hit and hit_again and again is index
+    assert not load_sop_index(SOP + b"4. New step.\n", "orders.txt", cache=cache)[1]
+    assert index.summary()["sections"] == 2 and index.summary()["pages"] == 2
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from agents.orchestrator import OrchestratorInput, run_agent
+from agents.stages import Stage, StageRunner
+from memory.result_cache import ResultCache
+from tools.stats_tools import FAST_SAMPLE_ROWS
+
+
+def _payload(df: pd.DataFrame, duplicate_keys) -> OrchestratorInput:
+    return OrchestratorInput(
+        industry="Retail",
+        objective_type="Analyze Data (CSV/Excel)",
+        problem_statement="Find quality issues in the orders table",
+        constraints=[],
+        explain_mode=False,
+        stakeholder_mode="CFO",
+        confidence_mode="Balanced",
+        tabular_df=df,
+        analysis_mode="Fast",
+        duplicate_keys=duplicate_keys,
+    )
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({"a": rng.standard_t(3, rows), "b": rng.normal(size=rows), "order_id": rng.integers(0, rows // 2, rows)})
+
+
+def _graph(calls, threshold):
+    def load(_):
+        calls.append("load")
+        return {"rows": list(range(10)), "total": 45}
+
+    def score(upstream):
+        calls.append("score")
+        return upstream["load"]["total"] > threshold
+
+    return [
+        Stage("load", load, key="frame:abc", slim=lambda value: {"total": value["total"]}),
+        Stage("score", score, inputs={"threshold": threshold}, after=["load"]),
+    ]
+
+
+def test_stages_rerun_only_when_their_inputs_or_upstream_keys_change():
+    cache, calls = ResultCache(max_entries=8), []
+    first = StageRunner(cache)
+    assert first.run_all(_graph(calls, 40)) is True
+    assert first.outputs["load"]["rows"] == list(range(10))
+    second = StageRunner(cache)
+    assert second.run_all(_graph(calls, 40)) is True
+    assert second.reused() == ["load", "score"] and calls == ["load", "score"]
+    # The memoized load output is slimmed; the current run still saw the full output.
+    assert second.outputs["load"] == {"total": 45}
+    third = StageRunner(cache)
+    assert third.run_all(_graph(calls, 50)) is False
+    assert third.reused() == ["load"] and calls == ["load", "score", "score"]
+    assert StageRunner(cache, route="other").run_all(_graph(calls, 40)) is True
+    assert calls[-1] == "score"
+
+
+def test_fast_rerun_with_reused_profile_matches_first_run():
+    df = _frame(FAST_SAMPLE_ROWS + 100_000)
+    cache = ResultCache(max_entries=64)
+    first, _, _ = run_agent(_payload(df, []), cache)
+    second, trace, _ = run_agent(_payload(df, ["order_id"]), cache)
+    statuses = {item["stage"]: item["status"] for item in trace.stages}
+    assert statuses["profile"] == "reused" and statuses["findings"] == "computed"
+    assert second.analysis.anomalies == first.analysis.anomalies
+
+
+def test_exact_rerun_with_reused_profile_matches_first_run():
+    df = _frame(20_000)
+    cache = ResultCache(max_entries=64)
+    payload = _payload(df, [])
+    payload.analysis_mode = "Exact"
+    first, _, _ = run_agent(payload, cache)
+    payload = _payload(df, ["order_id"])
+    payload.analysis_mode = "Exact"
+    second, trace, _ = run_agent(payload, cache)
+    assert {item["stage"]: item["status"] for item in trace.stages}["profile"] == "reused"
+    assert second.analysis.anomalies == first.analysis.anomalies
@@ -1,59 +1,427 @@
 from __future__ import annotations
 
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 from io import BytesIO
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 
+from tools.dedup_tools import count_duplicates
+from tools.profiling import traced
+from tools.stats_tools import CONFIDENCE_LEVEL, DatasetStats, compute_stats, z_score
 
-def load_tabular_file(file_bytes: bytes, filename: str) -> pd.DataFrame:
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+CATEGORY_MAX_RATIO = 0.5
+WIDE_TABLE_COLUMNS = 256
+ROBUST_Z_THRESHOLD = 3.5
+PREVIEW_ROWS = 8
+PREVIEW_COLUMNS = 40
+
+ProgressCallback = Callable[[int, int], None]
+
+
+@dataclass
+class IngestReport:
+    engine: str = "pandas"
+    rows: int = 0
+    chunks: int = 0
+    bytes_read: int = 0
+    total_bytes: int = 0
+    elapsed_ms: float = 0.0
+    frame_mb: float = 0.0
+    peak_rss_mb: Optional[float] = None
+    categorical_cols: List[str] = field(default_factory=list)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def optimize_dtypes(
+    df: pd.DataFrame,
+    category_cols: Optional[List[str]] = None,
+    downcast_floats: bool = False,
+    category_max_ratio: float = CATEGORY_MAX_RATIO,
+) -> pd.DataFrame:
+    """Downcast numerics and turn low-cardinality strings into categoricals, in place.
+
+    When ``category_cols`` is given the categorical decision is not re-derived, so that
+    every chunk of one file ends up with the same dtypes.
+    """
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_bool_dtype(dtype):
+            continue
+        if pd.api.types.is_integer_dtype(dtype):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+        elif pd.api.types.is_float_dtype(dtype):
+            if downcast_floats:
+                df[col] = pd.to_numeric(df[col], downcast="float")
+        elif category_cols is not None:
+            if col in category_cols:
+                df[col] = df[col].astype("category")
+        elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            if len(df) and df[col].nunique(dropna=True) <= category_max_ratio * len(df):
+                df[col] = df[col].astype("category")
+    return df
+
+
+def _pandas_chunk_rows(file_bytes: bytes, chunk_bytes: int) -> int:
+    sample = file_bytes[: 64 * 1024]
+    lines = max(sample.count(b"\n"), 1)
+    return max(int(chunk_bytes / max(len(sample) / lines, 1)), 1_000)
+
+
+def iter_csv_chunks(
+    file_bytes: bytes,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    engine: str = "auto",
+    optimize: bool = True,
+    progress: Optional[ProgressCallback] = None,
+    report: Optional[IngestReport] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield dtype-optimized frames for successive blocks of a CSV upload."""
+    report = report if report is not None else IngestReport()
+    report.total_bytes = len(file_bytes)
+    start = time.perf_counter()
+    pa_csv = None
+    if engine in ("auto", "pyarrow"):
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pa_csv
+        except ImportError:
+            if engine == "pyarrow":
+                raise
+    if pa_csv is not None:
+        report.engine = "pyarrow"
+        source = pa.BufferReader(file_bytes)
+        reader = pa_csv.open_csv(source, read_options=pa_csv.ReadOptions(block_size=chunk_bytes))
+        batches = (batch.to_pandas() for batch in reader)
+    else:
+        report.engine = "pandas"
+        source = BytesIO(file_bytes)
+        batches = pd.read_csv(source, chunksize=_pandas_chunk_rows(file_bytes, chunk_bytes))
+
+    category_cols: Optional[List[str]] = None
+    for chunk in batches:
+        if optimize:
+            optimize_dtypes(chunk, category_cols=category_cols)
+            if category_cols is None:
+                category_cols = [col for col in chunk.columns if isinstance(chunk[col].dtype, pd.CategoricalDtype)]
+                report.categorical_cols = category_cols
+        report.rows += len(chunk)
+        report.chunks += 1
+        report.frame_mb += chunk.memory_usage(index=False).sum() / (1024 * 1024)
+        report.bytes_read = min(source.tell(), report.total_bytes)
+        report.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        if progress:
+            progress(report.bytes_read, report.total_bytes)
+        yield chunk
+    report.bytes_read = report.total_bytes
+    report.frame_mb = round(float(report.frame_mb), 2)
+    report.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    report.peak_rss_mb = _peak_rss_mb()
+
+
+def concat_chunks(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+    columns = {}
+    for col in chunks[0].columns:
+        parts = [chunk[col] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[col] = pd.Series(union_categoricals(parts), name=col)
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _arrow_errors() -> tuple:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return ()
+    return (pa.ArrowInvalid,)
+
+
+def _load_csv_streaming(
+    file_bytes: bytes,
+    chunk_bytes: int,
+    progress: Optional[ProgressCallback],
+    on_chunk: Optional[Callable[[pd.DataFrame], None]],
+) -> pd.DataFrame:
+    def collect(engine: str, report: IngestReport) -> List[pd.DataFrame]:
+        chunks = []
+        for chunk in iter_csv_chunks(file_bytes, chunk_bytes=chunk_bytes, engine=engine, progress=progress, report=report):
+            if on_chunk:
+                on_chunk(chunk)
+            chunks.append(chunk)
+        return chunks
+
+    report = IngestReport()
+    try:
+        chunks = collect("auto", report)
+    except _arrow_errors():
+        # pyarrow fixes column types from the first block; mixed columns need the pandas reader.
+        if on_chunk:
+            raise
+        report = IngestReport()
+        chunks = collect("pandas", report)
+    df = concat_chunks(chunks)
+    df.attrs["ingest_report"] = asdict(report)
+    return df
+
+
+@traced()
+def load_tabular_file(
+    file_bytes: bytes,
+    filename: str,
+    streaming: Optional[bool] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    progress: Optional[ProgressCallback] = None,
+    on_chunk: Optional[Callable[[pd.DataFrame], None]] = None,
+    sheet: Optional[str] = None,
+) -> pd.DataFrame:
+    """Load a CSV (streamed above ``STREAMING_THRESHOLD_BYTES``) or one Excel sheet (first by default)."""
     if filename.lower().endswith(".csv"):
+        if streaming is None:
+            streaming = len(file_bytes) >= STREAMING_THRESHOLD_BYTES or on_chunk is not None
+        if streaming:
+            return _load_csv_streaming(file_bytes, chunk_bytes, progress, on_chunk)
         return pd.read_csv(BytesIO(file_bytes))
     if filename.lower().endswith((".xlsx", ".xls")):
-        return pd.read_excel(BytesIO(file_bytes))
+        from tools.excel_tools import list_sheets, load_excel_sheets
+
+        sheet = sheet or list_sheets(file_bytes, filename)[0]
+        return load_excel_sheets(file_bytes, filename, [sheet], progress=progress)[sheet]
     raise ValueError("Unsupported file type. Please upload CSV or Excel.")
 
 
-def profile_dataset(df: pd.DataFrame) -> Dict:
-    missing = (df.isnull().sum() / max(len(df), 1)).round(3)
-    numeric_cols = df.select_dtypes(include="number").columns.tolist()
-    preview = df.head(8).to_dict(orient="records")
-    return {
-        "rows": int(df.shape[0]),
-        "cols": int(df.shape[1]),
-        "column_names": df.columns.tolist(),
-        "numeric_cols": numeric_cols,
+@traced()
+def profile_dataset(df: pd.DataFrame, stats: Optional[DatasetStats] = None, preview_columns: int = PREVIEW_COLUMNS) -> Dict:
+    """Dataset profile; the preview keeps the first ``preview_columns`` columns so wide tables stay small in the trace."""
+    stats = stats or compute_stats(df)
+    missing = stats.missing_ratio()
+    preview = df.iloc[:PREVIEW_ROWS, :preview_columns].to_dict(orient="records")
+    profile = {
+        "rows": stats.rows,
+        "cols": len(stats.columns),
+        "column_names": stats.columns,
+        "numeric_cols": stats.numeric_cols,
         "missing_ratio": missing[missing > 0].to_dict(),
         "preview": preview,
     }
+    if len(stats.columns) > preview_columns:
+        profile["preview_columns_omitted"] = len(stats.columns) - preview_columns
+    return profile
 
 
-def basic_findings(df: pd.DataFrame) -> List[str]:
-    findings = [f"Dataset has {df.shape[0]} rows and {df.shape[1]} columns."]
-    numeric = df.select_dtypes(include="number")
-    if not numeric.empty:
-        means = numeric.mean(numeric_only=True).sort_values(ascending=False)
+@traced()
+def basic_findings(df: pd.DataFrame, stats: Optional[DatasetStats] = None) -> List[str]:
+    stats = stats or compute_stats(df)
+    findings = [f"Dataset has {stats.rows} rows and {len(stats.columns)} columns."]
+    if stats.numeric_cols and stats.rows:
+        means = stats.numeric["mean"].sort_values(ascending=False)
         top_col = means.index[0]
-        findings.append(f"Highest average metric is '{top_col}' at {means.iloc[0]:.2f}.")
-        stds = numeric.std(numeric_only=True).sort_values(ascending=False)
+        bound = stats.error_bounds.get("mean_half_width", {}).get(top_col)
+        margin = f" (±{bound:.2f} at {stats.error_bounds['confidence_level']:.0%} confidence)" if bound is not None else ""
+        findings.append(f"Highest average metric is '{top_col}' at {means.iloc[0]:.2f}{margin}.")
+        stds = stats.numeric["std"].sort_values(ascending=False)
         findings.append(f"Most volatile metric appears to be '{stds.index[0]}'.")
     else:
         findings.append("No numeric columns found; recommendations are based on categorical patterns.")
-    dupes = int(df.duplicated().sum())
-    findings.append(f"Detected {dupes} duplicate rows.")
+    dupes = stats.duplicate_rows if stats.duplicate_rows is not None else count_duplicates(df)
+    dupe_error = stats.error_bounds.get("duplicate_rows_abs_error")
+    if stats.error_bounds.get("duplicates_in_sample"):
+        findings.append(f"Detected {dupes} duplicate rows in the {stats.sample_rows:,}-row sample.")
+    elif dupe_error is None:
+        findings.append(f"Detected {dupes} duplicate rows.")
+    elif dupe_error < dupes:
+        findings.append(f"Detected ~{dupes} duplicate rows (±{dupe_error}, HyperLogLog estimate).")
+    else:
+        findings.append(f"Duplicate rows could not be counted reliably: the HyperLogLog estimate (~{dupes}) is within its error (±{dupe_error}).")
     return findings
 
 
-def detect_anomalies(df: pd.DataFrame) -> List[str]:
+def _score_shard(block: np.ndarray, center: np.ndarray, scale: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+    """Outlier mask statistics for one column shard: per-column counts plus per-row worst severity."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if lower is not None:
+            severity = np.fmax(lower - block, block - upper) / scale
+        else:
+            severity = np.abs(block - center) / scale
+    flagged = severity > (0.0 if lower is not None else ROBUST_Z_THRESHOLD)
+    severity[~flagged] = 0.0
+    if not severity.shape[1]:
+        return flagged.sum(axis=0), np.zeros(len(block)), np.zeros(len(block), dtype=int)
+    worst = severity.argmax(axis=1)
+    return flagged.sum(axis=0), np.take_along_axis(severity, worst[:, None], axis=1)[:, 0], worst
+
+
+@traced()
+def score_outliers(
+    df: pd.DataFrame,
+    stats: Optional[DatasetStats] = None,
+    method: str = "iqr",
+    top_rows: int = 20,
+    workers: Optional[int] = None,
+) -> Dict:
+    """Score every numeric column at once with the IQR fence rule or a robust (MAD) z-score.
+
+    Tables wider than ``WIDE_TABLE_COLUMNS`` are split into column shards and scored on a
+    thread pool when ``workers`` is greater than one; the numpy kernels release the GIL, so
+    shards run in parallel in-process. Each shard gathers a copy of its own columns, so the
+    block is copied once in total rather than pickled into worker processes. A Fast-mode
+    profile without its block (see ``slim_profile``) rescores the same sample rows.
+    """
+    stats = stats or compute_stats(df)
+    index = stats.row_index if stats.row_index is not None else df.index
+    if stats.values is not None:
+        block = stats.values
+    elif len(index) < len(df) and df.index.is_unique:
+        block = df.loc[index, stats.numeric_cols].to_numpy(dtype="float64", na_value=np.nan)
+    else:
+        block, index = df[stats.numeric_cols].to_numpy(dtype="float64", na_value=np.nan), df.index
+    q1, q3 = stats.numeric["q1"].to_numpy(), stats.numeric["q3"].to_numpy()
+    median = stats.numeric["median"].to_numpy()
+    if method == "robust_z":
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            scale = 1.4826 * np.nanmedian(np.abs(block - median), axis=0) if len(block) else np.full(len(median), np.nan)
+        lower = upper = None
+    else:
+        scale = q3 - q1
+        lower, upper = q1 - 1.5 * scale, q3 + 1.5 * scale
+    usable = np.flatnonzero((scale > 0) & ~np.isnan(scale))
+
+    shards = [usable]
+    if workers and workers > 1 and len(usable) >= WIDE_TABLE_COLUMNS:
+        shards = [shard for shard in np.array_split(usable, workers) if len(shard)]
+    jobs = [
+        (block[:, shard], median[shard], scale[shard], None if lower is None else lower[shard], None if upper is None else upper[shard])
+        for shard in shards
+    ]
+    if len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_score_shard, *zip(*jobs)))
+    else:
+        results = [_score_shard(*job) for job in jobs]
+
+    counts = np.zeros(len(stats.numeric_cols), dtype="int64")
+    row_severity = np.zeros(len(block))
+    row_column = np.full(len(block), -1)
+    for shard, (shard_counts, shard_severity, shard_worst) in zip(shards, results):
+        counts[shard] = shard_counts
+        better = shard_severity > row_severity
+        row_severity[better] = shard_severity[better]
+        row_column[better] = shard[shard_worst[better]] if len(shard) else -1
+
+    flagged_rows = np.flatnonzero(row_severity > 0)
+    ranked = flagged_rows[np.argsort(-row_severity[flagged_rows], kind="stable")][:top_rows]
+    return {
+        "method": method,
+        "rows_scored": int(len(block)),
+        "columns_scored": int(len(usable)),
+        "column_counts": {stats.numeric_cols[idx]: int(counts[idx]) for idx in np.flatnonzero(counts)},
+        "flagged_rows": int(len(flagged_rows)),
+        "top_rows": [
+            {
+                "row": index[pos].item() if hasattr(index[pos], "item") else index[pos],
+                "column": stats.numeric_cols[row_column[pos]],
+                "severity": round(float(row_severity[pos]), 3),
+            }
+            for pos in ranked
+        ],
+    }
+
+
+class OutlierAccumulator:
+    """Chunk-at-a-time counterpart of ``score_outliers`` (IQR rule) for data streamed in row order.
+
+    Fences come from the quartiles in ``stats``, which for streamed data are KLL sketch
+    estimates. Per-column counts add up across chunks and only the ``top_rows`` most
+    severe rows are kept, so memory does not grow with the row count. Rows are reported
+    by their position in the stream.
+    """
+
+    def __init__(self, stats: DatasetStats, top_rows: int = 20) -> None:
+        q1, q3 = stats.numeric["q1"].to_numpy(), stats.numeric["q3"].to_numpy()
+        scale = q3 - q1
+        self.usable = np.flatnonzero((scale > 0) & ~np.isnan(scale))
+        self.columns = [stats.numeric_cols[idx] for idx in self.usable]
+        self.numeric_cols = stats.numeric_cols
+        self.top_rows = top_rows
+        self._median = stats.numeric["median"].to_numpy()[self.usable]
+        self._scale = scale[self.usable]
+        self._lower, self._upper = q1[self.usable] - 1.5 * self._scale, q3[self.usable] + 1.5 * self._scale
+        self.rows = 0
+        self.flagged = 0
+        self.counts = np.zeros(len(stats.numeric_cols), dtype="int64")
+        self._top = (np.empty(0), np.empty(0, dtype="int64"), np.empty(0, dtype="int64"))
+
+    def update(self, chunk: pd.DataFrame) -> "OutlierAccumulator":
+        block = chunk[self.columns].to_numpy(dtype="float64", na_value=np.nan)
+        counts, severity, worst = _score_shard(block, self._median, self._scale, self._lower, self._upper)
+        self.counts[self.usable] += counts
+        flagged = np.flatnonzero(severity > 0)
+        self.flagged += len(flagged)
+        # Earlier rows come first, so a stable sort breaks ties the way score_outliers does.
+        top_severity = np.concatenate([self._top[0], severity[flagged]])
+        top_rows = np.concatenate([self._top[1], self.rows + flagged])
+        top_columns = np.concatenate([self._top[2], self.usable[worst[flagged]] if len(self.usable) else flagged])
+        keep = np.argsort(-top_severity, kind="stable")[: self.top_rows]
+        self._top = (top_severity[keep], top_rows[keep], top_columns[keep])
+        self.rows += len(chunk)
+        return self
+
+    def finalize(self) -> Dict:
+        severity, rows, columns = self._top
+        return {
+            "method": "iqr",
+            "rows_scored": int(self.rows),
+            "columns_scored": int(len(self.usable)),
+            "column_counts": {self.numeric_cols[idx]: int(self.counts[idx]) for idx in np.flatnonzero(self.counts)},
+            "flagged_rows": int(self.flagged),
+            "top_rows": [
+                {"row": int(row), "column": self.numeric_cols[col], "severity": round(float(value), 3)}
+                for value, row, col in zip(severity, rows, columns)
+            ],
+        }
+
+
+@traced()
+def detect_anomalies(df: pd.DataFrame, stats: Optional[DatasetStats] = None, report: Optional[Dict] = None) -> List[str]:
+    stats = stats or compute_stats(df)
+    report = report or score_outliers(df, stats)
+    rule = "IQR rule" if report["method"] == "iqr" else "robust z-score"
     anomalies: List[str] = []
-    numeric = df.select_dtypes(include="number")
-    for col in numeric.columns[:4]:
-        q1 = numeric[col].quantile(0.25)
-        q3 = numeric[col].quantile(0.75)
-        iqr = q3 - q1
-        if iqr == 0:
-            continue
-        outliers = ((numeric[col] < q1 - 1.5 * iqr) | (numeric[col] > q3 + 1.5 * iqr)).sum()
-        if outliers > 0:
-            anomalies.append(f"{col}: {int(outliers)} potential outliers by IQR rule.")
-    return anomalies or ["No severe anomalies detected with the quick IQR scan."]
+    scored = report["rows_scored"]
+    level = stats.error_bounds.get("confidence_level", CONFIDENCE_LEVEL)
+    z = z_score(level)
+    for col, outliers in sorted(report["column_counts"].items(), key=lambda item: -item[1]):
+        if 0 < scored < stats.rows:
+            rate = outliers / scored
+            spread = z * stats.rows * np.sqrt(rate * (1 - rate) / scored)
+            anomalies.append(
+                f"{col}: ~{rate * stats.rows:,.0f} potential outliers by {rule} "
+                f"(±{spread:,.0f} sampling error at {level:.0%} confidence, estimated from a {scored:,}-row sample)."
+            )
+        else:
+            anomalies.append(f"{col}: {int(outliers)} potential outliers by {rule}.")
+    return anomalies or [f"No severe anomalies detected by {rule}."]
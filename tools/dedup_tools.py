@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from tools.profiling import traced
+from tools.sketch_tools import HyperLogLog
+
+_NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+ESTIMATE_PRECISION = 16  # HyperLogLog registers once a capped tracker stops storing hashes
+
+
+def _numeric_hash(series: pd.Series) -> np.ndarray:
+    """Hash numbers by value, not dtype: int8 3, int64 3 and float64 3.0 hash equally.
+
+    Values hash as float64 with -0.0 folded into 0.0. Integer columns beyond 2**53, which
+    float64 cannot hold exactly (e.g. snowflake IDs), hash as int64 instead.
+    """
+    if pd.api.types.is_integer_dtype(series.dtype) and not series.hasnans and len(series):
+        values = series.to_numpy()
+        if max(abs(int(values.min())), abs(int(values.max()))) > 2**53:
+            return pd.util.hash_array(values.astype("int64", copy=False))
+    return pd.util.hash_array(series.to_numpy(dtype="float64", na_value=np.nan) + 0.0)
+
+
+def _column_hash(series: pd.Series) -> np.ndarray:
+    """Value-based 64-bit hash of one column; equal values hash equally across chunks and dtypes."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        hashed = pd.util.hash_array(series.to_numpy()) if pd.api.types.is_bool_dtype(dtype) else _numeric_hash(series)
+        if series.hasnans:
+            hashed[series.isna().to_numpy()] = _NULL_HASH
+        return hashed
+    # Hash each distinct value once and broadcast through the codes; much cheaper than
+    # hashing every string cell on wide, repetitive text columns.
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    unique_hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))
+    return np.where(codes >= 0, unique_hashes[np.maximum(codes, 0)] if len(unique_hashes) else _NULL_HASH, _NULL_HASH)
+
+
+def row_hashes(df: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> np.ndarray:
+    """Vectorized 64-bit hash per row (same mixing as ``pandas.util.hash_pandas_object``)."""
+    columns = list(columns) if columns is not None else df.columns.tolist()
+    out = np.full(len(df), 0x345678, dtype="uint64")
+    mult = np.uint64(1000003)
+    with np.errstate(over="ignore"):
+        for idx, col in enumerate(columns):
+            inverse = len(columns) - idx
+            out ^= _column_hash(df[col])
+            out *= mult
+            mult += np.uint64(82520 + inverse + inverse)
+        out += np.uint64(97531)
+    return out
+
+
+def _rows_equal(left: pd.DataFrame, right: pd.DataFrame) -> np.ndarray:
+    a = left.to_numpy(dtype=object)
+    b = right.to_numpy(dtype=object)
+    return ((a == b) | (pd.isna(a) & pd.isna(b))).all(axis=1)
+
+
+class DuplicateTracker:
+    """Streaming duplicate-row counter over row hashes.
+
+    Rows are deduplicated on 64-bit hashes, so memory is eight bytes per distinct row.
+    Seen hashes are kept as sorted runs whose sizes at least double from newest to
+    oldest: a chunk adds one run and merges only while the run before it is not larger,
+    so each hash is merged O(log n) times over a stream and lookups search O(log n) runs.
+    With ``verify=True`` candidate duplicates are compared value by value against a kept
+    representative, which removes hash collisions at the cost of storing one row per
+    distinct hash.
+
+    With ``max_distinct`` the hash set is capped: past that many distinct rows it is folded
+    into a HyperLogLog and ``duplicates`` becomes ``rows - distinct`` estimated from it, so
+    memory stays fixed on inputs larger than RAM. ``update`` then returns an all-False mask.
+    """
+
+    def __init__(self, columns: Optional[Sequence[str]] = None, verify: bool = False, max_distinct: Optional[int] = None) -> None:
+        self.columns = list(columns) if columns is not None else None
+        self.verify = verify
+        self.max_distinct = max_distinct
+        self.estimate: Optional[HyperLogLog] = None
+        self.rows = 0
+        self.duplicates = 0
+        self.collisions = 0
+        self.distinct = 0
+        self._runs: List[np.ndarray] = []
+        self._representatives: List[pd.DataFrame] = []
+
+    def _lookup(self, hashes: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(hashes), dtype=bool)
+        if not self._runs:
+            return found
+        # Sorted needles keep each binary search close to the previous one.
+        order = np.argsort(hashes, kind="stable")
+        needles = hashes[order]
+        hit = np.zeros(len(needles), dtype=bool)
+        for run in self._runs:
+            hit |= run[np.minimum(np.searchsorted(run, needles), len(run) - 1)] == needles
+        found[order] = hit
+        return found
+
+    def _add(self, hashes: np.ndarray) -> None:
+        """Record hashes that are distinct and not yet seen."""
+        if not len(hashes):
+            return
+        self._runs.append(np.sort(hashes))
+        self.distinct += len(hashes)
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            newer = self._runs.pop()
+            older = self._runs.pop()
+            self._runs.append(np.insert(older, np.searchsorted(older, newer), newer))
+
+    def update(self, chunk: pd.DataFrame, hashes: Optional[np.ndarray] = None) -> np.ndarray:
+        """Consume one chunk and return its duplicate mask; ``hashes`` are its ``row_hashes`` if already known."""
+        frame = chunk[self.columns] if self.columns is not None else chunk
+        hashes = row_hashes(frame) if hashes is None else hashes
+        if self.estimate is not None:
+            self.rows += len(chunk)
+            self.duplicates = max(self.rows - self.estimate.update(hashes).count(), 0)
+            return np.zeros(len(chunk), dtype=bool)
+        within = pd.Series(hashes).duplicated().to_numpy()
+        before = self._lookup(hashes)
+        mask = within | before
+        if self.verify and mask.any():
+            mask = self._verify(frame, hashes, within, before)
+        self.rows += len(chunk)
+        self.duplicates += int(mask.sum())
+        fresh = ~(within | before)
+        self._add(hashes[fresh])
+        if self.verify:
+            self._representatives.append(frame[fresh].set_axis(hashes[fresh], axis=0))
+        if self.max_distinct is not None and self.distinct > self.max_distinct:
+            self.estimate = HyperLogLog(ESTIMATE_PRECISION)
+            for run in self._runs:
+                self.estimate.update(run)
+            self._runs, self._representatives = [], []
+            self.duplicates = max(self.rows - self.estimate.count(), 0)
+        return mask
+
+    def _verify(self, frame: pd.DataFrame, hashes: np.ndarray, within: np.ndarray, before: np.ndarray) -> np.ndarray:
+        verified = np.zeros(len(frame), dtype=bool)
+        shared = pd.Series(hashes).duplicated(keep=False).to_numpy()
+        if within.any():
+            candidates = np.flatnonzero(shared)
+            exact = frame.iloc[candidates].duplicated().to_numpy()
+            verified[candidates] = exact
+        rows = np.flatnonzero(before & ~verified)
+        if len(rows):
+            self._representatives = [pd.concat(self._representatives)]
+            known = self._representatives[0]
+            verified[rows] = _rows_equal(frame.iloc[rows], known.loc[hashes[rows]])
+        self.collisions += int(((within | before) & ~verified).sum())
+        return verified
+
+    def summary(self) -> Dict[str, int]:
+        distinct = self.estimate.count() if self.estimate is not None else self.distinct
+        return {"rows": self.rows, "duplicates": self.duplicates, "distinct": distinct, "collisions": self.collisions, "approximate": self.estimate is not None}
+
+
+def count_duplicates(df: pd.DataFrame, verify: bool = True) -> int:
+    return int(DuplicateTracker(verify=verify).update(df).sum())
+
+
+@traced()
+def near_duplicate_clusters(df: pd.DataFrame, keys: Sequence[str], top: int = 5, hashes: Optional[np.ndarray] = None) -> Dict:
+    """Group rows sharing ``keys`` whose other fields disagree (e.g. one customer_id, two incomes)."""
+    keys = [key for key in keys if key in df.columns]
+    if not keys or df.empty:
+        return {"keys": keys, "clusters": 0, "rows": 0, "top": []}
+    frame = pd.DataFrame({"key": row_hashes(df, keys), "row": row_hashes(df) if hashes is None else hashes})
+    grouped = frame.groupby("key", sort=False)["row"].agg(["size", "nunique"])
+    conflicting = grouped[(grouped["size"] > 1) & (grouped["nunique"] > 1)].sort_values("size", ascending=False)
+    first_position = pd.Series(np.arange(len(frame)), index=frame["key"].to_numpy())
+    first_position = first_position[~first_position.index.duplicated()]
+    top_clusters = []
+    for key_hash, row in conflicting.head(top).iterrows():
+        values = df[keys].iloc[int(first_position[key_hash])]
+        top_clusters.append(
+            {
+                "key": {key: value.item() if hasattr(value, "item") else value for key, value in values.items()},
+                "rows": int(row["size"]),
+                "variants": int(row["nunique"]),
+            }
+        )
+    return {"keys": keys, "clusters": int(len(conflicting)), "rows": int(conflicting["size"].sum()), "top": top_clusters}
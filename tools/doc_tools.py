@@ -1,8 +1,14 @@
 from __future__ import annotations
 
-from typing import List
+import csv
+import io
+import zipfile
+from functools import cached_property
+from typing import IO, List
 
-import pandas as pd
+from schemas.output_schema import AgentOutput
+
+PLACEHOLDER_ACTION = {"action": "No actions generated", "owner": "TBD", "timeframe": "TBD", "impact": "TBD"}
 
 
 def build_cfo_memo(summary: List[str], risks: List[dict], actions: List[dict]) -> str:
@@ -21,11 +27,18 @@ def build_cfo_memo(summary: List[str], risks: List[dict], actions: List[dict]) -
     return "\n".join(lines)
 
 
+def write_actions_csv(actions: List[dict], handle: IO[str]) -> None:
+    rows = actions or [PLACEHOLDER_ACTION]
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    writer = csv.DictWriter(handle, fieldnames=fieldnames, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+
+
 def actions_to_csv(actions: List[dict]) -> str:
-    df = pd.DataFrame(actions)
-    if df.empty:
-        df = pd.DataFrame([{"action": "No actions generated", "owner": "TBD", "timeframe": "TBD", "impact": "TBD"}])
-    return df.to_csv(index=False)
+    buffer = io.StringIO()
+    write_actions_csv(actions, buffer)
+    return buffer.getvalue()
 
 
 def build_ops_action_plan(actions: List[dict], plan_90_days: List[str]) -> str:
@@ -35,3 +48,49 @@ def build_ops_action_plan(actions: List[dict], plan_90_days: List[str]) -> str:
     lines.append("\n## 90-Day Execution Cadence")
     lines.extend([f"- {item}" for item in plan_90_days])
     return "\n".join(lines)
+
+
+class Deliverables:
+    """Stakeholder artifacts for one AgentOutput, each rendered on first access only."""
+
+    def __init__(self, output: AgentOutput) -> None:
+        self.output = output
+
+    @property
+    def actions(self) -> List[dict]:
+        return self.output.dumped()["recommendations"]["actions"]
+
+    @property
+    def risks(self) -> List[dict]:
+        return self.output.dumped()["recommendations"]["risks"]
+
+    @cached_property
+    def cfo_memo(self) -> str:
+        return build_cfo_memo(self.output.executive_summary, self.risks, self.actions)
+
+    @cached_property
+    def ops_action_plan(self) -> str:
+        return build_ops_action_plan(self.actions, self.output.recommendations.plan_90_days)
+
+    @cached_property
+    def jira_csv(self) -> str:
+        return actions_to_csv(self.actions)
+
+    @cached_property
+    def output_json(self) -> str:
+        return self.output.model_dump_json(indent=2)
+
+    @cached_property
+    def bundle(self) -> bytes:
+        """All artifacts in one ZIP; the CSV streams straight into its entry unless already built."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("cfo_memo.md", self.cfo_memo)
+            archive.writestr("ops_action_plan.md", self.ops_action_plan)
+            if "jira_csv" in self.__dict__:
+                archive.writestr("jira_tasks.csv", self.jira_csv)
+            else:
+                with archive.open("jira_tasks.csv", "w") as entry, io.TextIOWrapper(entry, encoding="utf-8", newline="") as text:
+                    write_actions_csv(self.actions, text)
+            archive.writestr("agent_output.json", self.output_json)
+        return buffer.getvalue()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import zipfile
+from dataclasses import asdict
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+import pandas as pd
+
+from memory.result_cache import digest_bytes, prune_directory, touch
+from tools.data_tools import IngestReport, ProgressCallback, _peak_rss_mb, concat_chunks, optimize_dtypes
+from tools.profiling import traced
+
+EXCEL_CHUNK_ROWS = 50_000
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_BLANK = (None, "")
+_XLS_HINT = "Legacy .xls workbooks need the optional 'python-calamine' package (pip install python-calamine)."
+# pandas' default NA spellings, so Excel and CSV uploads agree on what counts as missing.
+NA_VALUES = frozenset(
+    ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+)
+
+
+def excel_cache_dir() -> Optional[Path]:
+    """Columnar sheet cache location; off unless ``AGENTOPS_EXCEL_CACHE_DIR`` is set."""
+    value = os.environ.get("AGENTOPS_EXCEL_CACHE_DIR")
+    return Path(value) if value else None
+
+
+def excel_cache_limit_bytes() -> int:
+    """Disk cap for cached sheets (``AGENTOPS_EXCEL_CACHE_MAX_MB``, default 1024); least recently used go first."""
+    return int(float(os.environ.get("AGENTOPS_EXCEL_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+
+
+def list_sheets(file_bytes: bytes, filename: str) -> List[str]:
+    """Sheet names in workbook order, read from ``xl/workbook.xml`` without loading any cells."""
+    if filename.lower().endswith(".xls"):
+        try:
+            from python_calamine import CalamineWorkbook
+        except ImportError as exc:
+            raise ImportError(_XLS_HINT) from exc
+        return list(CalamineWorkbook.from_filelike(BytesIO(file_bytes)).sheet_names)
+    with zipfile.ZipFile(BytesIO(file_bytes)) as archive, archive.open("xl/workbook.xml") as handle:
+        return [element.get("name", "") for _, element in ElementTree.iterparse(handle) if element.tag == f"{_MAIN}sheet"]
+
+
+def _header(row: Sequence) -> List[str]:
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for idx, value in enumerate(row):
+        name = str(value).strip() if value is not None and str(value).strip() else f"column_{idx + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _open_rows(file_bytes: bytes, filename: str, sheet: str, engine: str) -> Tuple[str, Iterator[Sequence], int]:
+    if engine in ("auto", "calamine"):
+        try:
+            from python_calamine import CalamineWorkbook
+        except ImportError:
+            if engine == "calamine":
+                raise
+        else:
+            worksheet = CalamineWorkbook.from_filelike(BytesIO(file_bytes)).get_sheet_by_name(sheet)
+            return "calamine", worksheet.iter_rows(), worksheet.height
+    if filename.lower().endswith(".xls"):
+        raise ImportError(_XLS_HINT)
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(BytesIO(file_bytes), read_only=True, data_only=True, keep_links=False)
+    worksheet = workbook[sheet]
+
+    def rows() -> Iterator[Sequence]:
+        try:
+            yield from worksheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    return "openpyxl-read-only", rows(), worksheet.max_row or 0
+
+
+def iter_sheet_chunks(
+    file_bytes: bytes,
+    filename: str,
+    sheet: str,
+    chunk_rows: int = EXCEL_CHUNK_ROWS,
+    progress: Optional[ProgressCallback] = None,
+    engine: str = "auto",
+    report: Optional[IngestReport] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield one sheet as frames of ``chunk_rows`` rows, header taken from the first non-empty row.
+
+    ``engine="auto"`` uses python-calamine when installed (a Rust reader, also the only
+    .xls path) and openpyxl's read-only streaming mode otherwise. Only one chunk of
+    Python row tuples is alive at a time; ``progress`` gets an approximate
+    (bytes_done, total_bytes) derived from the row count.
+    """
+    name, rows, total_rows = _open_rows(file_bytes, filename, sheet, engine)
+    if report is not None:
+        report.engine = name
+    header = next((row for row in rows if any(value not in _BLANK for value in row)), None)
+    if header is None:
+        return
+    columns = _header(header)
+    width = len(columns)
+    batch: List[Sequence] = []
+    done = 1
+    for row in rows:
+        if any(value not in _BLANK for value in row):
+            batch.append(row[:width] if len(row) >= width else (*row, *(None,) * (width - len(row))))
+        if len(batch) >= chunk_rows:
+            done += len(batch)
+            yield pd.DataFrame.from_records(batch, columns=columns)
+            batch = []
+            if progress and total_rows:
+                progress(int(len(file_bytes) * min(done / total_rows, 1.0)), len(file_bytes))
+    if batch or done == 1:
+        yield pd.DataFrame.from_records(batch, columns=columns)
+
+
+def _settle_types(df: pd.DataFrame) -> pd.DataFrame:
+    # Cells of one column can mix numbers, text and dates; keep those as strings so the
+    # frame has one type per column (and can be written to Parquet). NA spellings follow
+    # pandas' readers, and calamine's whole-number floats go back to integers.
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object:
+            series = series.where(~series.isin(NA_VALUES), None)
+            kind = pd.api.types.infer_dtype(series, skipna=True)
+            if kind in ("integer", "floating", "mixed-integer-float", "decimal"):
+                series = pd.to_numeric(series, errors="coerce")
+            elif kind in ("datetime", "date", "datetime64"):
+                series = pd.to_datetime(series, errors="coerce")
+            elif kind not in ("string", "empty", "boolean"):
+                series = series.map(lambda value: None if value is None else str(value)).astype(object)
+        if pd.api.types.is_float_dtype(series.dtype) and len(series) and series.notna().all() and (series % 1 == 0).all():
+            series = series.astype("int64")
+        df[col] = series
+    return df
+
+
+def _cache_path(directory: Path, digest: str, sheet: str) -> Path:
+    return directory / f"{digest}-{digest_bytes(sheet.encode('utf-8'))[:12]}.parquet"
+
+
+def _read_cached(path: Path) -> Optional[pd.DataFrame]:
+    try:
+        df = pd.read_parquet(path)
+    except (ImportError, OSError, ValueError):  # no Parquet engine, or a torn/stale file
+        return None
+    touch(path)
+    return df
+
+
+def _write_cached(path: Path, df: pd.DataFrame) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        prune_directory(path.parent, "*.parquet", excel_cache_limit_bytes(), keep=path)
+    except (ImportError, OSError, ValueError, TypeError):
+        # Caching is an optimization; an unwritable directory or an unsupported column type must not fail ingest.
+        pass
+
+
+def _load_sheet(file_bytes: bytes, filename: str, sheet: str, progress: Optional[ProgressCallback], chunk_rows: int, report: IngestReport) -> pd.DataFrame:
+    chunks = list(iter_sheet_chunks(file_bytes, filename, sheet, chunk_rows, progress, report=report))
+    report.chunks = len(chunks)
+    return _settle_types(concat_chunks(chunks))
+
+
+@traced()
+def load_excel_sheets(
+    file_bytes: bytes,
+    filename: str,
+    sheets: Optional[Sequence[str]] = None,
+    progress: Optional[ProgressCallback] = None,
+    chunk_rows: int = EXCEL_CHUNK_ROWS,
+    cache_dir: Optional[Path] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Load the selected sheets (all when ``sheets`` is None) as separate frames.
+
+    Each sheet is converted once to Parquet under the cache directory, keyed by the
+    workbook's content hash and the sheet name, so a re-upload skips openpyxl entirely.
+    Every frame carries an ``ingest_report`` in ``attrs`` like the CSV path.
+    """
+    directory = cache_dir if cache_dir is not None else excel_cache_dir()
+    available = list_sheets(file_bytes, filename)
+    wanted = list(sheets) if sheets else available
+    missing = [sheet for sheet in wanted if sheet not in available]
+    if missing:
+        raise ValueError(f"Workbook has no sheet named {', '.join(map(repr, missing))}; available: {', '.join(available)}.")
+    digest = digest_bytes(file_bytes)
+    frames: Dict[str, pd.DataFrame] = {}
+    for sheet in wanted:
+        start = time.perf_counter()
+        report = IngestReport(engine="parquet-cache", chunks=1, total_bytes=len(file_bytes))
+        path = _cache_path(directory, digest, sheet) if directory is not None else None
+        df = _read_cached(path) if path is not None and path.exists() else None
+        if df is None:
+            df = optimize_dtypes(_load_sheet(file_bytes, filename, sheet, progress, chunk_rows, report))
+            if path is not None:
+                _write_cached(path, df)
+        report.rows = len(df)
+        report.bytes_read = len(file_bytes)
+        report.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        report.frame_mb = round(float(df.memory_usage(index=False).sum()) / (1024 * 1024), 2)
+        report.peak_rss_mb = _peak_rss_mb()
+        report.categorical_cols = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+        df.attrs["ingest_report"] = {**asdict(report), "sheet": sheet, "sheets": available}
+        frames[sheet] = df
+        if progress:
+            progress(len(file_bytes), len(file_bytes))
+    return frames
+
@@ -0,0 +1,444 @@
+from __future__ import annotations
+
+import codecs
+import json
+import math
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from tools.profiling import traced
+
+READ_CHUNK_BYTES = 1 << 20
+FLUSH_POINTS = 65_536
+TIMESTAMP_KEYS = ("timestamp", "ts", "time", "@timestamp", "datetime", "date")
+NAME_KEYS = ("metric", "name", "series")
+_NAT = np.iinfo("int64").min
+_decoder = json.JSONDecoder()
+_DELIMITERS = frozenset(" \t\r\n,]}")
+
+Source = Union[bytes, bytearray, memoryview, Iterable[bytes]]
+
+
+def _chunks(source: Source, chunk_bytes: int = READ_CHUNK_BYTES) -> Iterator[bytes]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_bytes):
+            yield bytes(view[start : start + chunk_bytes])
+    elif hasattr(source, "read"):
+        while True:
+            block = source.read(chunk_bytes)
+            if not block:
+                return
+            yield block
+    else:
+        yield from source
+
+
+class _TextStream:
+    """Pull-based JSON reader that holds at most about twice one element plus one read chunk in memory."""
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        block = next(self._chunks, None)
+        if block is None:
+            self.eof = True
+            self.buf = self.buf[self.pos :] + self._utf8.decode(b"", final=True)
+        else:
+            self.buf = self.buf[self.pos :] + self._utf8.decode(block)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected: str) -> None:
+        if self.peek() != expected:
+            raise ValueError(f"Expected {expected!r} at offset {self.pos}, found {self.peek()!r}")
+        self.pos += 1
+
+    def _grow(self) -> bool:
+        """Read until the unparsed text has doubled, so a value spanning many chunks is
+        re-decoded O(log n) times instead of once per chunk."""
+        target = 2 * (len(self.buf) - self.pos)
+        filled = False
+        while self._fill():
+            filled = True
+            if len(self.buf) - self.pos >= target:
+                break
+        return filled
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._grow():
+                    raise
+                continue
+            # A number cut by the chunk edge ("79." of "79.5") decodes as a shorter number;
+            # only trust it once a delimiter follows.
+            if isinstance(obj, (int, float)) and not self.eof and (end == len(self.buf) or self.buf[end] not in _DELIMITERS):
+                self._fill()
+                continue
+            self.pos = end
+            return obj
+
+    def elements(self) -> Iterator[Any]:
+        self.take("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"Malformed JSON array near offset {self.pos}")
+
+
+class SeriesStore:
+    """Columnar metric store: one float64 value column (and int64 ns time column) per series.
+
+    Records arrive in batches and are split into columns with pandas; scattered single
+    points are buffered and converted every ``flush_points``. Python-object overhead is
+    therefore bounded by one batch regardless of file size.
+    """
+
+    def __init__(self, flush_points: int = FLUSH_POINTS) -> None:
+        self.flush_points = flush_points
+        self.attributes: Dict[str, Any] = {}
+        self.records = 0
+        self.skipped = 0
+        self._values: Dict[str, array] = {}
+        self._times: Dict[str, array] = {}
+        self._pending: Dict[str, Tuple[List[float], List[Any]]] = {}
+        self._pending_points = 0
+
+    def _extend(self, name: str, values: np.ndarray, stamps: np.ndarray) -> None:
+        self._values.setdefault(name, array("d")).frombytes(np.ascontiguousarray(values, dtype="float64").tobytes())
+        self._times.setdefault(name, array("q")).frombytes(np.ascontiguousarray(stamps, dtype="int64").tobytes())
+
+    def append(self, name: str, value: Any, ts: Any = None) -> None:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        values, times = self._pending.setdefault(name, ([], []))
+        values.append(value)
+        times.append(ts)
+        self._pending_points += 1
+        if self._pending_points >= self.flush_points:
+            self.flush()
+
+    def add_records(self, records: List[Dict[str, Any]]) -> None:
+        """Wide (``{"ts", "latency_ms", ...}``) or long (``{"ts", "metric", "value"}``) records."""
+        if not records:
+            return
+        self.records += len(records)
+        frame = pd.DataFrame.from_records(records)
+        ts_col = next((key for key in TIMESTAMP_KEYS if key in frame.columns), None)
+        stamps = _to_ns(frame[ts_col]) if ts_col else np.full(len(frame), _NAT, dtype="int64")
+        name_col = next((key for key in NAME_KEYS if key in frame.columns and not pd.api.types.is_numeric_dtype(frame[key])), None)
+        if name_col is not None and "value" in frame.columns:
+            values = _numeric(frame["value"])
+            for name, rows in frame.groupby(name_col, sort=False).indices.items():
+                keep = rows[~np.isnan(values[rows])]
+                self._extend(str(name), values[keep], stamps[keep])
+            return
+        for col in frame.columns:
+            if col == ts_col or pd.api.types.is_bool_dtype(frame[col]):
+                continue
+            values = _numeric(frame[col])
+            keep = ~np.isnan(values)
+            if keep.any():
+                self._extend(str(col), values[keep], stamps[keep])
+
+    def flush(self) -> None:
+        for name, (values, times) in self._pending.items():
+            self._extend(name, np.asarray(values, dtype="float64"), _to_ns(pd.Series(times, dtype=object)))
+        self._pending.clear()
+        self._pending_points = 0
+
+    def series(self) -> Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]]:
+        self.flush()
+        out = {}
+        for name, values in self._values.items():
+            times = np.frombuffer(self._times[name], dtype="int64")
+            stamps = times.view("datetime64[ns]") if (times != _NAT).any() else None
+            out[name] = (np.frombuffer(values, dtype="float64"), stamps)
+        return out
+
+
+def _numeric(column: pd.Series) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy(dtype="float64", na_value=np.nan)
+    return pd.to_numeric(column, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _to_ns(raw: pd.Series) -> np.ndarray:
+    if raw.isna().all():
+        return np.full(len(raw), _NAT, dtype="int64")
+    numeric = pd.to_numeric(raw, errors="coerce")
+    if numeric.notna().all():
+        # Epoch seconds vs milliseconds, decided once per batch.
+        unit = "ms" if float(numeric.abs().max()) > 1e11 else "s"
+        stamps = pd.to_datetime(numeric, unit=unit, utc=True, errors="coerce")
+    else:
+        stamps = pd.to_datetime(raw, utc=True, errors="coerce", format="mixed")
+    return stamps.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").astype("int64")
+
+
+def _looks_like_ndjson(head: bytes) -> bool:
+    first, _, rest = head.lstrip().partition(b"\n")
+    if not rest.strip():
+        return False
+    try:
+        return isinstance(json.loads(first), dict)
+    except ValueError:
+        return False
+
+
+def _prometheus_name(labels: Dict[str, Any]) -> str:
+    name = str(labels.get("__name__", "series"))
+    rest = ",".join(f"{key}={value}" for key, value in sorted(labels.items()) if key != "__name__")
+    return f"{name}{{{rest}}}" if rest else name
+
+
+def _add_prometheus(item: Dict[str, Any], store: SeriesStore) -> bool:
+    """Prometheus query results: ``{"metric": {labels}, "values": [[ts, "1.5"], ...]}`` (or one ``"value"``)."""
+    points = item.get("values") if "values" in item else [item.get("value")]
+    if not isinstance(item.get("metric"), dict) or not isinstance(points, list):
+        return False
+    pairs = [point for point in points if isinstance(point, list) and len(point) == 2]
+    if pairs:
+        values = pd.to_numeric(pd.Series([value for _, value in pairs], dtype=object), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        stamps = _to_ns(pd.Series([ts for ts, _ in pairs], dtype=object))
+        keep = ~np.isnan(values)
+        store._extend(_prometheus_name(item["metric"]), values[keep], stamps[keep])
+    store.records += 1
+    return True
+
+
+def _consume_records(items: Iterable[Any], store: SeriesStore, series_name: Optional[str] = None) -> None:
+    batch: List[Dict[str, Any]] = []
+    for item in items:
+        if isinstance(item, dict):
+            if _add_prometheus(item, store):
+                continue
+            if series_name is not None and "value" in item and not any(key in item for key in NAME_KEYS):
+                # {"latency": [{"ts": ..., "value": ...}]} -> series "latency"
+                item = {**item, "metric": series_name}
+            batch.append(item)
+            if len(batch) >= store.flush_points:
+                store.add_records(batch)
+                batch = []
+        elif series_name is None:
+            continue
+        elif isinstance(item, list) and len(item) == 2:
+            store.append(series_name, item[1], item[0])
+        else:
+            store.append(series_name, item)
+    store.add_records(batch)
+
+
+def _consume_object(stream: _TextStream, store: SeriesStore, prefix: str = "") -> None:
+    """Walk an object member by member, descending into nested objects without decoding them.
+
+    Arrays become series named by their dotted path (``{"data": {"result": [...]}}`` ->
+    ``data.result``), numbers become single points and other scalars attributes.
+    """
+    stream.take("{")
+    while stream.peek() != "}":
+        key = stream.value()
+        path = f"{prefix}.{key}" if prefix else str(key)
+        stream.take(":")
+        if stream.peek() == "[":
+            _consume_records(stream.elements(), store, series_name=path)
+        elif stream.peek() == "{":
+            _consume_object(stream, store, path)
+        else:
+            value = stream.value()
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                store.append(path, value)
+            elif len(store.attributes) < 20:
+                store.attributes[path] = value
+        if stream.peek() == ",":
+            stream.pos += 1
+    stream.pos += 1
+
+
+def _consume_document(stream: _TextStream, store: SeriesStore) -> None:
+    if stream.peek() == "[":
+        _consume_records(stream.elements(), store)
+        return
+    _consume_object(stream, store)
+
+
+def _parse_lines(lines: List[bytes], store: SeriesStore) -> List[Any]:
+    # One C-level decode per chunk; fall back to per-line only when a chunk has a bad line.
+    try:
+        return json.loads(b"[" + b",".join(lines) + b"]")
+    except ValueError:
+        parsed = []
+        for line in lines:
+            try:
+                parsed.append(json.loads(line))
+            except ValueError:
+                store.skipped += 1
+        return parsed
+
+
+@traced("metrics_stream_parser")
+def parse_metrics(source: Source, chunk_bytes: int = READ_CHUNK_BYTES) -> Tuple[SeriesStore, str]:
+    """Parse a JSON document or NDJSON stream incrementally into a :class:`SeriesStore`.
+
+    Accepts wide records (``{"ts": ..., "latency_ms": 120, "errors": 3}``), long records
+    (``{"ts": ..., "metric": "latency_ms", "value": 120}``), Prometheus query results
+    (``{"metric": {...}, "values": [[ts, "v"], ...]}``), a top-level array of any of these,
+    or objects (nested to any depth) of per-metric arrays. Returns the store and the
+    detected format.
+    """
+    chunks = _chunks(source, chunk_bytes)
+    head = next(chunks, b"")
+    store = SeriesStore()
+    if _looks_like_ndjson(head):
+        tail = b""
+        for block in _prepend(head, chunks):
+            lines = (tail + block).split(b"\n")
+            tail = lines.pop()
+            _consume_records(_parse_lines([line for line in lines if line.strip()], store), store)
+        if tail.strip():
+            _consume_records(_parse_lines([tail], store), store)
+        return store, "ndjson"
+    _consume_document(_TextStream(_prepend(head, chunks)), store)
+    return store, "json"
+
+
+def _prepend(head: bytes, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    if head:
+        yield head
+    yield from chunks
+
+
+def default_window(points: int) -> int:
+    return int(min(60, max(5, points // 20)))
+
+
+@traced()
+def rolling_p95(values: np.ndarray, window: int, factor: float = 2.0) -> Dict[str, Any]:
+    """Rolling p95 and the points that exceed ``factor`` x the trailing window's p95."""
+    rolling = pd.Series(values).rolling(window, min_periods=window).quantile(0.95).to_numpy()
+    trailing = np.concatenate([[np.nan], rolling[:-1]])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = values / trailing
+    breaches = np.flatnonzero(ratio > factor)
+    valid = rolling[~np.isnan(rolling)]
+    out: Dict[str, Any] = {
+        "window": window,
+        "baseline_p95": float(np.median(valid)) if len(valid) else None,
+        "peak_p95": float(valid.max()) if len(valid) else None,
+        "peak_index": int(np.nanargmax(rolling)) if len(valid) else None,
+        "breaches": int(len(breaches)),
+        "worst_index": None,
+    }
+    if len(breaches):
+        worst = int(breaches[np.nanargmax(ratio[breaches])])
+        out.update({"worst_index": worst, "worst_value": float(values[worst]), "worst_ratio": round(float(ratio[worst]), 2)})
+    return out
+
+
+def _baseline(values: np.ndarray) -> Tuple[float, float, float, float]:
+    # EWMA converges to the mean, so centre on a winsorized mean (not the median, which
+    # sits below the mean on skewed latency data and would read as permanent drift).
+    low, high = np.percentile(values, [0.5, 99.5])
+    clipped = np.clip(values, low, high)
+    return float(clipped.mean()), float(clipped.std()) or 1.0, float(low), float(high)
+
+
+def _first_run(mask: np.ndarray, length: int) -> Optional[int]:
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.astype("int8"), [0]])))
+    starts, stops = edges[::2], edges[1::2]
+    sustained = np.flatnonzero(stops - starts >= length)
+    return int(starts[sustained[0]]) if len(sustained) else None
+
+
+@traced()
+def ewma_drift(values: np.ndarray, span: int, threshold: float = 3.0, baseline_fraction: float = 0.2) -> Dict[str, Any]:
+    """EWMA control chart against a baseline taken from the start of the series.
+
+    Drift is reported only when the chart stays beyond ``threshold`` for ``span``
+    consecutive points; on long series a single crossing is expected by chance alone.
+    """
+    n_base = max(span, int(len(values) * baseline_fraction))
+    out: Dict[str, Any] = {"span": span, "baseline": None, "max_abs_z": 0.0, "alarm_share": 0.0, "first_index": None}
+    if len(values) <= n_base:
+        return out
+    center, scale, low, high = _baseline(values[:n_base])
+    lam = 2.0 / (span + 1)
+    # Isolated spikes are rolling_p95's job; clipping keeps them from reading as drift.
+    ewma = pd.Series(np.clip(values, low, high)).ewm(alpha=lam, adjust=False).mean().to_numpy()
+    z = ((ewma - center) / (scale * math.sqrt(lam / (2 - lam))))[n_base:]
+    alarms = np.abs(z) > threshold
+    out.update({"baseline": center, "max_abs_z": round(float(np.abs(z).max()), 2), "alarm_share": round(float(alarms.mean()), 3)})
+    first = _first_run(alarms, span)
+    if first is not None:
+        out.update({"first_index": first + n_base, "direction": "up" if z[first] > 0 else "down", "ewma_at_end": float(ewma[-1])})
+    return out
+
+
+@traced()
+def change_points(values: np.ndarray, max_points: int = 5, min_size: Optional[int] = None, threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Mean-shift change points by binary segmentation on cumulative sums.
+
+    Noise is estimated from first differences (MAD / sqrt 2), which a level shift barely
+    moves, and each split is scored as a standardized two-sample mean difference.
+    """
+    n = len(values)
+    min_size = min_size or max(5, n // 50)
+    if n < 2 * min_size:
+        return []
+    diffs = np.diff(values)
+    sigma = 1.4826 * float(np.median(np.abs(diffs - np.median(diffs)))) / math.sqrt(2) or float(np.std(values)) or 1.0
+    threshold = threshold or 1.5 * math.sqrt(2 * math.log(n))
+    cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    found: List[Dict[str, Any]] = []
+    segments = [(0, n)]
+    while segments and len(found) < max_points:
+        best = None
+        for start, stop in segments:
+            size = stop - start
+            if size < 2 * min_size:
+                continue
+            split = np.arange(start + min_size, stop - min_size + 1)
+            left = split - start
+            left_mean = (cumsum[split] - cumsum[start]) / left
+            right_mean = (cumsum[stop] - cumsum[split]) / (size - left)
+            score = np.abs(left_mean - right_mean) * np.sqrt(left * (size - left) / size) / sigma
+            idx = int(np.argmax(score))
+            if best is None or score[idx] > best[0]:
+                best = (float(score[idx]), int(split[idx]), start, stop, float(left_mean[idx]), float(right_mean[idx]))
+        if best is None or best[0] < threshold:
+            break
+        score, split, start, stop, before, after = best
+        found.append({"index": split, "before": before, "after": after, "score": round(score, 2)})
+        segments.remove((start, stop))
+        segments.extend([(start, split), (split, stop)])
+    return sorted(found, key=lambda item: item["index"])
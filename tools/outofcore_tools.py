@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from memory.result_cache import digest_bytes, prune_directory, touch
+from tools.data_tools import IngestReport, OutlierAccumulator, _peak_rss_mb
+from tools.profiling import traced
+from tools.stats_tools import FAST_SKETCH_K, DatasetStats, StatsAccumulator
+from tools.viz_tools import ChartAccumulator
+
+DEFAULT_BUDGET_MB = 1024
+FRAME_EXPANSION = 3  # in-memory frame size relative to the file, as a rule of thumb
+MAX_SPILL_BLOCK_BYTES = 64 * 1024 * 1024
+_ARROW_HINT = "Out-of-core analysis needs the optional 'pyarrow' package (pip install pyarrow)."
+
+
+def memory_budget_bytes() -> int:
+    """Working-memory budget for out-of-core runs (``AGENTOPS_MEMORY_BUDGET_MB``, default 1024)."""
+    return int(os.environ.get("AGENTOPS_MEMORY_BUDGET_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024
+
+
+def spill_cache_dir() -> Path:
+    return Path(os.environ.get("AGENTOPS_SPILL_DIR", ".cache/spill"))
+
+
+def spill_cache_limit_bytes() -> int:
+    """Disk cap for kept spills (``AGENTOPS_SPILL_MAX_MB``, default 10240); least recently used go first."""
+    return int(float(os.environ.get("AGENTOPS_SPILL_MAX_MB", "10240")) * 1024 * 1024)
+
+
+def needs_out_of_core(path: Path | str, budget: Optional[int] = None) -> bool:
+    """Whether loading ``path`` as one frame would likely exceed the memory budget."""
+    budget = budget or memory_budget_bytes()
+    return Path(path).stat().st_size * FRAME_EXPANSION > budget
+
+
+def file_fingerprint(path: Path | str) -> str:
+    """Cheap identity of a file too large to hash: resolved path, size and mtime."""
+    resolved = Path(path).resolve()
+    info = resolved.stat()
+    return digest_bytes(f"{resolved}:{info.st_size}:{info.st_mtime_ns}".encode("utf-8"))
+
+
+@dataclass
+class SpilledTable:
+    """A columnar copy of an upload on disk, read back in budget-sized batches."""
+
+    path: str
+    source: str
+    fingerprint: str
+    rows: int = 0
+    columns: List[str] = field(default_factory=list)
+    bytes_per_row: float = 0.0
+    report: Dict = field(default_factory=dict)
+
+
+def batch_rows(table: SpilledTable, columns: Optional[Sequence[str]] = None, budget: Optional[int] = None) -> int:
+    """Rows per batch so that one batch, its pandas copy and a float block fit in a quarter of the budget."""
+    budget = budget or memory_budget_bytes()
+    share = len(columns) / max(len(table.columns), 1) if columns is not None else 1.0
+    row_bytes = max(table.bytes_per_row * share, 8.0) * 3 + 8 * (len(columns) if columns is not None else len(table.columns))
+    return int(min(max(budget // 4 // row_bytes, 1_000), 1_000_000))
+
+
+def _write_csv_spill(source: Path, target: Path, block_bytes: int, widen_ints: bool, report: IngestReport) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import csv as pa_csv
+
+    read_options = pa_csv.ReadOptions(block_size=block_bytes)
+    reader = pa_csv.open_csv(source, read_options=read_options)
+    if widen_ints:
+        types = {item.name: pa.float64() for item in reader.schema if pa.types.is_integer(item.type)}
+        reader = pa_csv.open_csv(source, read_options=read_options, convert_options=pa_csv.ConvertOptions(column_types=types))
+    with pq.ParquetWriter(target, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            report.chunks += 1
+            report.bytes_read = min(report.bytes_read + block_bytes, report.total_bytes)
+
+
+@traced()
+def spill_to_parquet(path: Path | str, budget: Optional[int] = None, cache_dir: Optional[Path] = None) -> SpilledTable:
+    """Convert a CSV to a Parquet spill file once, streaming blocks sized from the budget.
+
+    Parquet inputs are used in place. Spills are kept under ``AGENTOPS_SPILL_DIR`` keyed by
+    :func:`file_fingerprint`, so re-running on an unchanged export skips the CSV parse;
+    after each new spill the least recently used ones are deleted down to
+    :func:`spill_cache_limit_bytes`.
+    pyarrow fixes column types from the first block; when a later block does not fit (an
+    integer column with a decimal further down), the spill restarts with integers widened
+    to float64.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError(_ARROW_HINT) from exc
+
+    source = Path(path)
+    budget = budget or memory_budget_bytes()
+    start = time.perf_counter()
+    fingerprint = file_fingerprint(source)
+    report = IngestReport(engine="parquet", total_bytes=source.stat().st_size)
+    suffix = source.suffix.lower()
+    if suffix == ".parquet":
+        target = source
+    elif suffix == ".csv":
+        directory = cache_dir if cache_dir is not None else spill_cache_dir()
+        target = directory / f"{fingerprint}.parquet"
+        if not target.exists():
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            block_bytes = int(min(MAX_SPILL_BLOCK_BYTES, max(budget // 16, 1024 * 1024)))
+            try:
+                try:
+                    _write_csv_spill(source, tmp, block_bytes, False, report)
+                except pa.ArrowInvalid:
+                    report = IngestReport(engine="parquet", total_bytes=report.total_bytes)
+                    _write_csv_spill(source, tmp, block_bytes, True, report)
+                os.replace(tmp, target)
+            finally:
+                tmp.unlink(missing_ok=True)
+            report.engine = "pyarrow-spill"
+            prune_directory(directory, "*.parquet", spill_cache_limit_bytes(), keep=target)
+        else:
+            touch(target)
+    else:
+        raise ValueError("Out-of-core analysis supports CSV and Parquet files.")
+
+    metadata = pq.ParquetFile(target).metadata
+    uncompressed = sum(metadata.row_group(idx).total_byte_size for idx in range(metadata.num_row_groups))
+    report.rows = metadata.num_rows
+    report.bytes_read = report.total_bytes
+    report.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    report.frame_mb = round(target.stat().st_size / (1024 * 1024), 2)
+    report.peak_rss_mb = _peak_rss_mb()
+    return SpilledTable(
+        path=str(target),
+        source=str(source),
+        fingerprint=fingerprint,
+        rows=metadata.num_rows,
+        columns=list(metadata.schema.to_arrow_schema().names),
+        bytes_per_row=uncompressed / max(metadata.num_rows, 1),
+        report={**asdict(report), "spill_path": str(target)},
+    )
+
+
+def iter_batches(table: SpilledTable, columns: Optional[Sequence[str]] = None, budget: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Yield the table (or just ``columns``) as pandas frames of ``batch_rows`` rows."""
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(table.path)
+    for batch in parquet.iter_batches(batch_size=batch_rows(table, columns, budget), columns=list(columns) if columns is not None else None):
+        yield batch.to_pandas()
+
+
+@traced()
+def profile_out_of_core(table: SpilledTable, budget: Optional[int] = None) -> Tuple[DatasetStats, pd.DataFrame]:
+    """First pass: exact counts, moments and nulls, KLL quartiles, HLL cardinality and duplicates.
+
+    Returns the statistics and the head rows, which stand in for the frame wherever the
+    analysis tools only need a preview. The duplicate hash set is capped at an eighth of
+    the budget, past which the duplicate count becomes a HyperLogLog estimate.
+    """
+    budget = budget or memory_budget_bytes()
+    summary = StatsAccumulator(sketch_k=FAST_SKETCH_K, max_distinct_rows=budget // 8 // 8)
+    for chunk in iter_batches(table, budget=budget):
+        summary.update(chunk)
+    stats = summary.finalize()
+    head = summary.head if summary.head is not None else pd.DataFrame(columns=table.columns)
+    head.attrs["ingest_report"] = table.report
+    return stats, head
+
+
+@traced()
+def scan_out_of_core(
+    table: SpilledTable,
+    stats: DatasetStats,
+    chart_specs: Sequence[Dict],
+    budget: Optional[int] = None,
+    top_rows: int = 20,
+) -> Tuple[Dict, List[Optional[Dict]]]:
+    """Second pass over the columns they need: IQR outlier scoring and chart aggregation.
+
+    Returns a ``score_outliers``-shaped report and one ``aggregate_chart``-shaped payload
+    (or None) per chart spec.
+    """
+    outliers = OutlierAccumulator(stats, top_rows)
+    charts = [ChartAccumulator(spec, stats) for spec in chart_specs]
+    columns = list(dict.fromkeys([*outliers.columns, *(col for chart in charts for col in chart.columns)]))
+    if not columns:
+        outliers.rows = stats.rows
+    else:
+        for chunk in iter_batches(table, columns, budget):
+            outliers.update(chunk)
+            for chart in charts:
+                chart.update(chunk)
+    return outliers.finalize(), [chart.finalize() for chart in charts]
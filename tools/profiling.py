@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_current: ContextVar[Optional["Tracer"]] = ContextVar("agentops_tracer", default=None)
+# tracemalloc (start/stop/reset_peak) is process-global: one thread captures memory at a time.
+_memory_owner = threading.RLock()
+
+
+class Tracer:
+    """Collects nested timing spans (wall, CPU and optionally peak traced memory).
+
+    Peak memory is traced process-wide, so it also counts allocations made by other
+    threads while a span is open.
+    """
+
+    def __init__(self, capture_memory: bool = False, capture_profile: bool = False) -> None:
+        self.capture_memory = capture_memory
+        self.capture_profile = capture_profile
+        self.spans: List[Dict[str, Any]] = []
+        self.profile_text: Optional[str] = None
+        self.memory_skipped = False
+        self._origin = time.perf_counter()
+        self._stack: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def span(self, name: str, category: str = "tool", **args: Any) -> Iterator[Dict[str, Any]]:
+        record: Dict[str, Any] = {
+            "name": name,
+            "cat": category,
+            "depth": len(self._stack),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        parent_peak = None
+        if self.capture_memory and tracemalloc.is_tracing():
+            current, parent_peak = tracemalloc.get_traced_memory()
+            record["_mem_start"] = current
+            record["_max_child_peak"] = 0
+            tracemalloc.reset_peak()
+        self._stack.append(record)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield record
+        finally:
+            record["start_ms"] = round((wall - self._origin) * 1000, 3)
+            record["wall_ms"] = round((time.perf_counter() - wall) * 1000, 3)
+            record["cpu_ms"] = round((time.thread_time() - cpu) * 1000, 3)
+            self._stack.pop()
+            if "_mem_start" in record:
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop("_max_child_peak"))
+                record["peak_kb"] = round(max(peak - record.pop("_mem_start"), 0) / 1024, 1)
+                # reset_peak() above erased the enclosing span's running peak; hand it back.
+                if self._stack and "_max_child_peak" in self._stack[-1]:
+                    self._stack[-1]["_max_child_peak"] = max(self._stack[-1]["_max_child_peak"], peak, parent_peak or 0)
+            self.spans.append(record)
+
+    def record(self, name: str, category: str, started: float, wall_ms: float, tid: Optional[int] = None, **args: Any) -> Dict[str, Any]:
+        """Add a span timed by the caller (``started`` is a ``perf_counter`` value).
+
+        For overlapping work such as asyncio tasks, which cannot share the nesting stack.
+        """
+        record = {
+            "name": name,
+            "cat": category,
+            "depth": len(self._stack),
+            "tid": tid if tid is not None else threading.get_ident(),
+            "args": args,
+            "start_ms": round((started - self._origin) * 1000, 3),
+            "wall_ms": round(wall_ms, 3),
+            "cpu_ms": None,
+        }
+        self.spans.append(record)
+        return record
+
+    def summary(self) -> List[Dict[str, Any]]:
+        return sorted(self.spans, key=lambda item: item["start_ms"])
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, category: str = "tool", **args: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    tracer = _current.get()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, category, **args) as record:
+        yield record
+
+
+def traced(name: Optional[str] = None, category: str = "tool") -> Callable:
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(label, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def tracing(capture_memory: bool = False, capture_profile: bool = False) -> Iterator[Tracer]:
+    """Trace spans in this context; optionally capture peak memory and a cProfile summary.
+
+    Memory capture is exclusive per process because tracemalloc's peak is global: while
+    another thread holds it, this tracer skips memory and sets ``memory_skipped`` rather
+    than resetting the other run's peaks.
+    """
+    owns_memory = capture_memory and _memory_owner.acquire(blocking=False)
+    tracer = Tracer(owns_memory, capture_profile)
+    tracer.memory_skipped = capture_memory and not owns_memory
+    token = _current.set(tracer)
+    started_tracemalloc = owns_memory and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if capture_profile else None
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler already owns the interpreter hook
+            profiler = None
+    try:
+        yield tracer
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(25)
+            tracer.profile_text = buffer.getvalue()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        if owns_memory:
+            _memory_owner.release()
+        _current.reset(token)
+
+
+def chrome_trace(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Render spans as Chrome trace-event JSON (load in chrome://tracing or Perfetto)."""
+    events = []
+    for item in spans:
+        args = {key: item[key] for key in ("cpu_ms", "peak_kb") if item.get(key) is not None}
+        events.append(
+            {
+                "name": item["name"],
+                "cat": item["cat"],
+                "ph": "X",
+                "ts": round(item["start_ms"] * 1000, 1),
+                "dur": round(item["wall_ms"] * 1000, 1),
+                "pid": 1,
+                "tid": item.get("tid", 1),
+                "args": {**args, **item.get("args", {})},
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
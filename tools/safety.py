@@ -1,24 +1,207 @@
 from __future__ import annotations
 
-from typing import List
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+REFUSAL_MESSAGE = "Request appears unsafe. Please provide a lawful, policy-compliant objective."
+# Policy term syntax: "data breach" matches whole words, "hack*" any word starting with
+# "hack", and "*malware*" the characters anywhere (no word boundaries).
+# "breached" alone is left out so that "SLA breached" reports are not refused.
+BANNED_TERMS = ("hack*", "breach", "breaches", "breaching", "steal*", "stole", "stolen", "malware*")
+_WORD = re.compile(r"[^\W_]+")
+
+
+class AhoCorasick:
+    """Multi-pattern automaton over any hashable symbols (characters or word tokens).
+
+    Built once; scanning costs one transition per input symbol regardless of how many
+    patterns there are.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[Sequence[Hashable], str]]) -> None:
+        self._goto: List[Dict[Hashable, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+        for symbols, label in patterns:
+            state = 0
+            for symbol in symbols:
+                nxt = self._goto[state].get(symbol)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][symbol] = nxt
+                state = nxt
+            if state and label not in self._out[state]:
+                self._out[state] += (label,)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and symbol not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(symbol, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, symbols: Iterable[Hashable]) -> Iterator[Tuple[int, str]]:
+        """Yield (end index, label) for every pattern occurrence."""
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        state = 0
+        for idx, symbol in enumerate(symbols):
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0) if state else root.get(symbol, 0)
+            for label in out[state]:
+                yield idx, label
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation factored into a trie, so ``re`` never retries a shared prefix."""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+class PolicyMatcher:
+    """Compiled term list: word set, phrase automaton, word-prefix table and substring trie.
+
+    Text is lowercased and split into words once (in C, via ``re``). Single words are a set
+    intersection with the text's vocabulary, phrases take one automaton step per word and
+    substrings one pass of a trie-shaped regex, so scan time is linear in the text and flat
+    in the number of terms. Matching is word-bounded unless a term is written ``*like this*``.
+    """
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        phrases: List[Tuple[Tuple[str, ...], str]] = []
+        substrings: Dict[str, str] = {}
+        self._singles: Dict[str, str] = {}
+        self._prefixes: Dict[str, str] = {}
+        for raw in terms:
+            term = raw.strip().lower()
+            if len(term) > 2 and term.startswith("*") and term.endswith("*"):
+                substrings[term[1:-1]] = raw
+                continue
+            words = tuple(_WORD.findall(term.rstrip("*")))
+            if not words:
+                continue
+            if term.endswith("*") and len(words) == 1:
+                self._prefixes[words[0]] = raw
+            elif len(words) == 1:
+                self._singles[words[0]] = raw
+            else:
+                phrases.append((words, raw))
+        self.terms = len(self._singles) + len(phrases) + len(substrings) + len(self._prefixes)
+        self._phrases = AhoCorasick(phrases) if phrases else None
+        self._phrase_heads = frozenset(words[0] for words, _ in phrases)
+        self._substrings = substrings
+        self._substring_re = re.compile(_trie_pattern(substrings)) if substrings else None
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes})
+
+    @classmethod
+    def from_file(cls, path: Path, extra: Iterable[str] = ()) -> "PolicyMatcher":
+        """One term per line; blank lines and ``#`` comments are ignored."""
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+        return cls([*extra, *(line for line in lines if line.strip() and not line.lstrip().startswith("#"))])
+
+    def _iter(self, text: str) -> Iterator[str]:
+        lower = text.lower()
+        words = _WORD.findall(lower)
+        vocabulary = set(words)
+        for word in vocabulary.intersection(self._singles):
+            yield self._singles[word]
+        if self._prefixes:
+            prefixes, lengths = self._prefixes, self._prefix_lengths
+            for word in vocabulary:
+                for size in lengths:
+                    if size > len(word):
+                        break
+                    label = prefixes.get(word[:size])
+                    if label is not None:
+                        yield label
+        if self._phrases is not None and not vocabulary.isdisjoint(self._phrase_heads):
+            for _, label in self._phrases.iter_matches(words):
+                yield label
+        if self._substring_re is not None:
+            for found in self._substring_re.finditer(lower):
+                yield self._substrings[found.group()]
+
+    def first(self, text: str) -> Optional[str]:
+        """The first term found, stopping the scan there."""
+        return next(self._iter(text), None)
+
+    def matches(self, text: str) -> List[str]:
+        """Every distinct term found, in discovery order."""
+        return list(dict.fromkeys(self._iter(text)))
+
+
+def _refusal_policy() -> PolicyMatcher:
+    path = os.environ.get("AGENTOPS_POLICY_FILE")
+    return PolicyMatcher.from_file(Path(path), BANNED_TERMS) if path else PolicyMatcher(BANNED_TERMS)
+
+
+REFUSAL_POLICY = _refusal_policy()
+
+
+@dataclass(frozen=True)
+class ConstraintRule:
+    """Rewrite ``field`` of every action with ``template`` when a constraint mentions a trigger."""
+
+    name: str
+    triggers: Tuple[str, ...]
+    field: str
+    template: str
+
+
+CONSTRAINT_RULES = (
+    ConstraintRule("budget", ("budget*",), "impact", "Cost-aware: {}"),
+    ConstraintRule("compliance", ("hipaa", "gdpr", "pci"), "action", "[Compliance Review Required] {}"),
+)
+_CONSTRAINT_POLICY = PolicyMatcher(trigger for rule in CONSTRAINT_RULES for trigger in rule.triggers)
+_RULES_BY_TRIGGER = {trigger: rule for rule in CONSTRAINT_RULES for trigger in rule.triggers}
+
+
+@lru_cache(maxsize=256)
+def compile_constraints(constraints: Tuple[str, ...]) -> Tuple[ConstraintRule, ...]:
+    """The rules a constraint list triggers, in rule order; resolved once per distinct list."""
+    fired = {_RULES_BY_TRIGGER[term].name for term in _CONSTRAINT_POLICY.matches(" \n ".join(constraints))}
+    return tuple(rule for rule in CONSTRAINT_RULES if rule.name in fired)
 
 
 def enforce_constraints(constraints: List[str], recommendations: List[dict]) -> List[dict]:
-    normalized = " ".join(constraints).lower()
-    tuned = []
-    for rec in recommendations:
-        action = rec.copy()
-        if "budget" in normalized:
-            action["impact"] = f"Cost-aware: {action['impact']}"
-        if "hipaa" in normalized or "gdpr" in normalized or "pci" in normalized:
-            action["action"] = f"[Compliance Review Required] {action['action']}"
-        tuned.append(action)
+    rewrites = [(rule.field, *rule.template.split("{}", 1)) for rule in compile_constraints(tuple(constraints))]
+    tuned = [rec.copy() for rec in recommendations]
+    for field, before, after in rewrites:
+        for action in tuned:
+            action[field] = f"{before}{action[field]}{after}"
     return tuned
 
 
-def refusal_check(problem_statement: str) -> str | None:
-    banned = ["hack", "breach", "steal", "malware"]
-    lower = problem_statement.lower()
-    if any(term in lower for term in banned):
-        return "Request appears unsafe. Please provide a lawful, policy-compliant objective."
+def refusal_check(problem_statement: str, policy: Optional[PolicyMatcher] = None) -> str | None:
+    if (policy or REFUSAL_POLICY).first(problem_statement) is not None:
+        return REFUSAL_MESSAGE
     return None
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import math
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values: pd.Series | np.ndarray) -> np.ndarray:
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    return pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy()
+
+
+class KLLSketch:
+    """Mergeable KLL quantile sketch over float values.
+
+    Each compaction at level ``h`` shifts any rank by ``0`` or ``±2**h`` with equal
+    probability, so Hoeffding gives the high-probability bound in ``rank_error``.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 0) -> None:
+        self.k = k
+        self.n = 0
+        self.min = math.nan
+        self.max = math.nan
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._weight_sq = 0.0
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self) -> None:
+        while True:
+            level = next((h for h, items in enumerate(self.levels) if len(items) > self._capacity(h)), None)
+            if level is None:
+                return
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            items = items[: len(items) - len(keep)]
+            promoted = items[int(self._rng.integers(0, 2)) :: 2]
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            self._weight_sq += float(4**level)
+
+    def update(self, values: Iterable[float]) -> "KLLSketch":
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return self
+        self.n += int(values.size)
+        self.min = float(np.fmin(self.min, values.min()))
+        self.max = float(np.fmax(self.max, values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = float(np.fmin(self.min, other.min))
+        self.max = float(np.fmax(self.max, other.max))
+        self._weight_sq += other._weight_sq
+        self._compress()
+        return self
+
+    def quantiles(self, qs: Iterable[float]) -> np.ndarray:
+        qs = np.asarray(list(qs), dtype="float64")
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_h), 2.0**h) for h, items_h in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, qs * cumulative[-1], side="left")
+        result = items[np.minimum(positions, len(items) - 1)]
+        result = np.where(qs <= 0, self.min, result)
+        return np.where(qs >= 1, self.max, result)
+
+    def rank_error(self, alpha: float = 0.01) -> float:
+        """Normalized rank error that holds with probability ``1 - alpha``."""
+        if self.n == 0 or self._weight_sq == 0:
+            return 0.0
+        return math.sqrt(2 * self._weight_sq * math.log(2 / alpha)) / self.n
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over 64-bit pandas value hashes."""
+
+    def __init__(self, p: int = 12) -> None:
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype="uint8")
+
+    def update_hashes(self, hashes: np.ndarray) -> "HyperLogLog":
+        if not len(hashes):
+            return self
+        hashes = np.asarray(hashes, dtype="uint64")
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes << np.uint64(self.p)
+        rank = np.full(len(hashes), 64 - self.p + 1, dtype="uint8")
+        nonzero = rest != 0
+        rank[nonzero] = (64 - np.floor(np.log2(rest[nonzero].astype("float64")))).astype("uint8")
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def update(self, values: pd.Series | np.ndarray) -> "HyperLogLog":
+        return self.update_hashes(hash_values(values))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / float(np.sum(np.power(2.0, -self.registers.astype("float64"))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+
+class ReservoirSampler:
+    """Uniform fixed-size row sample over a stream of frames (bottom-k random keys, mergeable)."""
+
+    def __init__(self, size: int, seed: int = 0) -> None:
+        self.size = size
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._keys = np.empty(0)
+        self._rows: Optional[pd.DataFrame] = None
+
+    def update(self, chunk: pd.DataFrame) -> "ReservoirSampler":
+        keys = np.concatenate([self._keys, self._rng.random(len(chunk))])
+        rows = chunk if self._rows is None else pd.concat([self._rows, chunk])
+        self.seen += len(chunk)
+        if len(keys) > self.size:
+            keep = np.sort(np.argpartition(keys, self.size)[: self.size])
+            keys, rows = keys[keep], rows.iloc[keep]
+        self._keys, self._rows = keys, rows
+        return self
+
+    @property
+    def sample(self) -> pd.DataFrame:
+        return self._rows if self._rows is not None else pd.DataFrame()
+
+
+def reservoir_sample(df: pd.DataFrame, size: int, seed: int = 0, chunk_rows: int = 1_000_000) -> pd.DataFrame:
+    sampler = ReservoirSampler(size, seed)
+    for start in range(0, len(df), chunk_rows):
+        sampler.update(df.iloc[start : start + chunk_rows])
+    return sampler.sample
+
+
+def stratified_sample(df: pd.DataFrame, by: str, size: int, seed: int = 0) -> pd.DataFrame:
+    """Proportional-allocation sample, so every stratum keeps its share of rows."""
+    rng = np.random.default_rng(seed)
+    codes, _ = pd.factorize(df[by], use_na_sentinel=False)
+    frac = min(size / max(len(df), 1), 1.0)
+    picks = []
+    for code in range(int(codes.max()) + 1 if len(codes) else 0):
+        positions = np.flatnonzero(codes == code)
+        take = max(int(round(len(positions) * frac)), 1)
+        picks.append(rng.choice(positions, size=min(take, len(positions)), replace=False))
+    return df.iloc[np.sort(np.concatenate(picks))] if picks else df.iloc[:0]
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import io
+import math
+import os
+import re
+import time
+import zipfile
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from xml.etree import ElementTree
+
+import numpy as np
+
+from memory.result_cache import ResultCache, digest_bytes
+from tools.profiling import traced
+
+MAX_CHUNK_WORDS = 120
+BM25_K1 = 1.2
+BM25_B = 0.75
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+_STEP = re.compile(r"^\s*(?:step\s+)?((?:\d+[.)]?)+|[a-z][.)]|[ivx]+[.)]|[-*•▪●])\s+", re.IGNORECASE)
+_NUMBERED_HEADING = re.compile(r"^\s*(?:section|chapter|part)?\s*\d+(?:\.\d+)*\.?\s+[A-Z][^.!?]{0,80}$", re.IGNORECASE)
+_SUFFIXES = ("ations", "ation", "ings", "ing", "als", "al", "ed", "es", "s")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with shall must should may "
+    "be been being each any all into per via than then there their they them these those who whom which what when where".split()
+)
+
+# Query vocabularies for the process-mining questions the Process Redesign Agent asks.
+PROCESS_QUERIES: Dict[str, str] = {
+    "handoff": "handoff hand-off handover transfer forward route escalate send pass assign notify",
+    "approval": "approve approval sign-off signoff authorize authorise authorization review consent countersign",
+    "manual": "manual manually re-enter rekey spreadsheet excel email print paper scan fax",
+    "wait": "wait pending delay hold backlog queue",
+}
+
+
+class Block(NamedTuple):
+    text: str
+    page: int
+    kind: str  # "heading" | "list" | "para"
+
+
+@dataclass
+class SopChunk:
+    section: str
+    label: str
+    text: str
+    page: int
+
+
+def _stem(token: str) -> str:
+    # Light suffix stripping so "approves", "approved" and "approval" share a posting list.
+    if len(token) > 4:
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(token) for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _iter_txt(data: bytes) -> Iterator[Block]:
+    page = 1
+    paragraph: List[str] = []
+    for raw in io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="replace"):
+        pages = raw.split("\f")
+        for offset, line in enumerate(pages):
+            if offset:
+                page += 1
+            line = line.strip()
+            if not line or _STEP.match(line) or _looks_like_heading(line):
+                if paragraph:
+                    yield Block(" ".join(paragraph), page, "para")
+                    paragraph = []
+                if line:
+                    yield Block(line, page, "heading" if _looks_like_heading(line) else "list")
+            else:
+                paragraph.append(line)
+    if paragraph:
+        yield Block(" ".join(paragraph), page, "para")
+
+
+def _iter_docx(data: bytes) -> Iterator[Block]:
+    page = 1
+    with zipfile.ZipFile(io.BytesIO(data)) as archive, archive.open("word/document.xml") as handle:
+        for _, element in ElementTree.iterparse(handle, events=("end",)):
+            if element.tag != f"{_W}p":
+                continue
+            page += sum(1 for br in element.iter(f"{_W}br") if br.get(f"{_W}type") == "page")
+            text = "".join(node.text or "" for node in element.iter(f"{_W}t")).strip()
+            style = element.find(f"{_W}pPr/{_W}pStyle")
+            style_name = (style.get(f"{_W}val") or "").lower() if style is not None else ""
+            is_list = element.find(f"{_W}pPr/{_W}numPr") is not None or "list" in style_name
+            element.clear()
+            if text:
+                kind = "heading" if style_name.startswith(("heading", "title")) else "list" if is_list or _STEP.match(text) else "para"
+                yield Block(text, page, kind)
+
+
+def _iter_pdf(data: bytes) -> Iterator[Block]:
+    try:
+        from pypdf import PdfReader
+    except ImportError as exc:
+        raise RuntimeError("PDF SOPs need the optional 'pypdf' package (pip install pypdf).") from exc
+    for number, page in enumerate(PdfReader(io.BytesIO(data)).pages, start=1):
+        text = page.extract_text() or ""
+        for block in _iter_txt(text.encode("utf-8")):
+            yield block._replace(page=number)
+
+
+def _looks_like_heading(line: str) -> bool:
+    """ALL-CAPS lines, "Section 4 ..." lines, and short numbered Title Case lines ("3.2 Approval Workflow")."""
+    words = line.split()
+    if not words or len(words) > 12 or line.endswith((".", ";", ",")):
+        return False
+    if line.isupper() and sum(char.isalpha() for char in line) > 3:
+        return True
+    if not _NUMBERED_HEADING.match(line):
+        return False
+    title = [word for word in _STEP.sub("", line, count=1).split() if len(word) > 3]
+    return bool(re.match(r"^\s*(section|chapter|part)\b", line, re.IGNORECASE)) or bool(title) and all(word[0].isupper() for word in title)
+
+
+def iter_sop_blocks(data: bytes, filename: str) -> Iterator[Block]:
+    """Stream text blocks from a TXT, DOCX or PDF SOP without building the full text."""
+    ext = filename.lower().rsplit(".", 1)[-1] if "." in filename else "txt"
+    if ext == "docx":
+        return _iter_docx(data)
+    if ext == "pdf":
+        return _iter_pdf(data)
+    return _iter_txt(data)
+
+
+def chunk_blocks(blocks: Iterator[Block], max_words: int = MAX_CHUNK_WORDS) -> Iterator[SopChunk]:
+    """Group blocks into sections (by heading) and steps (list items or paragraphs)."""
+    section = "Preamble"
+    counters: Counter = Counter()
+    for block in blocks:
+        if block.kind == "heading":
+            section = block.text[:120]
+            continue
+        marker = _STEP.match(block.text)
+        counters[section] += 1
+        label = marker.group(1).rstrip(".)") if marker and marker.group(1)[0].isalnum() else str(counters[section])
+        words = block.text.split()
+        for start in range(0, len(words), max_words):
+            suffix = f".{start // max_words + 1}" if len(words) > max_words else ""
+            yield SopChunk(section, label + suffix, " ".join(words[start : start + max_words]), block.page)
+
+
+@dataclass
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring; postings are numpy arrays per term."""
+
+    chunks: List[SopChunk]
+    postings: Dict[str, tuple] = field(default_factory=dict)
+    doc_len: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    pages: int = 0
+    build_ms: float = 0.0
+
+    @classmethod
+    def build(cls, chunks: List[SopChunk]) -> "BM25Index":
+        start = time.perf_counter()
+        docs: Dict[str, List[int]] = defaultdict(list)
+        freqs: Dict[str, List[int]] = defaultdict(list)
+        lengths = np.zeros(len(chunks), dtype="float64")
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk.text))
+            lengths[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                docs[term].append(doc_id)
+                freqs[term].append(count)
+        postings = {term: (np.asarray(ids, dtype="int32"), np.asarray(freqs[term], dtype="float32")) for term, ids in docs.items()}
+        pages = max((chunk.page for chunk in chunks), default=0)
+        return cls(chunks, postings, lengths, pages, round((time.perf_counter() - start) * 1000, 2))
+
+    def scores(self, query: str) -> np.ndarray:
+        n = len(self.chunks)
+        scores = np.zeros(n, dtype="float64")
+        if not n:
+            return scores
+        avg_len = float(self.doc_len.mean()) or 1.0
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tf = self.postings[term]
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[ids] / avg_len)
+            scores[ids] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores > 0)
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [{**self.chunks[idx].__dict__, "score": round(float(scores[idx]), 3)} for idx in top]
+
+    def count(self, query: str) -> int:
+        return int(np.count_nonzero(self.scores(query)))
+
+    def summary(self) -> Dict:
+        return {
+            "chunks": len(self.chunks),
+            "sections": len({chunk.section for chunk in self.chunks}),
+            "pages": self.pages,
+            "terms": len(self.postings),
+            "build_ms": self.build_ms,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_index_cache() -> ResultCache:
+    return ResultCache(max_entries=8, disk_dir=os.environ.get("AGENTOPS_SOP_CACHE_DIR"))
+
+
+@traced()
+def load_sop_index(data: bytes, filename: str, cache: Optional[ResultCache] = None) -> tuple[BM25Index, bool]:
+    """Parse, chunk and index an SOP, cached by content hash; returns (index, cache_hit)."""
+    cache = cache or get_index_cache()
+    key = f"sop:{filename.lower().rsplit('.', 1)[-1]}:{digest_bytes(data)}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+    index = BM25Index.build(list(chunk_blocks(iter_sop_blocks(data, filename))))
+    cache.put(key, index)
+    return index, False
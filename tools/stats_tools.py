@@ -0,0 +1,536 @@
+from __future__ import annotations
+
+import copy
+import json
+import math
+import os
+import shutil
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import lru_cache
+from multiprocessing import get_context, shared_memory
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from memory.result_cache import ResultCache, digest_bytes
+from tools.dedup_tools import DuplicateTracker, count_duplicates, row_hashes
+from tools.profiling import traced
+from tools.sketch_tools import HyperLogLog, KLLSketch, reservoir_sample, stratified_sample
+
+STAT_COLUMNS = ["count", "mean", "std", "min", "q1", "median", "q3", "max"]
+FAST_SAMPLE_ROWS = 200_000
+FAST_SKETCH_K = 1_000
+PROFILE_CHECKPOINTS = 8  # cached prefixes remembered per schema
+PARALLEL_PROFILE_COLUMNS = 512
+CONFIDENCE_LEVEL = 0.95  # default level for Fast-mode error bounds
+
+
+@dataclass
+class DatasetStats:
+    rows: int
+    columns: List[str]
+    numeric_cols: List[str]
+    categorical_cols: List[str]
+    null_counts: pd.Series
+    numeric: pd.DataFrame
+    cardinality: Optional[pd.Series] = None  # distinct counts; only the sketching paths fill it
+    elapsed_ms: float = 0.0
+    approximate: bool = False
+    sample_rows: int = 0
+    duplicate_rows: Optional[int] = None
+    error_bounds: Dict = field(default_factory=dict)
+    values: Optional[np.ndarray] = field(default=None, repr=False)
+    row_index: Optional[pd.Index] = field(default=None, repr=False)
+    row_hashes: Optional[np.ndarray] = field(default=None, repr=False)
+
+    def missing_ratio(self) -> pd.Series:
+        return (self.null_counts / max(self.rows, 1)).round(3)
+
+
+def _numeric_block_stats(block: np.ndarray, numeric_cols: List[str], moments: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Per-column statistics of a float block; with exact ``moments`` (count, mean, std,
+    min, max) already known, only the quartiles are computed."""
+    if block.shape[0] == 0 or block.shape[1] == 0:
+        return pd.DataFrame(np.nan, index=numeric_cols, columns=STAT_COLUMNS)
+    has_nan = bool(np.isnan(block).any())
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        if moments is not None:
+            quartiles = (np.nanquantile if has_nan else np.quantile)(block, [0.25, 0.5, 0.75], axis=0)
+            numeric = moments.copy()
+            numeric["q1"], numeric["median"], numeric["q3"] = quartiles[0], quartiles[1], quartiles[2]
+            return numeric[STAT_COLUMNS]
+        if has_nan:
+            counts = (~np.isnan(block)).sum(axis=0)
+            quantiles = np.nanquantile(block, [0.0, 0.25, 0.5, 0.75, 1.0], axis=0)
+            mean = np.nanmean(block, axis=0)
+            std = np.nanstd(block, axis=0, ddof=1)
+        else:
+            counts = np.full(block.shape[1], block.shape[0])
+            quantiles = np.quantile(block, [0.0, 0.25, 0.5, 0.75, 1.0], axis=0)
+            mean = block.mean(axis=0)
+            std = block.std(axis=0, ddof=1)
+    std = np.where(counts > 1, std, np.nan)
+    return pd.DataFrame(
+        {
+            "count": counts,
+            "mean": mean,
+            "std": std,
+            "min": quantiles[0],
+            "q1": quantiles[1],
+            "median": quantiles[2],
+            "q3": quantiles[3],
+            "max": quantiles[4],
+        },
+        index=numeric_cols,
+    )
+
+
+def _profile_shard(shm_name: str, shape: Tuple[int, int], start: int, stop: int, names: List[str]) -> pd.DataFrame:
+    """Worker: statistics for columns ``start:stop`` of a shared numeric block."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shard = np.ndarray(shape, dtype="float64", buffer=shm.buf, order="F")[:, start:stop]
+        result = _numeric_block_stats(shard, names)
+        del shard
+    finally:
+        shm.close()
+    return result
+
+
+@lru_cache(maxsize=4)
+def _profile_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn, not fork: callers (Streamlit, the job queue, the API server) are multi-threaded.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+
+
+def _shm_fits(size: int) -> bool:
+    """Whether ``/dev/shm`` has room for ``size`` bytes; a full tmpfs faults on write, not on create."""
+    try:
+        return shutil.disk_usage("/dev/shm").free >= size
+    except OSError:
+        # No /dev/shm (macOS, Windows): segment creation reports its own errors.
+        return True
+
+
+def _sharded_numeric_stats(df: pd.DataFrame, numeric_cols: List[str], workers: int) -> Optional[pd.DataFrame]:
+    """Profile numeric columns on a process pool over one shared-memory, column-major block.
+
+    Each worker maps the block and reads a contiguous slab of columns, so nothing but the
+    per-column results crosses the process boundary. The block is not kept: the parent
+    holds a single copy at peak, and the analysis tools rebuild it from the frame. Returns
+    None when shared memory is too small or unavailable, so the caller profiles in-process.
+    """
+    shape = (len(df), len(numeric_cols))
+    size = max(shape[0] * shape[1] * 8, 1)
+    if not _shm_fits(size):
+        return None
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=size)
+    except OSError:
+        return None
+    try:
+        shared = np.ndarray(shape, dtype="float64", buffer=shm.buf, order="F")
+        for idx, col in enumerate(numeric_cols):
+            shared[:, idx] = df[col].to_numpy(dtype="float64", na_value=np.nan)
+        del shared
+        bounds = np.linspace(0, shape[1], workers + 1).astype(int)
+        pool = _profile_pool(workers)
+        futures = [
+            pool.submit(_profile_shard, shm.name, shape, int(lo), int(hi), numeric_cols[lo:hi])
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+            if hi > lo
+        ]
+        results = [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+    return pd.concat(results)
+
+
+def _covers(summary: Optional["StatsAccumulator"], df: pd.DataFrame, numeric_cols: List[str]) -> bool:
+    """Whether ``summary`` was accumulated over exactly the rows and numeric columns of ``df``."""
+    return summary is not None and summary.head is not None and summary.rows == len(df) and summary.numeric_cols == numeric_cols
+
+
+@traced()
+def compute_stats(df: pd.DataFrame, workers: Optional[int] = None, summary: Optional["StatsAccumulator"] = None) -> DatasetStats:
+    """Compute every per-column statistic the analysis tools need in one vectorized pass.
+
+    Null counts of numeric columns come from the same pass as their moments; other
+    columns are checked one at a time. Distinct counts are not computed here (nothing on
+    the exact path reads them). Tables with at least ``PARALLEL_PROFILE_COLUMNS`` numeric columns are profiled in
+    column shards on ``workers`` processes; the rest stay in-process. With an exact
+    ``summary`` of the same frame (see :func:`profile_incremental`), counts, nulls and
+    moments are taken from it and only the quartiles are computed here.
+    """
+    start = time.perf_counter()
+    numeric_cols = df.select_dtypes(include="number").columns.tolist()
+    numeric_set = set(numeric_cols)
+    categorical_cols = [col for col in df.columns if col not in numeric_set]
+    moments = summary.exact_numeric() if _covers(summary, df, numeric_cols) else None
+    sharded = None
+    if moments is None and workers and workers > 1 and len(numeric_cols) >= PARALLEL_PROFILE_COLUMNS and len(df):
+        try:
+            sharded = _sharded_numeric_stats(df, numeric_cols, workers)
+        except BrokenProcessPool:
+            _profile_pool.cache_clear()
+    if sharded is not None:
+        block, numeric = None, sharded
+    else:
+        block = df[numeric_cols].to_numpy(dtype="float64", na_value=np.nan)
+        numeric = _numeric_block_stats(block, numeric_cols, moments)
+    if moments is not None:
+        null_counts = summary.null_counts.reindex(df.columns).astype("int64")
+    else:
+        # Column by column: a frame-wide isnull() would materialize a rows x columns mask.
+        null_counts = {col: int(df[col].isna().sum()) for col in categorical_cols}
+        null_counts.update((len(df) - numeric["count"].fillna(0)).astype("int64").to_dict())
+        null_counts = pd.Series(null_counts, index=df.columns, dtype="int64")
+    stats = DatasetStats(
+        rows=int(df.shape[0]),
+        columns=df.columns.tolist(),
+        numeric_cols=numeric_cols,
+        categorical_cols=categorical_cols,
+        null_counts=null_counts,
+        numeric=numeric,
+        values=block,
+        row_index=df.index,
+    )
+    stats.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    return stats
+
+
+class StatsAccumulator:
+    """Incremental, chunk-at-a-time counterpart of ``compute_stats``.
+
+    Counts, nulls, mean, std, min and max are exact (parallel Welford merge). Quartiles
+    come from per-column KLL sketches and cardinality from HyperLogLog, so memory stays
+    bounded however many chunks are fed in. ``sketch=False`` skips both sketches when
+    only the exact statistics and the duplicate count are needed. ``max_distinct_rows``
+    caps the duplicate tracker's hash set (see :class:`DuplicateTracker`).
+    """
+
+    def __init__(
+        self,
+        sketch_k: int = 200,
+        hll_precision: int = 12,
+        head_rows: int = 8,
+        seed: int = 0,
+        sketch: bool = True,
+        max_distinct_rows: Optional[int] = None,
+    ) -> None:
+        self.sketch_k = sketch_k
+        self.hll_precision = hll_precision
+        self.head_rows = head_rows
+        self.seed = seed
+        self.sketch = sketch
+        self.max_distinct_rows = max_distinct_rows
+        self._elapsed = 0.0
+        self.rows = 0
+        self.columns: List[str] = []
+        self.numeric_cols: List[str] = []
+        self.head: Optional[pd.DataFrame] = None
+
+    def _start(self, chunk: pd.DataFrame) -> None:
+        self.columns = chunk.columns.tolist()
+        self.numeric_cols = chunk.select_dtypes(include="number").columns.tolist()
+        width = len(self.numeric_cols)
+        self.head = chunk.head(self.head_rows).copy()
+        self.null_counts = pd.Series(0, index=chunk.columns, dtype="int64")
+        self._count = np.zeros(width)
+        self._mean = np.zeros(width)
+        self._m2 = np.zeros(width)
+        self._min = np.full(width, np.nan)
+        self._max = np.full(width, np.nan)
+        self.sketches: Dict[str, KLLSketch] = {}
+        self.distinct: Dict[str, HyperLogLog] = {}
+        if self.sketch:
+            self.sketches = {col: KLLSketch(self.sketch_k, seed=self.seed + idx) for idx, col in enumerate(self.numeric_cols)}
+            self.distinct = {col: HyperLogLog(self.hll_precision) for col in self.columns}
+        self.duplicates = DuplicateTracker(max_distinct=self.max_distinct_rows)
+
+    def _numeric_block(self, chunk: pd.DataFrame) -> np.ndarray:
+        frame = chunk[self.numeric_cols]
+        if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in frame.dtypes):
+            frame = frame.apply(pd.to_numeric, errors="coerce")
+        return frame.to_numpy(dtype="float64", na_value=np.nan)
+
+    def update(self, chunk: pd.DataFrame, hashes: Optional[np.ndarray] = None) -> "StatsAccumulator":
+        """Fold in one chunk; ``hashes`` are its ``row_hashes`` if the caller already has them."""
+        start = time.perf_counter()
+        if self.head is None:
+            self._start(chunk)
+        elif len(self.head) < self.head_rows:
+            self.head = pd.concat([self.head, chunk.head(self.head_rows - len(self.head))])
+        self.rows += len(chunk)
+        # Numeric nulls come from the block below; a frame-wide isnull() would build a full mask.
+        numeric_set = set(self.numeric_cols)
+        nulls = {col: int(chunk[col].isna().sum()) for col in chunk.columns if col not in numeric_set}
+
+        block = self._numeric_block(chunk)
+        count_b = (~np.isnan(block)).sum(axis=0)
+        nulls.update(zip(self.numeric_cols, (len(chunk) - count_b).tolist()))
+        self.null_counts = self.null_counts.add(pd.Series(nulls, dtype="int64"), fill_value=0).astype("int64")
+        if block.size:
+            with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                mean_b = np.nan_to_num(np.nanmean(block, axis=0))
+                m2_b = np.nan_to_num(np.nanvar(block, axis=0)) * count_b
+                total = self._count + count_b
+                delta = mean_b - self._mean
+                safe_total = np.where(total > 0, total, 1)
+                self._mean = self._mean + delta * count_b / safe_total
+                self._m2 = self._m2 + m2_b + delta**2 * self._count * count_b / safe_total
+                self._count = total
+                self._min = np.fmin(self._min, np.nanmin(block, axis=0))
+                self._max = np.fmax(self._max, np.nanmax(block, axis=0))
+            for idx, col in enumerate(self.numeric_cols):
+                if col in self.sketches:
+                    self.sketches[col].update(block[:, idx])
+
+        for col, hll in self.distinct.items():
+            hll.update(chunk[col])
+        self.duplicates.update(chunk, hashes)
+        self._elapsed += time.perf_counter() - start
+        return self
+
+    def exact_numeric(self) -> pd.DataFrame:
+        """The exact per-column statistics (count, mean, std, min, max) folded in so far."""
+        std = np.sqrt(self._m2 / np.where(self._count > 1, self._count - 1, 1))
+        return pd.DataFrame(
+            {
+                "count": self._count.astype("int64"),
+                "mean": np.where(self._count > 0, self._mean, np.nan),
+                "std": np.where(self._count > 1, std, np.nan),
+                "min": self._min,
+                "max": self._max,
+            },
+            index=self.numeric_cols,
+        )
+
+    def finalize(self) -> DatasetStats:
+        if self.head is None:
+            return compute_stats(pd.DataFrame())
+        quantiles = np.array(
+            [self.sketches[col].quantiles([0.25, 0.5, 0.75]) if col in self.sketches else [np.nan] * 3 for col in self.numeric_cols]
+        ).reshape(-1, 3)
+        numeric = self.exact_numeric()
+        numeric["q1"], numeric["median"], numeric["q3"] = quantiles[:, 0], quantiles[:, 1], quantiles[:, 2]
+        numeric = numeric[STAT_COLUMNS]
+        numeric_set = set(self.numeric_cols)
+        rank_errors = {col: sketch.rank_error() for col, sketch in self.sketches.items()}
+        error_bounds = {
+            "quantile_rank_error": {col: round(err, 5) for col, err in rank_errors.items()},
+            "cardinality_rel_error": round(1.04 / math.sqrt(1 << self.hll_precision), 4),
+        }
+        if self.duplicates.estimate is not None:
+            distinct = self.rows - self.duplicates.duplicates
+            error_bounds["duplicate_rows_abs_error"] = int(round(self.duplicates.estimate.relative_error * distinct))
+        return DatasetStats(
+            rows=self.rows,
+            columns=self.columns,
+            numeric_cols=self.numeric_cols,
+            categorical_cols=[col for col in self.columns if col not in numeric_set],
+            null_counts=self.null_counts,
+            cardinality=pd.Series({col: hll.count() for col, hll in self.distinct.items()}, dtype="int64"),
+            numeric=numeric,
+            elapsed_ms=round(self._elapsed * 1000, 2),
+            approximate=True,
+            duplicate_rows=self.duplicates.duplicates,
+            error_bounds=error_bounds,
+        )
+
+
+def z_score(confidence_level: float) -> float:
+    """Two-sided normal critical value, e.g. 1.96 for 0.95."""
+    return float(NormalDist().inv_cdf(0.5 + confidence_level / 2))
+
+
+def _pick_strata(df: pd.DataFrame, cardinality: pd.Series, numeric_cols: List[str], max_groups: int = 50) -> Optional[str]:
+    numeric_set = set(numeric_cols)
+    for col in df.columns:
+        if col not in numeric_set and 1 < cardinality.get(col, 0) <= max_groups:
+            return col
+    return None
+
+
+def _strata_cardinality(df: pd.DataFrame, columns: List[str], max_groups: int = 50, chunk_rows: int = 250_000) -> pd.Series:
+    """Distinct counts of the strata candidates, hashed once each into a HyperLogLog.
+
+    Categoricals read their category count. A column stops being scanned as soon as it
+    clearly has more than ``max_groups`` values, so ID-like columns cost one chunk.
+    """
+    counts = {}
+    for col in columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            counts[col] = len(series.cat.categories)
+            continue
+        hll = HyperLogLog()
+        for offset in range(0, len(series), chunk_rows):
+            if hll.update(series.iloc[offset : offset + chunk_rows]).count() > 2 * max_groups:
+                break
+        counts[col] = hll.count()
+    return pd.Series(counts, dtype="int64")
+
+
+def _exact_extremes(df: pd.DataFrame, numeric_cols: List[str]) -> pd.DataFrame:
+    """Full-column null count, min and max: cheap vectorized reductions, no sorting."""
+    rows = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for col in numeric_cols:
+            values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+            rows.append((int(np.isnan(values).sum()), np.nanmin(values) if len(values) else np.nan, np.nanmax(values) if len(values) else np.nan))
+    return pd.DataFrame(rows, index=numeric_cols, columns=["nulls", "min", "max"])
+
+
+@traced()
+def compute_fast_stats(
+    df: pd.DataFrame,
+    sample_rows: int = FAST_SAMPLE_ROWS,
+    strata: Optional[str] = None,
+    confidence_level: float = CONFIDENCE_LEVEL,
+    seed: int = 0,
+    summary: Optional[StatsAccumulator] = None,
+    workers: Optional[int] = None,
+) -> DatasetStats:
+    """Approximate ``compute_stats`` for very large frames, with error bounds.
+
+    Quartiles (and so the IQR fences) and outlier scoring use a stratified (or reservoir)
+    row sample; their rank error is the DKW bound for the sample size. Null counts, min
+    and max are exact from cheap full-column reductions. An exact ``summary`` of the same
+    frame (see :func:`profile_incremental`) also supplies exact counts, means,
+    standard deviations and the duplicate count, in which case the means carry no sampling
+    error; without one, ``duplicate_rows`` counts duplicates within the sample.
+    """
+    if len(df) <= sample_rows:
+        return compute_stats(df, workers)
+    start = time.perf_counter()
+    numeric_cols = df.select_dtypes(include="number").columns.tolist()
+    numeric_set = set(numeric_cols)
+    others = [col for col in df.columns if col not in numeric_set]
+    cardinality = _strata_cardinality(df, others)
+    strata = strata or _pick_strata(df, cardinality, numeric_cols)
+    sample = stratified_sample(df, strata, sample_rows, seed) if strata else reservoir_sample(df, sample_rows, seed)
+    stats = compute_stats(sample, workers)
+
+    rows, sampled = int(len(df)), int(len(sample))
+    exact = _covers(summary, df, numeric_cols)
+    if exact:
+        moments = summary.exact_numeric()
+        stats.numeric[["count", "mean", "std", "min", "max"]] = moments[["count", "mean", "std", "min", "max"]]
+        stats.null_counts = summary.null_counts.reindex(df.columns).astype("int64")
+        stats.duplicate_rows = summary.duplicates.duplicates
+    else:
+        stats.duplicate_rows = count_duplicates(sample)
+        extremes = _exact_extremes(df, numeric_cols)
+        stats.numeric[["min", "max"]] = extremes[["min", "max"]]
+        stats.numeric["count"] = rows - extremes["nulls"]
+        null_counts = {col: int(df[col].isna().sum()) for col in others}
+        null_counts.update(extremes["nulls"].to_dict())
+        stats.null_counts = pd.Series(null_counts, index=df.columns, dtype="int64")
+
+    z = z_score(confidence_level)
+    finite = math.sqrt(max(1 - sampled / rows, 0.0))
+    # Dvoretzky-Kiefer-Wolfowitz: sample quantiles are within this rank of the true ones.
+    rank_error = math.sqrt(math.log(2 / (1 - confidence_level)) / (2 * sampled)) * finite
+    stats.rows = rows
+    stats.cardinality = cardinality
+    stats.sample_rows = sampled
+    stats.approximate = True
+    stats.error_bounds = {
+        "confidence_level": confidence_level,
+        "strata": strata,
+        "mean_half_width": {}
+        if exact
+        else {
+            col: round(float(z * stats.numeric.at[col, "std"] / math.sqrt(sampled) * finite), 6)
+            for col in numeric_cols
+            if not pd.isna(stats.numeric.at[col, "std"])
+        },
+        "quantile_rank_error": {col: round(rank_error, 5) for col in numeric_cols},
+        "cardinality_rel_error": round(HyperLogLog().relative_error, 4),
+        "duplicates_in_sample": not exact,
+    }
+    stats.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    return stats
+
+
+def stats_summary(stats: DatasetStats) -> Dict:
+    """Trace output for the shared stats pass: its measured cost."""
+    return {"elapsed_ms": stats.elapsed_ms}
+
+
+@lru_cache(maxsize=1)
+def get_profile_cache() -> ResultCache:
+    """In-memory profile cache; ``AGENTOPS_PROFILE_CACHE_DIR`` adds an on-disk tier."""
+    return ResultCache(max_entries=16, disk_dir=os.environ.get("AGENTOPS_PROFILE_CACHE_DIR"))
+
+
+def _put_profile(cache: ResultCache, key: str, value: Any) -> None:
+    try:
+        cache.put(key, value)
+    except OSError:
+        # Caching is an optimization; an unwritable profile directory must not fail the run.
+        pass
+
+
+def _schema_digest(df: pd.DataFrame, sketch: bool) -> str:
+    schema = [[str(col), str(dtype)] for col, dtype in df.dtypes.items()]
+    config = {"sketch": sketch, "sketch_k": FAST_SKETCH_K if sketch else None}
+    return digest_bytes(json.dumps([schema, config]).encode("utf-8"))
+
+
+@traced()
+def profile_incremental(
+    df: pd.DataFrame,
+    sketch: bool = False,
+    cache: Optional[ResultCache] = None,
+    hashes: Optional[np.ndarray] = None,
+) -> Tuple[StatsAccumulator, Dict]:
+    """Mergeable profile of ``df``, resumed from the longest cached profile of a prefix of it.
+
+    Profiles are ``StatsAccumulator`` states keyed by schema and a fingerprint of the row
+    hashes they cover, so a growing daily extract only folds its new rows into
+    yesterday's counts, moments, duplicate hash set and (with ``sketch``) KLL/HLL
+    sketches. Returns the accumulator and a report of the rows skipped.
+    """
+    start = time.perf_counter()
+    cache = cache or get_profile_cache()
+    schema = _schema_digest(df, sketch)
+    hashes = row_hashes(df) if hashes is None else hashes
+    checkpoints: List[Tuple[int, str]] = cache.get(f"profile-index:{schema}", [])
+    summary: Optional[StatsAccumulator] = None
+    skipped = 0
+    for rows, fingerprint in sorted(checkpoints, reverse=True):
+        if 0 < rows <= len(df) and digest_bytes(hashes[:rows].tobytes()) == fingerprint:
+            summary = cache.get(f"profile:{schema}:{fingerprint}")
+            if summary is not None:
+                skipped = rows
+                break
+    if summary is None or skipped < len(df):
+        # Cached states are shared with other runs; extend a copy.
+        summary = StatsAccumulator(sketch_k=FAST_SKETCH_K, sketch=sketch) if summary is None else copy.deepcopy(summary)
+        summary.update(df.iloc[skipped:], hashes[skipped:])
+        fingerprint = digest_bytes(hashes.tobytes())
+        _put_profile(cache, f"profile:{schema}:{fingerprint}", summary)
+        kept = [(len(df), fingerprint), *(item for item in checkpoints if item[1] != fingerprint)]
+        for _, dropped in kept[PROFILE_CHECKPOINTS:]:
+            cache.discard(f"profile:{schema}:{dropped}")
+        _put_profile(cache, f"profile-index:{schema}", kept[:PROFILE_CHECKPOINTS])
+    report = {
+        "rows": int(len(df)),
+        "rows_skipped": int(skipped),
+        "rows_processed": int(len(df) - skipped),
+        "status": "miss" if not skipped else "hit" if skipped == len(df) else "extended",
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+    return summary, report
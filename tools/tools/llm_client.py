@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from memory.result_cache import ResultCache
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+METRICS_HISTORY = 256
+
+
+class LLMRequestError(RuntimeError):
+    pass
+
+
+class LLMClient:
+    """Pooled JSON-over-HTTP client with bounded concurrency, retries and a response cache.
+
+    Every call returns a metrics record (latency, attempts, cache hit, token counts)
+    alongside the parsed body. ``self.metrics`` keeps only the last ``METRICS_HISTORY``
+    records, since the default client lives as long as the process.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_concurrency: int = 4,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        timeout: float = 40.0,
+        cache: Optional[ResultCache] = None,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.cache = cache
+        self.metrics: Deque[Dict[str, Any]] = deque(maxlen=METRICS_HISTORY)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._metrics_lock = threading.Lock()
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @staticmethod
+    def cache_key(body: Dict[str, Any]) -> str:
+        return "llm:" + hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        return min(self.backoff_cap, self.backoff_base * 2**attempt) * random.uniform(0.5, 1.0)
+
+    def _record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        with self._metrics_lock:
+            self.metrics.append(record)
+        return record
+
+    def post_json(
+        self,
+        body: Dict[str, Any],
+        params: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> tuple[Dict[str, Any], Dict[str, Any]]:
+        """POST ``body``; ``timeout`` caps the whole call (slot wait, attempts and backoff) in seconds."""
+        start = time.perf_counter()
+        deadline = start + timeout if timeout is not None else None
+        key = self.cache_key(body)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached, self._record({"cache": "hit", "attempts": 0, "latency_ms": round((time.perf_counter() - start) * 1000, 2), **_token_counts(cached)})
+
+        attempt = 0
+        if not self._slots.acquire(timeout=-1 if deadline is None else max(deadline - time.perf_counter(), 0)):
+            raise LLMRequestError(f"LLM request exceeded its {timeout:g}s budget waiting for a connection slot")
+        try:
+            while True:
+                response = None
+                remaining = self.timeout if deadline is None else min(self.timeout, deadline - time.perf_counter())
+                if remaining <= 0:
+                    raise LLMRequestError(f"LLM request exceeded its {timeout:g}s budget after {attempt} attempts")
+                try:
+                    response = self.session.post(
+                        self.base_url,
+                        params=params,
+                        headers={"Content-Type": "application/json"},
+                        json=body,
+                        timeout=remaining,
+                    )
+                except (requests.ConnectionError, requests.Timeout) as exc:
+                    if attempt >= self.max_retries:
+                        raise LLMRequestError(f"LLM request failed after {attempt + 1} attempts: {exc}") from exc
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        break
+                    if attempt >= self.max_retries:
+                        break
+                delay = self._delay(attempt, response)
+                if deadline is not None and time.perf_counter() + delay >= deadline:
+                    if response is None:
+                        raise LLMRequestError(f"LLM request exceeded its {timeout:g}s budget after {attempt + 1} attempts")
+                    break
+                time.sleep(delay)
+                attempt += 1
+        finally:
+            self._slots.release()
+        response.raise_for_status()
+        try:
+            data = response.json()
+        except ValueError as exc:
+            raise LLMRequestError(f"LLM response was not JSON (HTTP {response.status_code}): {response.text[:200]!r}") from exc
+        if self.cache is not None:
+            self.cache.put(key, data)
+        record = {
+            "cache": "miss",
+            "attempts": attempt + 1,
+            "status": response.status_code,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            **_token_counts(data),
+        }
+        return data, self._record(record)
+
+
+def _token_counts(data: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    usage = data.get("usageMetadata", {}) if isinstance(data, dict) else {}
+    return {"prompt_tokens": usage.get("promptTokenCount"), "response_tokens": usage.get("candidatesTokenCount")}
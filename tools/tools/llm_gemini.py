@@ -1,16 +1,26 @@
 from __future__ import annotations
 
 import json
+import os
 import re
-from typing import Any, Dict, List
-
-import requests
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
+from memory.result_cache import ResultCache
 from schemas.output_schema import AgentOutput
+from tools.tools.llm_client import LLMClient
+from tools.tools.prompt_budget import DRAFT_TOKEN_BUDGET, compact_draft, dumps_compact, estimate_tokens
 
 GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
 
 
+@lru_cache(maxsize=1)
+def get_default_client() -> LLMClient:
+    cache = ResultCache(max_entries=256, disk_dir=os.environ.get("AGENTOPS_LLM_CACHE_DIR"))
+    return LLMClient(os.environ.get("AGENTOPS_GEMINI_URL", GEMINI_URL), max_concurrency=int(os.environ.get("AGENTOPS_LLM_CONCURRENCY", "4")), cache=cache)
+
+
 def _extract_json_block(text: str) -> Dict[str, Any]:
     fenced = re.search(r"```json\s*(\{.*?\})\s*```", text, flags=re.DOTALL)
     if fenced:
@@ -22,20 +32,49 @@ def _extract_json_block(text: str) -> Dict[str, Any]:
     raise ValueError("Model response did not contain JSON.")
 
 
-def _build_prompt(problem: str, industry: str, objective_type: str, constraints: List[str], draft: Dict[str, Any]) -> str:
-    return (
+@lru_cache(maxsize=1)
+def _instruction_prefix() -> Tuple[str, int]:
+    """The request-independent instructions, built and token-counted once per process.
+
+    Sent as ``systemInstruction``, so every request shares a byte-identical prefix.
+    """
+    text = (
         "You are an enterprise strategy and operations AI assistant. "
         "Return ONLY valid JSON that matches this exact schema keys: "
         "executive_summary (list of 5 short bullets), problem_understanding{goal,success_metrics,constraints}, "
         "analysis{key_findings,charts,anomalies}, recommendations{actions,risks,plan_90_days}, assumptions, confidence. "
-        "Do not include markdown or commentary.\n\n"
+        "Do not include markdown or commentary. The user message carries a baseline analysis; improve it while "
+        "keeping claims realistic. Lists named in its _omitted field were shortened to fit and hold only their leading items."
+    )
+    return text, estimate_tokens(text)
+
+
+def _build_prompt(
+    problem: str,
+    industry: str,
+    objective_type: str,
+    constraints: List[str],
+    draft: Dict[str, Any],
+    budget: int = DRAFT_TOKEN_BUDGET,
+) -> Tuple[str, Dict[str, Any]]:
+    """Request-specific prompt text plus a report of its size and how the draft was compacted."""
+    start = time.perf_counter()
+    compacted, report = compact_draft(draft, budget)
+    text = (
         f"Industry: {industry}\n"
         f"Objective Type: {objective_type}\n"
         f"Problem: {problem}\n"
         f"Constraints: {constraints}\n\n"
-        "Use this baseline analysis and improve it while keeping claims realistic:\n"
-        f"{json.dumps(draft)}"
+        "Baseline analysis:\n"
+        f"{dumps_compact(compacted)}"
+    )
+    prefix_tokens = _instruction_prefix()[1]
+    report.update(
+        prefix_tokens=prefix_tokens,
+        prompt_tokens_est=prefix_tokens + estimate_tokens(text),
+        build_ms=round((time.perf_counter() - start) * 1000, 3),
     )
+    return text, report
 
 
 def generate_structured_output(
@@ -46,42 +85,70 @@ def generate_structured_output(
     problem_statement: str,
     constraints: List[str],
     draft_result: Dict[str, Any],
+    client: Optional[LLMClient] = None,
+    metrics: Optional[List[Dict[str, Any]]] = None,
+    token_budget: int = DRAFT_TOKEN_BUDGET,
 ) -> Dict[str, Any]:
+    """Improve ``draft_result`` with Gemini; the draft is compacted to ``token_budget`` tokens first."""
     if not api_key:
         raise ValueError("Missing Gemini API key.")
 
+    text, prompt = _build_prompt(problem_statement, industry, objective_type, constraints, draft_result, token_budget)
     body = {
-        "contents": [
-            {
-                "role": "user",
-                "parts": [
-                    {
-                        "text": _build_prompt(
-                            problem_statement,
-                            industry,
-                            objective_type,
-                            constraints,
-                            draft_result,
-                        )
-                    }
-                ],
-            }
-        ],
+        "systemInstruction": {"parts": [{"text": _instruction_prefix()[0]}]},
+        "contents": [{"role": "user", "parts": [{"text": text}]}],
         "generationConfig": {
             "temperature": 0.2,
             "response_mime_type": "application/json",
         },
     }
 
-    response = requests.post(
-        f"{GEMINI_URL}?key={api_key}",
-        headers={"Content-Type": "application/json"},
-        json=body,
-        timeout=40,
-    )
-    response.raise_for_status()
-    data = response.json()
+    client = client or get_default_client()
+    data, call_metrics = client.post_json(body, params={"key": api_key})
+    if metrics is not None:
+        # prompt_tokens/response_tokens are the API's counts; the prompt report holds our estimate and build time.
+        metrics.append({"tool": "gemini_generate", "input": {"objective_type": objective_type, "token_budget": token_budget}, "output": {**call_metrics, "prompt": prompt}})
     text = data["candidates"][0]["content"]["parts"][0]["text"]
     parsed = _extract_json_block(text)
     validated = AgentOutput(**parsed)
     return validated.model_dump()
+
+
+def _build_lens_prompt(lens: str, industry: str, problem: str, constraints: List[str]) -> str:
+    return (
+        f"You are the {lens} lens on an executive boardroom panel. "
+        "Return ONLY valid JSON with keys: stance (one of pilot, scale, defer), confidence (0-1), "
+        "viewpoint (one sentence), actions (list of {action,owner,timeframe,impact}), "
+        "risks (list of {risk,severity in high|med|low,mitigation}). Do not include markdown or commentary.\n\n"
+        f"Industry: {industry}\n"
+        f"Decision: {problem}\n"
+        f"Constraints: {constraints}\n"
+    )
+
+
+def generate_lens_view(
+    *,
+    api_key: str,
+    lens: str,
+    industry: str,
+    problem_statement: str,
+    constraints: List[str],
+    client: Optional[LLMClient] = None,
+    metrics: Optional[List[Dict[str, Any]]] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """One boardroom lens as a single model call; the caller validates the stance.
+
+    ``timeout`` bounds the whole call, retries included.
+    """
+    if not api_key:
+        raise ValueError("Missing Gemini API key.")
+    body = {
+        "contents": [{"role": "user", "parts": [{"text": _build_lens_prompt(lens, industry, problem_statement, constraints)}]}],
+        "generationConfig": {"temperature": 0.2, "response_mime_type": "application/json"},
+    }
+    client = client or get_default_client()
+    data, call_metrics = client.post_json(body, params={"key": api_key}, timeout=timeout)
+    if metrics is not None:
+        metrics.append({"tool": "gemini_lens", "input": {"lens": lens}, "output": call_metrics})
+    return _extract_json_block(data["candidates"][0]["content"]["parts"][0]["text"])
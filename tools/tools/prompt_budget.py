@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import copy
+import json
+import math
+import os
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Tokens the heuristic draft may use in a prompt (AGENTOPS_PROMPT_DRAFT_TOKENS).
+DRAFT_TOKEN_BUDGET = int(os.environ.get("AGENTOPS_PROMPT_DRAFT_TOKENS", "1500"))
+CHARS_PER_TOKEN = 4
+MAX_STRING_CHARS = 240
+# Lists are shortened (and finally emptied) in this order, least valuable first.
+TRIM_ORDER: Sequence[Tuple[str, ...]] = (
+    ("analysis", "charts"),
+    ("analysis", "anomalies"),
+    ("assumptions",),
+    ("recommendations", "plan_90_days"),
+    ("recommendations", "risks"),
+    ("analysis", "key_findings"),
+    ("recommendations", "actions"),
+    ("executive_summary",),
+)
+
+
+def dumps_compact(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English and JSON)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _dedupe(value: Any) -> Tuple[Any, int]:
+    """Drop repeated and empty items from every list; returns the value and the items removed."""
+    if isinstance(value, dict):
+        removed = 0
+        for key, item in value.items():
+            value[key], count = _dedupe(item)
+            removed += count
+        return value, removed
+    if isinstance(value, list):
+        kept: List[Any] = []
+        seen = set()
+        removed = 0
+        for item in value:
+            item, count = _dedupe(item)
+            removed += count
+            marker = " ".join(item.split()).lower() if isinstance(item, str) else dumps_compact(item)
+            if item in ("", None) or marker in seen:
+                removed += 1
+                continue
+            seen.add(marker)
+            kept.append(item)
+        return kept, removed
+    return value, 0
+
+
+def _clip_strings(value: Any, limit: int) -> Tuple[Any, int]:
+    if isinstance(value, str):
+        return (value[: limit - 1] + "…", 1) if len(value) > limit else (value, 0)
+    if isinstance(value, dict):
+        clipped = 0
+        for key, item in value.items():
+            value[key], count = _clip_strings(item, limit)
+            clipped += count
+        return value, clipped
+    if isinstance(value, list):
+        results = [_clip_strings(item, limit) for item in value]
+        return [item for item, _ in results], sum(count for _, count in results)
+    return value, 0
+
+
+def _list_at(draft: Dict[str, Any], path: Tuple[str, ...]) -> Tuple[Dict[str, Any], str] | None:
+    parent: Any = draft
+    for key in path[:-1]:
+        parent = parent.get(key) if isinstance(parent, dict) else None
+    if isinstance(parent, dict) and isinstance(parent.get(path[-1]), list):
+        return parent, path[-1]
+    return None
+
+
+def compact_draft(draft: Dict[str, Any], budget: int = DRAFT_TOKEN_BUDGET) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Shrink ``draft`` to about ``budget`` tokens of compact JSON without mutating it.
+
+    Repeated and empty list items are always removed. Over budget, long strings are
+    clipped, then the lists in ``TRIM_ORDER`` are halved in turn (keeping their leading,
+    highest-ranked items) and finally emptied. ``problem_understanding`` and ``confidence``
+    are never cut. Omitted counts go into ``_omitted`` so the model knows the lists are partial.
+    """
+    compacted, deduplicated = _dedupe(copy.deepcopy(draft))
+    tokens_before = estimate_tokens(dumps_compact(draft))
+    omitted: Dict[str, int] = {}
+    clipped = 0
+
+    def size() -> int:
+        return estimate_tokens(dumps_compact({**compacted, "_omitted": omitted} if omitted else compacted))
+
+    if size() > budget:
+        compacted, clipped = _clip_strings(compacted, MAX_STRING_CHARS)
+    for minimum in (1, 0):
+        for path in TRIM_ORDER:
+            found = _list_at(compacted, path)
+            while found is not None and len(found[0][found[1]]) > minimum and size() > budget:
+                parent, key = found
+                keep = max(len(parent[key]) // 2, minimum)
+                name = ".".join(path)
+                omitted[name] = omitted.get(name, 0) + len(parent[key]) - keep
+                parent[key] = parent[key][:keep]
+    if omitted:
+        compacted["_omitted"] = omitted
+    report = {
+        "budget": budget,
+        "draft_tokens_before": tokens_before,
+        "draft_tokens_after": estimate_tokens(dumps_compact(compacted)),
+        "deduplicated": deduplicated,
+        "clipped_strings": clipped,
+        "omitted": omitted,
+    }
+    return compacted, report
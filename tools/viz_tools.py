@@ -1,35 +1,192 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+import math
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-import plotly.express as px
 
+from tools.profiling import traced
+from tools.stats_tools import DatasetStats, compute_stats
 
-def suggest_charts(df: pd.DataFrame) -> List[Dict]:
+MAX_CHART_POINTS = 5_000
+WEBGL_THRESHOLD = 1_000
+HISTOGRAM_BINS = 50
+DENSITY_BINS = 100
+BAR_TRACKED_VALUES = 10_000  # category counts kept while streaming a bar chart
+
+
+@traced()
+def suggest_charts(df: pd.DataFrame, stats: Optional[DatasetStats] = None) -> List[Dict]:
+    stats = stats or compute_stats(df)
     charts: List[Dict] = []
-    numeric = df.select_dtypes(include="number").columns.tolist()
+    numeric = stats.numeric_cols
     if len(numeric) >= 1:
         charts.append({"title": f"Distribution of {numeric[0]}", "type": "histogram", "cols": [numeric[0]]})
     if len(numeric) >= 2:
         charts.append({"title": f"{numeric[0]} vs {numeric[1]}", "type": "scatter", "cols": [numeric[0], numeric[1]]})
     if not charts:
-        categorical = df.select_dtypes(exclude="number").columns.tolist()
+        categorical = stats.categorical_cols
         if categorical:
             charts.append({"title": f"Top {categorical[0]} categories", "type": "bar", "cols": [categorical[0]]})
     return charts
 
 
-def render_chart(df: pd.DataFrame, chart_spec: Dict):
+def lttb_downsample(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` points that keep the line's shape."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        next_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+        area = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous]) - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def aggregate_chart(df: pd.DataFrame, chart_spec: Dict, max_points: int = MAX_CHART_POINTS) -> Optional[Dict]:
+    """Reduce a chart spec to a payload whose size does not grow with the row count."""
     ctype = chart_spec.get("type")
-    cols = chart_spec.get("cols", [])
-    title = chart_spec.get("title", "Chart")
+    cols = [col for col in chart_spec.get("cols", []) if col in df.columns]
     if ctype == "histogram" and cols:
-        return px.histogram(df, x=cols[0], title=title)
+        values = df[cols[0]].to_numpy(dtype="float64", na_value=np.nan)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return None
+        bins = min(len(np.histogram_bin_edges(values, bins="sturges")) - 1, HISTOGRAM_BINS)
+        counts, edges = np.histogram(values, bins=bins)
+        return {"kind": "bars", "x": (edges[:-1] + edges[1:]) / 2, "y": counts, "width": np.diff(edges), "rows": int(len(values))}
     if ctype == "scatter" and len(cols) >= 2:
-        return px.scatter(df, x=cols[0], y=cols[1], title=title)
+        pairs = df[cols[:2]].to_numpy(dtype="float64", na_value=np.nan)
+        pairs = pairs[np.isfinite(pairs).all(axis=1)]
+        x, y = pairs[:, 0], pairs[:, 1]
+        if len(x) <= max_points:
+            return {"kind": "points", "x": x, "y": y, "webgl": len(x) > WEBGL_THRESHOLD, "rows": int(len(x))}
+        if np.all(np.diff(x) >= 0):
+            keep = lttb_downsample(x, y, max_points)
+            return {"kind": "points", "x": x[keep], "y": y[keep], "webgl": True, "rows": int(len(x)), "downsampled": "lttb"}
+        counts, x_edges, y_edges = np.histogram2d(x, y, bins=DENSITY_BINS)
+        return {
+            "kind": "density",
+            "x": (x_edges[:-1] + x_edges[1:]) / 2,
+            "y": (y_edges[:-1] + y_edges[1:]) / 2,
+            "z": counts.T,
+            "rows": int(len(x)),
+        }
     if ctype == "bar" and cols:
-        counts = df[cols[0]].value_counts().head(10).reset_index()
-        counts.columns = [cols[0], "count"]
-        return px.bar(counts, x=cols[0], y="count", title=title)
+        counts = df[cols[0]].value_counts().head(10)
+        return {"kind": "bars", "x": counts.index.astype(str).to_numpy(), "y": counts.to_numpy(), "width": None, "rows": int(len(df))}
     return None
+
+
+def _fixed_edges(stats: DatasetStats, col: str, bins: int) -> np.ndarray:
+    low, high = float(stats.numeric.at[col, "min"]), float(stats.numeric.at[col, "max"])
+    if not (math.isfinite(low) and math.isfinite(high)):
+        low, high = 0.0, 1.0
+    if low == high:
+        low, high = low - 0.5, high + 0.5  # same widening as numpy for a constant column
+    return np.linspace(low, high, bins + 1)
+
+
+class ChartAccumulator:
+    """Chunk-at-a-time counterpart of ``aggregate_chart`` producing the same payload shapes.
+
+    Bin edges are fixed up front from the column min/max in ``stats``, so histograms and
+    density grids add up across chunks. Scatter points are kept only while there are at
+    most ``max_points``; beyond that the payload is the density grid (no LTTB, which needs
+    the whole column). Bar charts keep the ``BAR_TRACKED_VALUES`` most frequent values.
+    """
+
+    def __init__(self, chart_spec: Dict, stats: DatasetStats, max_points: int = MAX_CHART_POINTS) -> None:
+        self.type = chart_spec.get("type")
+        self.cols = [col for col in chart_spec.get("cols", []) if col in stats.columns]
+        self.max_points = max_points
+        self.rows = 0
+        if self.type == "histogram" and self.cols:
+            count = int(stats.numeric.at[self.cols[0], "count"])
+            bins = min(int(math.ceil(math.log2(count) + 1)) if count else 1, HISTOGRAM_BINS)
+            self.edges = _fixed_edges(stats, self.cols[0], bins)
+            self.counts = np.zeros(bins, dtype="int64")
+        elif self.type == "scatter" and len(self.cols) >= 2:
+            self.x_edges = _fixed_edges(stats, self.cols[0], DENSITY_BINS)
+            self.y_edges = _fixed_edges(stats, self.cols[1], DENSITY_BINS)
+            self.density = np.zeros((DENSITY_BINS, DENSITY_BINS), dtype="int64")
+            self.points: Optional[List[np.ndarray]] = []
+        elif self.type == "bar" and self.cols:
+            self.values = pd.Series(dtype="int64")
+
+    @property
+    def columns(self) -> List[str]:
+        return self.cols[:2] if self.type == "scatter" else self.cols[:1]
+
+    def update(self, chunk: pd.DataFrame) -> "ChartAccumulator":
+        if self.type == "histogram" and self.cols:
+            values = chunk[self.cols[0]].to_numpy(dtype="float64", na_value=np.nan)
+            values = values[np.isfinite(values)]
+            self.counts += np.histogram(values, bins=self.edges)[0]
+            self.rows += len(values)
+        elif self.type == "scatter" and len(self.cols) >= 2:
+            pairs = chunk[self.cols[:2]].to_numpy(dtype="float64", na_value=np.nan)
+            pairs = pairs[np.isfinite(pairs).all(axis=1)]
+            self.density += np.histogram2d(pairs[:, 0], pairs[:, 1], bins=[self.x_edges, self.y_edges])[0].astype("int64")
+            self.rows += len(pairs)
+            if self.points is not None:
+                self.points = [*self.points, pairs] if self.rows <= self.max_points else None
+        elif self.type == "bar" and self.cols:
+            self.values = self.values.add(chunk[self.cols[0]].value_counts(), fill_value=0)
+            if len(self.values) > BAR_TRACKED_VALUES:
+                self.values = self.values.nlargest(BAR_TRACKED_VALUES)
+            self.rows += len(chunk)
+        return self
+
+    def finalize(self) -> Optional[Dict]:
+        if not self.rows or not self.columns:
+            return None
+        if self.type == "histogram":
+            return {"kind": "bars", "x": (self.edges[:-1] + self.edges[1:]) / 2, "y": self.counts, "width": np.diff(self.edges), "rows": int(self.rows)}
+        if self.type == "scatter":
+            if self.points is not None:
+                pairs = np.concatenate(self.points)
+                return {"kind": "points", "x": pairs[:, 0], "y": pairs[:, 1], "webgl": len(pairs) > WEBGL_THRESHOLD, "rows": int(self.rows)}
+            return {
+                "kind": "density",
+                "x": (self.x_edges[:-1] + self.x_edges[1:]) / 2,
+                "y": (self.y_edges[:-1] + self.y_edges[1:]) / 2,
+                "z": self.density.T,
+                "rows": int(self.rows),
+            }
+        counts = self.values.sort_values(ascending=False, kind="stable").head(10).astype("int64")
+        return {"kind": "bars", "x": counts.index.astype(str).to_numpy(), "y": counts.to_numpy(), "width": None, "rows": int(self.rows)}
+
+
+def render_chart(df: pd.DataFrame, chart_spec: Dict):
+    payload = aggregate_chart(df, chart_spec)
+    if payload is None:
+        return None
+    # plotly is only needed to draw, so it stays off the import path of the agents.
+    import plotly.graph_objects as go
+
+    cols = chart_spec.get("cols", [])
+    title = chart_spec.get("title", "Chart")
+    if payload["kind"] == "bars":
+        fig = go.Figure(go.Bar(x=payload["x"], y=payload["y"], width=payload["width"]))
+        x_title, y_title = cols[0], "count"
+    elif payload["kind"] == "points":
+        trace = go.Scattergl if payload["webgl"] else go.Scatter
+        fig = go.Figure(trace(x=payload["x"], y=payload["y"], mode="markers"))
+        x_title, y_title = cols[0], cols[1]
+    else:
+        fig = go.Figure(go.Heatmap(x=payload["x"], y=payload["y"], z=payload["z"], colorscale="Blues", colorbar={"title": "rows"}))
+        x_title, y_title = cols[0], cols[1]
+    if payload.get("downsampled") or payload["kind"] == "density":
+        title = f"{title} ({payload['rows']:,} rows aggregated)"
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, bargap=0.05 if payload["kind"] == "bars" else None)
+    return fig